@@ -0,0 +1,6 @@
+"""
+Benchmark harness with local stand-ins for Ollama and MCP servers.
+
+Run ``python -m bench.run`` to measure the chat/tool pipeline without a GPU
+or network access.
+"""
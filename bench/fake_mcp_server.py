@@ -0,0 +1,67 @@
+"""
+Stand-in for the MCP filesystem server, with configurable latency.
+
+Serves a subset of the filesystem server's tools over stdio, restricted to the
+directories given on the command line:
+
+    python bench/fake_mcp_server.py /some/dir [/other/dir ...]
+
+Environment:
+    FAKE_MCP_STARTUP_DELAY: Seconds to sleep before serving (default 0)
+    FAKE_MCP_TOOL_DELAY: Seconds each tool call takes (default 0)
+"""
+import asyncio
+import os
+import sys
+import time
+
+from mcp.server.fastmcp import FastMCP
+
+STARTUP_DELAY = float(os.getenv('FAKE_MCP_STARTUP_DELAY', '0'))
+TOOL_DELAY = float(os.getenv('FAKE_MCP_TOOL_DELAY', '0'))
+ALLOWED = [os.path.realpath(d) for d in sys.argv[1:]] or [os.getcwd()]
+
+app = FastMCP('fake-filesystem')
+
+
+def _checked(path: str) -> str:
+    resolved = os.path.realpath(path)
+    if not any(os.path.commonpath([root, resolved]) == root for root in ALLOWED):
+        raise ValueError(f"Access denied - path outside allowed directories: {path}")
+    return resolved
+
+
+@app.tool()
+async def list_allowed_directories() -> str:
+    """List the directories this server may access"""
+    return "Allowed directories:\n" + "\n".join(ALLOWED)
+
+
+@app.tool()
+async def read_file(path: str) -> str:
+    """Read a UTF-8 text file"""
+    await asyncio.sleep(TOOL_DELAY)
+    with open(_checked(path), encoding='utf-8') as f:
+        return f.read()
+
+
+@app.tool()
+async def write_file(path: str, content: str) -> str:
+    """Create or overwrite a file"""
+    await asyncio.sleep(TOOL_DELAY)
+    with open(_checked(path), 'w', encoding='utf-8') as f:
+        f.write(content)
+    return f"Successfully wrote to {path}"
+
+
+@app.tool()
+async def list_directory(path: str) -> str:
+    """List a directory, marking entries as [FILE] or [DIR]"""
+    await asyncio.sleep(TOOL_DELAY)
+    entries = sorted(os.scandir(_checked(path)), key=lambda e: e.name)
+    return "\n".join(f"{'[DIR]' if e.is_dir() else '[FILE]'} {e.name}" for e in entries)
+
+
+if __name__ == '__main__':
+    time.sleep(STARTUP_DELAY)
+    app.run()
@@ -0,0 +1,206 @@
+"""
+Stand-in for the Ollama HTTP API that streams scripted replies.
+
+Implements the parts of the API the app uses (``/api/chat``, ``/api/tags``
+and model preloads via ``/api/generate``) with configurable delays. When a request carries tools and the model has not
+seen a tool result yet, the reply asks for the scripted tool calls instead of
+answering, so a full tool round trip can be exercised.
+
+    python -m bench.fake_ollama --port 11435 --tokens 100 --token-delay 0.01
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+class FakeOllama:
+    """Threaded fake Ollama server; use as a context manager or start()/stop()"""
+
+    def __init__(
+        self,
+        tokens: int = 20,
+        token_delay: float = 0.0,
+        first_token_delay: float = 0.0,
+        tool_calls: Optional[List[Dict[str, Any]]] = None,
+        models: Optional[List[str]] = None,
+        load_delay: float = 0.0,
+        host: str = '127.0.0.1',
+        port: int = 0,
+    ):
+        """
+        Args:
+            tokens: Tokens per streamed answer
+            token_delay: Seconds between tokens
+            first_token_delay: Seconds before the first token (prompt processing)
+            tool_calls: Tool calls requested when tools are offered, e.g.
+                        ``[{'function': {'name': 'filesystem', 'arguments': {...}}}]``
+            models: Model names reported by /api/tags
+            load_delay: Seconds a model preload (/api/generate) takes
+        """
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+        self.tool_calls = tool_calls or []
+        self.models = models or ['llama3.2:latest']
+        self.load_delay = load_delay
+        # Only the latest request is kept so long runs don't grow the heap
+        self.request_count = 0
+        self.last_request: Optional[Dict[str, Any]] = None
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeOllama':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-ollama', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeOllama':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reply(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """The scripted assistant message for a chat request"""
+        messages = request.get('messages') or []
+        last = messages[-1] if messages else {}
+        saw_tool_output = last.get('role') == 'tool' or (last.get('content') or '').startswith('Function ')
+        if request.get('tools') and self.tool_calls and not saw_tool_output:
+            return {'role': 'assistant', 'content': '', 'tool_calls': self.tool_calls}
+        return {'role': 'assistant', 'content': ''.join(f"tok{i} " for i in range(self.tokens))}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _stats(request: Dict[str, Any], eval_count: int, started: float) -> Dict[str, Any]:
+    """Timing fields Ollama reports on the final chunk, in nanoseconds"""
+    prompt_chars = sum(len(m.get('content') or '') for m in request.get('messages') or [])
+    total = int((time.perf_counter() - started) * 1e9)
+    return {
+        'done_reason': 'stop',
+        'total_duration': total,
+        'load_duration': 0,
+        'prompt_eval_count': prompt_chars // 4,
+        'prompt_eval_duration': 0,
+        'eval_count': eval_count,
+        'eval_duration': total,
+    }
+
+
+def _handler_for(fake: FakeOllama):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Small chunk writes must not wait on delayed ACKs
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == '/api/tags':
+                self._send_json({'models': [
+                    {'model': name, 'name': name, 'modified_at': _now(), 'digest': '0' * 64, 'size': 0}
+                    for name in fake.models
+                ]})
+            elif self.path == '/api/version':
+                self._send_json({'version': '0.0.0-fake'})
+            else:
+                self._send_json({'error': 'not found'}, status=404)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            request = json.loads(body or b'{}')
+            fake.request_count += 1
+            fake.last_request = request
+            if self.path == '/api/chat':
+                self._chat(request)
+            elif self.path == '/api/generate':
+                # Only the empty-prompt form used to load a model
+                time.sleep(fake.load_delay)
+                self._send_json({'model': request.get('model', ''), 'created_at': _now(), 'response': '',
+                                 'done': True, 'done_reason': 'load'})
+            else:
+                self._send_json({'error': 'not found'}, status=404)
+
+        def _chat(self, request):
+            started = time.perf_counter()
+            model = request.get('model', '')
+            message = fake.reply(request)
+            time.sleep(fake.first_token_delay)
+
+            if not request.get('stream', True):
+                time.sleep(fake.token_delay * fake.tokens)
+                self._send_json({'model': model, 'created_at': _now(), 'message': message, 'done': True,
+                                 **_stats(request, fake.tokens, started)})
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            pieces = [f"tok{i} " for i in range(fake.tokens)] if not message.get('tool_calls') else []
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(fake.token_delay)
+                self._write_chunk({'model': model, 'created_at': _now(), 'done': False,
+                                   'message': {'role': 'assistant', 'content': piece}})
+            final = {'role': 'assistant', 'content': ''}
+            if message.get('tool_calls'):
+                final['tool_calls'] = message['tool_calls']
+            self._write_chunk({'model': model, 'created_at': _now(), 'done': True, 'message': final,
+                               **_stats(request, len(pieces), started)})
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+
+        def _write_chunk(self, obj):
+            data = json.dumps(obj).encode() + b'\n'
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b'\r\n')
+            self.wfile.flush()
+
+        def _send_json(self, obj, status=200):
+            data = json.dumps(obj).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.fake_ollama', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--tokens', type=int, default=20, help='Tokens per answer')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='Seconds between tokens')
+    parser.add_argument('--first-token-delay', type=float, default=0.0, help='Seconds before the first token')
+    args = parser.parse_args(argv)
+
+    fake = FakeOllama(args.tokens, args.token_delay, args.first_token_delay, host=args.host, port=args.port)
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
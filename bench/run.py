@@ -0,0 +1,255 @@
+"""
+End-to-end benchmarks against local stand-in servers.
+
+Starts a FakeOllama HTTP server and points a "filesystem" MCP server entry at
+bench/fake_mcp_server.py, then drives the same turn engine, dispatcher and
+mcp() path the Streamlit app uses. Results are printed (or written) as JSON;
+latencies are in milliseconds.
+
+    python -m bench.run --turns 20 --token-delay 0.005 --output bench.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .fake_ollama import FakeOllama
+
+FAKE_MCP_SERVER = Path(__file__).with_name('fake_mcp_server.py')
+MODEL = 'llama3.2:latest'
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Distribution of durations given in seconds, reported in milliseconds"""
+    ms = sorted(s * 1000 for s in samples)
+    if not ms:
+        return {'n': 0}
+    return {
+        'n': len(ms),
+        'mean': round(statistics.fmean(ms), 3),
+        'p50': round(ms[len(ms) // 2], 3),
+        'p95': round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        'min': round(ms[0], 3),
+        'max': round(ms[-1], 3),
+    }
+
+
+def write_mcp_config(workdir: Path, startup_delay: float, tool_delay: float) -> Path:
+    """MCP config whose only server is the fake filesystem server"""
+    config = {'mcpServers': {'filesystem': {
+        'command': sys.executable,
+        'args': [str(FAKE_MCP_SERVER), str(workdir)],
+        'env': {
+            'FAKE_MCP_STARTUP_DELAY': str(startup_delay),
+            'FAKE_MCP_TOOL_DELAY': str(tool_delay),
+        },
+    }}}
+    path = workdir / 'mcp_config.json'
+    path.write_text(json.dumps(config))
+    return path
+
+
+async def timed_turn(conversation, tools=None, execute_tools=None) -> Dict[str, float]:
+    """Run one turn and time the first token and the whole turn"""
+    from src.engine import run_turn
+
+    start = time.perf_counter()
+    first_token = None
+    async for event in run_turn(conversation, MODEL, tools=tools, execute_tools=execute_tools):
+        if event.type == 'token' and first_token is None:
+            first_token = time.perf_counter() - start
+    return {'ttft': first_token or 0.0, 'latency': time.perf_counter() - start}
+
+
+async def bench_plain_turns(turns: int) -> Dict[str, Any]:
+    """Single-call turns in fresh conversations"""
+    from src.conversation import Conversation
+
+    ttft, latency = [], []
+    for _ in range(turns):
+        conversation = Conversation("You are a benchmark.")
+        conversation.append({'role': 'user', 'content': 'hello'})
+        result = await timed_turn(conversation)
+        ttft.append(result['ttft'])
+        latency.append(result['latency'])
+    return {'ttft': summarize(ttft), 'turn_latency': summarize(latency)}
+
+
+async def bench_tool_turns(turns: int, tool_delay: float) -> Dict[str, Any]:
+    """Turns with one filesystem tool round; cache cleared so every call hits the server"""
+    from src.conversation import Conversation
+    from src.dispatcher import ToolDispatcher
+    from src.tool_cache import tool_cache
+    from src.tools import registry
+
+    dispatcher = ToolDispatcher(registry.functions, registry.servers)
+    dispatch_times = []
+
+    async def execute(tool_calls):
+        start = time.perf_counter()
+        outcomes = await dispatcher.dispatch(tool_calls)
+        dispatch_times.append(time.perf_counter() - start)
+        return outcomes
+
+    latency = []
+    for _ in range(turns):
+        tool_cache.clear()
+        conversation = Conversation("You are a benchmark.")
+        conversation.append({'role': 'user', 'content': 'read the file'})
+        latency.append((await timed_turn(conversation, registry.schemas(), execute))['latency'])
+
+    return {
+        'tool_turn_latency': summarize(latency),
+        'tool_dispatch': summarize(dispatch_times),
+        # Time spent outside the server's own simulated work
+        'tool_overhead': summarize([t - tool_delay for t in dispatch_times]),
+    }
+
+
+async def bench_mcp(spawns: int, calls: int, sample_file: Path) -> Dict[str, Any]:
+    """Cold server starts versus warm pooled calls through mcp()"""
+    from src.mcp_client import mcp
+    from src.mcp_pool import session_pool
+    from src.tool_cache import tool_cache
+
+    arguments = {'path': str(sample_file)}
+    cold, warm, cached = [], [], []
+    for _ in range(spawns):
+        await session_pool.evict('filesystem')
+        tool_cache.clear()
+        start = time.perf_counter()
+        await mcp('filesystem', 'read_file', arguments)
+        cold.append(time.perf_counter() - start)
+
+    for _ in range(calls):
+        tool_cache.clear()
+        start = time.perf_counter()
+        await mcp('filesystem', 'read_file', arguments)
+        warm.append(time.perf_counter() - start)
+
+    for _ in range(calls):
+        start = time.perf_counter()
+        await mcp('filesystem', 'read_file', arguments)
+        cached.append(time.perf_counter() - start)
+
+    return {
+        'mcp_spawn': summarize(cold),
+        'mcp_call_warm': summarize(warm),
+        'mcp_call_cached': summarize(cached),
+    }
+
+
+async def bench_memory(turns: int, checkpoints: int = 5) -> Dict[str, Any]:
+    """Python heap growth over one long conversation"""
+    from src.conversation import Conversation
+
+    conversation = Conversation("You are a benchmark.")
+    every = max(1, turns // checkpoints)
+    samples = []
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for turn in range(1, turns + 1):
+        conversation.append({'role': 'user', 'content': f'message {turn}'})
+        await timed_turn(conversation)
+        if turn % every == 0 or turn == turns:
+            gc.collect()
+            samples.append({
+                'turn': turn,
+                'heap_bytes': tracemalloc.get_traced_memory()[0] - baseline,
+                'wire_messages': len(conversation.wire),
+            })
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    growth = samples[-1]['heap_bytes'] / turns if samples else 0
+    return {
+        'turns': turns,
+        'heap_growth_per_turn_bytes': round(growth),
+        'heap_peak_bytes': peak,
+        'checkpoints': samples,
+    }
+
+
+async def run_all(args, workdir: Path) -> Dict[str, Any]:
+    sample_file = workdir / 'sample.txt'
+    sample_file.write_text('benchmark sample\n' * args.file_lines)
+
+    results: Dict[str, Any] = {}
+    results.update(await bench_plain_turns(args.turns))
+    if args.tool_turns:
+        results.update(await bench_tool_turns(args.tool_turns, args.mcp_tool_delay))
+    if args.spawns:
+        results.update(await bench_mcp(args.spawns, args.turns, sample_file))
+    if args.memory_turns:
+        results['memory'] = await bench_memory(args.memory_turns)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.run', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--turns', type=int, default=20, help='Samples per latency metric')
+    parser.add_argument('--tool-turns', type=int, default=10, help='Turns with a tool round (0 to skip)')
+    parser.add_argument('--spawns', type=int, default=3, help='Cold MCP server starts (0 to skip)')
+    parser.add_argument('--memory-turns', type=int, default=200, help='Length of the memory run (0 to skip)')
+    parser.add_argument('--tokens', type=int, default=50, help='Tokens per fake answer')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='Seconds between fake tokens')
+    parser.add_argument('--first-token-delay', type=float, default=0.0, help='Fake prompt processing time')
+    parser.add_argument('--mcp-startup-delay', type=float, default=0.0, help='Fake MCP server startup time')
+    parser.add_argument('--mcp-tool-delay', type=float, default=0.0, help='Fake MCP tool call time')
+    parser.add_argument('--file-lines', type=int, default=100, help='Lines in the file the tool reads')
+    parser.add_argument('-o', '--output', help='Write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='ollamaassist-bench-') as tmp, \
+            FakeOllama(args.tokens, args.token_delay, args.first_token_delay) as fake_ollama:
+        workdir = Path(tmp).resolve()
+        fake_ollama.tool_calls = [{'function': {
+            'name': 'filesystem',
+            'arguments': {'action': 'read', 'path': str(workdir / 'sample.txt')},
+        }}]
+
+        # Must be set before the app modules create clients or load the config
+        os.environ['OLLAMA_HOST'] = fake_ollama.url
+        os.environ['MCP_CONFIG_PATH'] = str(write_mcp_config(workdir, args.mcp_startup_delay, args.mcp_tool_delay))
+        os.environ['FILESYSTEM_ENABLED'] = 'true'
+        for name in ('FILESYSTEM_PATHS', 'FILESYSTEM_COMMAND', 'FILESYSTEM_ARGS'):
+            os.environ[name] = ''
+
+        started = time.perf_counter()
+        results = asyncio.run(run_all(args, workdir))
+        requests = fake_ollama.request_count
+
+        from src.mcp_pool import session_pool
+        session_pool.close_all()
+
+    report = {
+        'benchmark': 'ollamaassist',
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'params': vars(args),
+        'duration_s': round(time.perf_counter() - started, 3),
+        'ollama_requests': requests,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'metrics': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
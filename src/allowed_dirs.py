@@ -0,0 +1,90 @@
+"""
+Allowed-directory cache for MCP filesystem servers.
+
+The directory list is fetched once per server session and turned into an index
+of resolved paths, so checking whether a path is accessible is a local
+``commonpath`` comparison instead of a server round trip.
+"""
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from .mcp_client import call_tool
+from .mcp_pool import session_pool
+
+
+def _resolve(path: str) -> str:
+    return os.path.normcase(os.path.realpath(os.path.expanduser(path)))
+
+
+class AllowedDirectories:
+    """Resolved-path index of the directories a server may access"""
+
+    def __init__(self, directories: Iterable[str]):
+        self.directories = tuple(directories)
+        self.roots = tuple(sorted({_resolve(d) for d in self.directories}))
+
+    def contains(self, path: str) -> bool:
+        """True if ``path`` is one of the roots or lies beneath one"""
+        resolved = _resolve(path)
+        for root in self.roots:
+            try:
+                if os.path.commonpath([root, resolved]) == root:
+                    return True
+            except ValueError:
+                # Different drives on Windows
+                continue
+        return False
+
+    @classmethod
+    def from_result(cls, result) -> 'AllowedDirectories':
+        """Parse a list_allowed_directories result ("Allowed directories:\\n/a\\n/b")"""
+        lines = []
+        for block in result.content:
+            text = getattr(block, 'text', '') or ''
+            lines.extend(line.strip() for line in text.splitlines())
+        return cls(line for line in lines if line and not line.endswith(':'))
+
+
+@dataclass
+class _Entry:
+    generation: int
+    directories: AllowedDirectories
+
+
+class AllowedDirectoriesCache:
+    """Allowed directories per server, refetched when the server session changes"""
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+
+    async def get(self, server: str) -> Optional[AllowedDirectories]:
+        """Allowed directories for ``server``, or None if they could not be fetched"""
+        entry = self._entries.get(server)
+        if entry and entry.generation == session_pool.generation(server):
+            return entry.directories
+
+        # Concurrent misses may both fetch; the result is the same either way
+        try:
+            result = await call_tool(server, 'list_allowed_directories')
+        except Exception as e:
+            logging.warning(f"Could not fetch allowed directories from {server}: {e}")
+            return None
+        if result.isError:
+            return None
+
+        directories = AllowedDirectories.from_result(result)
+        self._entries[server] = _Entry(session_pool.generation(server), directories)
+        return directories
+
+    def invalidate(self, server: str = None):
+        """Drop the cached list for ``server``, or for all servers"""
+        if server is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(server, None)
+
+
+# Shared cache used by the filesystem tools
+allowed_directories = AllowedDirectoriesCache()
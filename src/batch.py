@@ -0,0 +1,208 @@
+"""
+Headless batch runner for the chat/tool pipeline.
+
+Reads prompts from a JSONL file, runs each one as a conversation through the
+same turn engine the Streamlit app uses, and appends one JSON result per line
+as conversations finish. Prompts whose id is already in the output file are
+skipped, so an interrupted run is resumed by running the same command again.
+
+Usage:
+    python -m src.batch prompts.jsonl -o results.jsonl --concurrency 4
+
+Each input line is an object with either ``prompt`` (a string) or ``messages``
+(a conversation ending with the user's message), plus optional ``id``,
+``model`` and ``system`` fields. Lines without an ``id`` are numbered from 1.
+
+Batch requests share one scheduler session, so interactive users keep their
+turn while a batch runs, and a prompt Ollama is too busy to take is retried
+rather than recorded as failed.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional, Set
+
+from .config import config
+from .conversation import Conversation
+from .dispatcher import ToolDispatcher
+from .engine import run_turn
+from .logging_config import setup_logging
+from .prompts import SystemPrompt
+from .scheduler import SchedulerOverloaded, session_scope
+from .tools import registry
+
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+# Seconds before a prompt rejected by the busy scheduler is tried again
+BATCH_RETRY_DELAY = float(os.getenv('BATCH_RETRY_DELAY', '5'))
+# Scheduler session every batch request is queued under
+BATCH_SESSION = 'batch'
+
+
+def read_prompts(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield prompt records one at a time, giving each an ``id``"""
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record.setdefault('id', number)
+            yield record
+
+
+def completed_ids(path: str, retry_errors: bool = False) -> Set[str]:
+    """Ids already present in an output file; unreadable lines are ignored"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # Partial line from an interrupted run
+                continue
+            if retry_errors and result.get('error'):
+                continue
+            done.add(str(result.get('id')))
+    return done
+
+
+def _end_partial_line(path: str):
+    """Terminate a line cut short by an interrupted run before appending"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            f.write(b'\n')
+
+
+async def run_prompt(
+    record: Dict[str, Any],
+    model: str,
+    tools,
+    dispatcher: Optional[ToolDispatcher],
+    system_prompt: str,
+) -> Dict[str, Any]:
+    """
+    Run one prompt through the turn engine and summarize the outcome.
+
+    A prompt rejected because Ollama is overloaded is retried from the start
+    after BATCH_RETRY_DELAY seconds, for as long as it takes.
+    """
+    model = record.get('model') or model
+    start = time.monotonic()
+
+    while True:
+        result = {'id': record['id'], 'model': model, 'response': None, 'tool_calls': [], 'tool_errors': [],
+                  'error': None}
+        try:
+            conversation = Conversation(record.get('system') or system_prompt)
+            if 'messages' in record:
+                conversation.extend(record['messages'])
+            else:
+                conversation.append({'role': 'user', 'content': record['prompt']})
+
+            execute = dispatcher.dispatch if dispatcher else None
+            async for event in run_turn(conversation, model, tools=tools, execute_tools=execute):
+                if event.type == 'assistant':
+                    result['response'] = event.message['content']
+                    result['tool_calls'].extend(event.message.get('tool_calls', []))
+                elif event.type == 'tool_error':
+                    result['tool_errors'].append(event.content)
+        except SchedulerOverloaded as e:
+            logging.info(f"Batch prompt {record['id']} deferred: {e}")
+            await asyncio.sleep(BATCH_RETRY_DELAY)
+            continue
+        except Exception as e:
+            logging.error(f"Batch prompt {record['id']} failed: {str(e)}", exc_info=True)
+            result['error'] = str(e)
+        break
+
+    result['elapsed'] = round(time.monotonic() - start, 3)
+    return result
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    model: str,
+    concurrency: int = BATCH_CONCURRENCY,
+    use_tools: bool = True,
+    system_prompt: Optional[str] = None,
+    retry_errors: bool = False,
+) -> Dict[str, int]:
+    """
+    Run every prompt in ``input_path`` not yet in ``output_path``.
+
+    Prompts are read lazily and at most ``concurrency`` conversations are in
+    flight, so the input can be far larger than memory. Returns counts of
+    prompts run, skipped and failed.
+    """
+    done = completed_ids(output_path, retry_errors)
+    tools = registry.schemas() if use_tools else None
+    dispatcher = ToolDispatcher(registry.functions, registry.servers) if use_tools else None
+    system_prompt = system_prompt or SystemPrompt().get_full_prompt()
+    counts = {'run': 0, 'skipped': 0, 'failed': 0}
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    _end_partial_line(output_path)
+    with open(output_path, 'a', encoding='utf-8') as out:
+        async def worker():
+            with session_scope(BATCH_SESSION):
+                while (record := await queue.get()) is not None:
+                    result = await run_prompt(record, model, tools, dispatcher, system_prompt)
+                    out.write(json.dumps(result, default=str) + '\n')
+                    out.flush()
+                    counts['run'] += 1
+                    counts['failed'] += bool(result['error'])
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for record in read_prompts(input_path):
+                if str(record['id']) in done:
+                    counts['skipped'] += 1
+                    continue
+                await queue.put(record)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.batch', description=__doc__.split('\n\n')[0])
+    parser.add_argument('input', help='JSONL file of prompts')
+    parser.add_argument('-o', '--output', required=True, help='JSONL file results are appended to')
+    parser.add_argument('-m', '--model', help='Ollama model (default: DEFAULT_MODEL if installed, else the first installed model)')
+    parser.add_argument('-c', '--concurrency', type=int, default=BATCH_CONCURRENCY,
+                        help='Conversations run at the same time')
+    parser.add_argument('--no-tools', action='store_true', help='Run without MCP tools')
+    parser.add_argument('--system', help='System prompt (default: the app\'s base prompt)')
+    parser.add_argument('--retry-errors', action='store_true', help='Re-run prompts whose result has an error')
+    args = parser.parse_args(argv)
+
+    setup_logging(config)
+    counts = asyncio.run(run_batch(
+        args.input, args.output,
+        model=args.model or config.default_model(),
+        concurrency=args.concurrency,
+        use_tools=not args.no_tools,
+        system_prompt=args.system,
+        retry_errors=args.retry_errors,
+    ))
+    print(json.dumps(counts), file=sys.stderr)
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
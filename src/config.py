@@ -1,81 +1,101 @@
 import os
-import json
+import time
+import logging
+import threading
 import ollama
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
+from .server_config import PROJECT_ROOT, server_configs
 
 class Config:
     # Application settings
     PAGE_TITLE = "Streamlit+Ollama+MCP"
     DEFAULT_MODEL = "llama3.2:latest"
+    # Seconds before the discovered model list is refreshed
+    MODELS_TTL = float(os.getenv('OLLAMA_MODELS_TTL', '60'))
+    # Longest wait between refreshes while the daemon keeps failing
+    MODELS_MAX_BACKOFF = 600.0
 
     def __init__(self):
         # Load environment variables
         load_dotenv()
         
         # Initialize config paths
-        self.project_root = Path(__file__).parent.parent
-        self.config_file = self.project_root / 'mcp_config.json'
+        self.project_root = PROJECT_ROOT
         
-        # Load MCP config
-        self.mcp_config = self._load_mcp_config()
-        
-        # Initialize Ollama models
-        self._init_ollama_models()
-        
-        # Apply environment overrides
-        self._apply_env_overrides()
+        # Ollama models are discovered lazily, see models()
+        self._models: Optional[Tuple[str, ...]] = None
+        self._models_expire_at = 0.0
+        self._models_failures = 0
+        self._models_lock = threading.Lock()
+        self._models_refreshing = False
+
+    def models(self) -> Tuple[str, ...]:
+        """
+        Available Ollama models, discovered lazily and cached for MODELS_TTL seconds.
 
-    def _init_ollama_models(self):
-        """Initialize available Ollama models"""
+        Only the first call blocks on the Ollama daemon; once the cache is stale
+        the old list is returned immediately while a background thread refreshes it.
+        """
+        if self._models is None:
+            with self._models_lock:
+                if self._models is None:
+                    self._fetch_models()
+        elif time.monotonic() > self._models_expire_at:
+            self._refresh_models_in_background()
+        return self._models
+
+    def default_model(self) -> str:
+        """DEFAULT_MODEL if installed, otherwise the first available model"""
+        models = self.models()
+        if self.DEFAULT_MODEL in models or not models:
+            return self.DEFAULT_MODEL
+        return models[0]
+
+    def _fetch_models(self):
+        """Query Ollama for installed models"""
         try:
             models_info = ollama.list()
-            self.OLLAMA_MODELS = tuple(model['model'] for model in models_info['models'])
-            
-            # Validate default model
-            if self.DEFAULT_MODEL not in self.OLLAMA_MODELS and self.OLLAMA_MODELS:
-                self.DEFAULT_MODEL = self.OLLAMA_MODELS[0]
+            models = tuple(model['model'] for model in models_info['models'])
         except Exception as e:
-            self.OLLAMA_MODELS = (self.DEFAULT_MODEL,)
-            
-    def _load_mcp_config(self) -> Dict[str, Any]:
-        """Load MCP server configuration from JSON"""
-        if not self.config_file.exists():
-            return {"mcpServers": {}}
-            
-        with open(self.config_file) as f:
-            return json.load(f)
-
-    def _apply_env_overrides(self):
-        """Apply environment variable overrides to server configs"""
-        servers = self.mcp_config.get('mcpServers', {})
-        
-        for server_name, config in servers.items():
-            prefix = f"{server_name.upper().replace('-', '_')}_"
-            
-            # Override enabled status
-            if os.getenv(f"{prefix}ENABLED"):
-                config['enabled'] = os.getenv(f"{prefix}ENABLED").lower() == 'true'
-            
-            # Override command
-            if os.getenv(f"{prefix}COMMAND"):
-                config['command'] = os.getenv(f"{prefix}COMMAND")
-            
-            # Override args
-            if os.getenv(f"{prefix}ARGS"):
-                config['args'] = os.getenv(f"{prefix}ARGS").split()
-            
-            # Add/override environment variables
-            if 'env' not in config:
-                config['env'] = {}
-                
-            # Special handling for API keys and paths
-            if server_name == 'brave-search' and os.getenv('BRAVE_API_KEY'):
-                config['env']['BRAVE_API_KEY'] = os.getenv('BRAVE_API_KEY')
-            elif server_name == 'filesystem' and os.getenv('FILESYSTEM_PATHS'):
-                paths = os.getenv('FILESYSTEM_PATHS').split(':')
-                config['args'] = ['-y', '@modelcontextprotocol/server-filesystem'] + paths
+            logging.warning(f"Could not list Ollama models: {e}")
+            # Keep the last good list and retry less often while the daemon is down
+            self._models_failures += 1
+            backoff = min(self.MODELS_TTL * 2 ** (self._models_failures - 1), self.MODELS_MAX_BACKOFF)
+            if self._models is None:
+                self._models = (self.DEFAULT_MODEL,)
+            self._models_expire_at = time.monotonic() + backoff
+            return
+
+        # Keep a usable selection when the daemon has no models
+        self._models = models or (self.DEFAULT_MODEL,)
+        self._models_failures = 0
+        self._models_expire_at = time.monotonic() + self.MODELS_TTL
+
+    def _refresh_models_in_background(self):
+        with self._models_lock:
+            if self._models_refreshing:
+                return
+            self._models_refreshing = True
+
+        def refresh():
+            try:
+                self._fetch_models()
+            finally:
+                self._models_refreshing = False
+
+        threading.Thread(target=refresh, name='ollama-model-refresh', daemon=True).start()
+
+    @property
+    def config_file(self) -> Optional[Path]:
+        """Path of the MCP config file in use, if one was found"""
+        return server_configs.get().path
+
+    @property
+    def mcp_config(self) -> Dict[str, Any]:
+        """MCP server configuration with environment overrides applied"""
+        return server_configs.get().raw
 
     def get_server_config(self, server_name: str) -> Optional[Dict[str, Any]]:
         """Get configuration for a specific server"""
@@ -99,5 +119,25 @@ class Config:
         """Get logging level"""
         return os.getenv('LOG_LEVEL', 'INFO')
 
+    @property
+    def log_file(self) -> str:
+        """Get log file path"""
+        return os.getenv('LOG_FILE', 'debug.log')
+
+    @property
+    def log_format(self) -> str:
+        """Get log line format: text or json"""
+        return os.getenv('LOG_FORMAT', 'text').lower()
+
+    @property
+    def log_sample_rate(self) -> float:
+        """Get the fraction of DEBUG records that are kept"""
+        return float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+
+    @property
+    def log_preview_chars(self) -> int:
+        """Get the size cap for logged payload previews"""
+        return int(os.getenv('LOG_PREVIEW_CHARS', '500'))
+
 # Create global config instance
 config = Config()
\ No newline at end of file
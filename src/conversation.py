@@ -0,0 +1,104 @@
+"""
+Conversation history kept in two forms at once.
+
+``messages`` is the display/history form used by the UI. ``wire`` is the
+already-formatted Ollama form (system prompt first), extended one message at a
+time, so a turn only converts the messages it adds. The wire list is only
+rewritten when the system prompt changes or the history has to be compacted,
+which keeps its prefix stable across turns for Ollama's prompt cache.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from .llm_helper import estimate_tokens, fit_to_budget, format_message
+
+# Compaction trims to this fraction of the budget so that the compacted prefix
+# stays unchanged for several turns before the budget is hit again
+COMPACT_TARGET = 0.75
+
+
+class Conversation:
+    """Chat history with an incrementally maintained Ollama payload"""
+
+    def __init__(self, system_prompt: Optional[str] = None):
+        self.messages: List[Dict[str, Any]] = []
+        self.wire: List[Dict[str, Any]] = []
+        # Id in the conversation store and how many messages it already holds
+        self.id: Optional[str] = None
+        self.saved = 0
+        self._system_prompt: Optional[str] = None
+        if system_prompt is not None:
+            self.set_system_prompt(system_prompt)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    @property
+    def system_prompt(self) -> Optional[str]:
+        return self._system_prompt
+
+    def set_system_prompt(self, prompt: str):
+        """Set the system prompt, leaving the wire form untouched if it is unchanged"""
+        if prompt == self._system_prompt:
+            return
+
+        system = {"role": "system", "content": prompt}
+        if self._system_prompt is None:
+            self.wire.insert(0, system)
+        else:
+            self.wire[0] = system
+        self._system_prompt = prompt
+
+    def append(self, message: Dict[str, Any]):
+        """Add a message to the history and its formatted form to the payload"""
+        self.messages.append(message)
+        formatted = format_message(message)
+        if formatted is not None:
+            self.wire.append(formatted)
+
+    def extend(self, messages: List[Dict[str, Any]]):
+        for message in messages:
+            self.append(message)
+
+    def clear(self):
+        """Drop all messages but keep the system prompt; the next save starts a new stored chat"""
+        self.messages.clear()
+        self.id = None
+        self.saved = 0
+        del self.wire[1 if self._system_prompt is not None else 0:]
+
+    def checkpoint(self) -> Tuple[int, List[Dict[str, Any]], int]:
+        """Marker to roll back to, e.g. taken before a turn starts"""
+        return len(self.messages), self.wire, len(self.wire)
+
+    def rollback(self, checkpoint: Tuple[int, List[Dict[str, Any]], int]):
+        """Drop the messages added since ``checkpoint``"""
+        count, wire, wire_count = checkpoint
+        del self.messages[count:]
+        if self.wire is wire:
+            del self.wire[wire_count:]
+        else:
+            # Compacted since; the next request compacts again if needed
+            self.rebuild()
+
+    def _formatted(self) -> List[Dict[str, Any]]:
+        wire = [m for m in map(format_message, self.messages) if m is not None]
+        if self._system_prompt is not None:
+            wire.insert(0, {"role": "system", "content": self._system_prompt})
+        return wire
+
+    def rebuild(self):
+        """Reformat the payload from scratch, e.g. after messages were edited"""
+        self.wire = self._formatted()
+
+    def compact(self, budget: int) -> bool:
+        """
+        Trim the payload once it exceeds ``budget`` tokens.
+
+        The payload is refitted from the full history rather than from the
+        previously compacted one, so it holds a single, fresh summary note.
+        The display history is never touched. Returns True if the payload changed.
+        """
+        if sum(estimate_tokens(m) for m in self.wire) <= budget:
+            return False
+        self.wire = list(fit_to_budget(self._formatted(), int(budget * COMPACT_TARGET)))
+        return True
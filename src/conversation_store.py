@@ -0,0 +1,176 @@
+"""
+Durable conversation store.
+
+Every chat is an append-only log of messages in an SQLite database in WAL
+mode, so saving a turn is one short transaction that never blocks readers,
+and chats survive app restarts. A Conversation remembers how many of its
+messages are already stored, so saving only writes the new ones. If another
+session appended to the same chat in the meantime (the link was opened twice),
+the save forks the chat under a new id instead of interleaving the two.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .conversation import Conversation
+from .server_config import PROJECT_ROOT
+
+DB_PATH = os.getenv('CONVERSATION_DB_PATH', str(PROJECT_ROOT / 'data' / 'conversations.db'))
+# Characters of the first user message used as a chat's title
+TITLE_CHARS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    owner TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated_at);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL REFERENCES conversations (id),
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _stored_form(message: Dict[str, Any]) -> str:
+    """JSON of a message without private keys such as cached token estimates"""
+    return json.dumps({k: v for k, v in message.items() if not k.startswith('_')})
+
+
+class ConversationStore:
+    """Append-only message log per conversation, one connection per thread"""
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL keeps committed data safe across app crashes with NORMAL sync
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_SCHEMA)
+        # Databases created before chats had owners
+        if 'owner' not in {row[1] for row in conn.execute('PRAGMA table_info(conversations)')}:
+            conn.execute('ALTER TABLE conversations ADD COLUMN owner TEXT')
+        self._local.conn = conn
+        return conn
+
+    def save(self, conversation: Conversation, owner: Optional[str] = None) -> bool:
+        """
+        Write the messages added since the last save.
+
+        A conversation without an id is created first, owned by ``owner``.
+        One that another session has appended to since it was loaded is
+        forked: all its messages go to a new chat and ``conversation.id``
+        changes. Returns False (and leaves the messages unsaved for the next
+        attempt) if the write failed.
+        """
+        new = conversation.messages[conversation.saved:]
+        if not new and conversation.id is not None:
+            return True
+
+        now = time.time()
+        conversation_id = conversation.id or uuid.uuid4().hex
+        first_seq = conversation.saved
+        try:
+            conn = self._connect()
+            with conn:
+                # Take the write lock before reading the stored length
+                conn.execute('BEGIN IMMEDIATE')
+                stored = None
+                if conversation.id is not None:
+                    (stored,) = conn.execute(
+                        'SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE conversation_id = ?',
+                        (conversation_id,),
+                    ).fetchone()
+                    if stored != conversation.saved:
+                        conversation_id = uuid.uuid4().hex
+                        logging.info(f"Chat {conversation.id} was changed by another session; "
+                                     f"continuing as {conversation_id}")
+                        new = conversation.messages
+                        first_seq = 0
+                        stored = None
+                if stored is None:
+                    conn.execute(
+                        'INSERT INTO conversations (id, owner, created_at, updated_at) VALUES (?, ?, ?, ?)',
+                        (conversation_id, owner, now, now),
+                    )
+                conn.executemany(
+                    'INSERT INTO messages (conversation_id, seq, role, body, created_at) VALUES (?, ?, ?, ?, ?)',
+                    [
+                        (conversation_id, first_seq + i, m['role'], _stored_form(m), now)
+                        for i, m in enumerate(new)
+                    ],
+                )
+                title = next((m['content'] for m in new if m['role'] == 'user'), None)
+                conn.execute(
+                    "UPDATE conversations SET updated_at = ?, "
+                    "title = CASE WHEN title = '' AND ? IS NOT NULL THEN ? ELSE title END WHERE id = ?",
+                    (now, title, (title or '')[:TITLE_CHARS], conversation_id),
+                )
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Could not save conversation {conversation_id}: {e}")
+            return False
+
+        conversation.id = conversation_id
+        conversation.saved = first_seq + len(new)
+        return True
+
+    def load(self, conversation_id: str, system_prompt: Optional[str] = None) -> Optional[Conversation]:
+        """The stored conversation, or None if there is no such id or it can't be read"""
+        try:
+            conn = self._connect()
+            if conn.execute('SELECT 1 FROM conversations WHERE id = ?', (conversation_id,)).fetchone() is None:
+                return None
+            rows = conn.execute(
+                'SELECT body FROM messages WHERE conversation_id = ? ORDER BY seq', (conversation_id,)
+            ).fetchall()
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Could not load conversation {conversation_id}: {e}")
+            return None
+
+        conversation = Conversation(system_prompt)
+        conversation.extend(json.loads(body) for (body,) in rows)
+        conversation.id = conversation_id
+        conversation.saved = len(rows)
+        return conversation
+
+    def recent(self, limit: int = 10, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recently updated conversations, newest first; only ``owner``'s if given"""
+        try:
+            if owner is None:
+                rows = self._connect().execute(
+                    'SELECT id, title, updated_at FROM conversations ORDER BY updated_at DESC LIMIT ?', (limit,)
+                ).fetchall()
+            else:
+                rows = self._connect().execute(
+                    'SELECT id, title, updated_at FROM conversations WHERE owner = ? '
+                    'ORDER BY updated_at DESC LIMIT ?', (owner, limit)
+                ).fetchall()
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Could not list conversations: {e}")
+            return []
+        return [{'id': id_, 'title': title, 'updated_at': updated} for id_, title, updated in rows]
+
+
+# Shared store used by the Streamlit app
+conversation_store = ConversationStore()
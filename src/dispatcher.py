@@ -0,0 +1,118 @@
+"""
+Concurrent tool dispatcher.
+
+Runs every tool call from one assistant message at the same time on a single
+event loop, with a timeout per call and a concurrency limit per MCP server.
+Results come back in the original call order.
+"""
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from .logging_config import Preview
+from .telemetry import span
+from .tool_result import ToolResult
+
+TOOL_TIMEOUT = float(os.getenv('TOOL_TIMEOUT', '30'))
+SERVER_CONCURRENCY = int(os.getenv('TOOL_SERVER_CONCURRENCY', '4'))
+
+
+@dataclass
+class ToolOutcome:
+    """Result of one tool call."""
+    name: str
+    arguments: Dict[str, Any]
+    content: str = ""
+    error: Optional[str] = None
+    # Spill handle of the full output when ``content`` was truncated
+    handle: Optional[str] = None
+
+    def to_message(self) -> Dict[str, Any]:
+        """History message fed back to the model."""
+        content = f"Error: {self.error}" if self.error else self.content
+        message = {'role': 'function', 'name': self.name, 'content': content}
+        if self.handle:
+            message['handle'] = self.handle
+        return message
+
+
+class ToolDispatcher:
+    """Dispatch tool calls to registered functions concurrently."""
+
+    def __init__(
+        self,
+        functions: Dict[str, Callable],
+        servers: Optional[Dict[str, str]] = None,
+        timeout: float = TOOL_TIMEOUT,
+        server_concurrency: int = SERVER_CONCURRENCY,
+    ):
+        """
+        Args:
+            functions: Tool name to callable (sync or async)
+            servers: Tool name to the MCP server it talks to; calls sharing a
+                     server share that server's concurrency limit
+            timeout: Seconds before a single tool call is abandoned; an MCP
+                     server start it was waiting on keeps going (see mcp_pool)
+            server_concurrency: Max in-flight calls per server
+        """
+        self.functions = functions
+        self.servers = servers or {}
+        self.timeout = timeout
+        self.server_concurrency = server_concurrency
+
+    async def dispatch(self, tool_calls: List[Dict[str, Any]]) -> List[ToolOutcome]:
+        """Run all tool calls concurrently and return outcomes in call order."""
+        # Semaphores belong to the running loop, so build them per dispatch
+        limits: Dict[str, asyncio.Semaphore] = {}
+        for tool_call in tool_calls:
+            server = self._server_for(tool_call['function']['name'])
+            limits.setdefault(server, asyncio.Semaphore(self.server_concurrency))
+
+        with span('tool.dispatch', calls=len(tool_calls)):
+            return await asyncio.gather(*(
+                self._run_one(tool_call, limits[self._server_for(tool_call['function']['name'])])
+                for tool_call in tool_calls
+            ))
+
+    def _server_for(self, name: str) -> str:
+        return self.servers.get(name, name)
+
+    async def _run_one(self, tool_call: Dict[str, Any], limit: asyncio.Semaphore) -> ToolOutcome:
+        name = tool_call['function']['name']
+        arguments = tool_call['function']['arguments']
+
+        try:
+            # Parse arguments if they're a string
+            args = arguments if isinstance(arguments, dict) else json.loads(arguments)
+        except (TypeError, ValueError) as e:
+            return ToolOutcome(name, {}, error=f"Invalid arguments: {e}")
+
+        func = self.functions.get(name)
+        if func is None:
+            return ToolOutcome(name, args, error=f"Unknown tool '{name}'")
+
+        logging.debug("Calling %s with args: %s", name, Preview(args))
+        try:
+            with span(f"tool.{name}"):
+                async with limit:
+                    if asyncio.iscoroutinefunction(func):
+                        response = await asyncio.wait_for(func(**args), self.timeout)
+                    else:
+                        response = await asyncio.wait_for(asyncio.to_thread(func, **args), self.timeout)
+        except asyncio.TimeoutError:
+            logging.error(f"Tool {name} timed out after {self.timeout}s")
+            return ToolOutcome(name, args, error=f"Timed out after {self.timeout:g}s")
+        except Exception as e:
+            logging.error(f"Tool {name} failed: {str(e)}", exc_info=True)
+            return ToolOutcome(name, args, error=str(e))
+
+        if isinstance(response, dict) and 'error' in response:
+            return ToolOutcome(name, args, error=str(response['error']))
+
+        logging.debug("Function %s response: %s", name, Preview(response))
+        if isinstance(response, ToolResult):
+            return ToolOutcome(name, args, content=str(response), handle=response.handle)
+        return ToolOutcome(name, args, content=str(response))
@@ -0,0 +1,268 @@
+"""
+Turn engine: runs one assistant turn against Ollama.
+
+The first generation pass is always streamed; tool calls are picked up from
+the stream chunks, so a plain chat turn costs exactly one model call. Further
+calls are only made when tool results have to be fed back to the model.
+
+Everything here is async and meant to run on one long-lived event loop (see
+``src.runtime.BackgroundLoop``), so the Ollama client, the tool calls and the
+MCP sessions they use are shared across turns instead of being rebuilt by a
+fresh ``asyncio.run`` each time.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .conversation import Conversation
+from .dispatcher import ToolOutcome
+from .llm_helper import achat, prompt_budget
+from .logging_config import Preview
+from .response_cache import ResponseCache
+from .runtime import CancelToken
+from .scheduler import request_scheduler
+from .tool_cache import record_calls
+from .telemetry import OLLAMA_STATS, current_trace, span
+
+# Bounds on tool rounds within a single turn
+MAX_TOOL_ROUNDS = int(os.getenv('TOOL_MAX_ROUNDS', '5'))
+TURN_TIME_BUDGET = float(os.getenv('TURN_TIME_BUDGET', '120'))
+
+# Characters per token event when a cached answer is replayed
+REPLAY_CHUNK_CHARS = 24
+
+# Shown when the model's last word was a tool call the turn can no longer run
+TOOLS_STOPPED_NOTICE = "(Stopped calling tools without reaching an answer.)"
+
+# Runs tool calls concurrently and returns one outcome per call, in order
+ToolExecutor = Callable[[List[Dict[str, Any]]], Awaitable[List[ToolOutcome]]]
+
+
+@dataclass
+class TurnEvent:
+    """A single event emitted while a turn is running.
+
+    Types:
+    - token:       a piece of streamed assistant text (``content``)
+    - assistant:   a complete assistant message to append to history (``message``)
+    - tool_result: a 'function' message with a tool's output (``message``)
+    - tool_error:  a failed tool call (``content``); the error is fed back to
+                   the model as a 'function' message (``message``)
+    - queued:      waiting for a free Ollama slot; ``content`` is the queue position
+    - cached:      the turn is replayed from the response cache; nothing is generated
+    """
+    type: str
+    content: str = ""
+    message: Dict[str, Any] = field(default_factory=dict)
+
+
+def _tool_call_to_dict(tool_call) -> Dict[str, Any]:
+    """Convert an ollama ToolCall (or dict) into a plain history dict."""
+    function = tool_call['function']
+    return {
+        'function': {
+            'name': function['name'],
+            'arguments': dict(function['arguments'] or {}),
+        }
+    }
+
+
+async def _until_cancelled(items: AsyncIterator[Any], cancel: Optional[CancelToken]) -> AsyncIterator[Any]:
+    """``async for`` over ``items`` that stops waiting the moment ``cancel`` fires"""
+    if cancel is None:
+        async for item in items:
+            yield item
+        return
+    while True:
+        try:
+            item = await cancel.guard(items.__anext__())
+        except StopAsyncIteration:
+            return
+        yield item
+
+
+async def stream_completion(
+    conversation: Conversation,
+    model,
+    tools=None,
+    cancel: Optional[CancelToken] = None,
+) -> AsyncIterator[TurnEvent]:
+    """
+    Stream a single generation pass over the conversation's wire form.
+
+    Yields ``queued`` events while waiting for a scheduler slot, a ``token``
+    event per content chunk, and finishes with one ``assistant`` event
+    carrying the full text and any detected tool calls. Raises
+    SchedulerOverloaded if Ollama is too busy to take the request, and
+    TurnCancelled (after closing the HTTP stream) once ``cancel`` fires.
+    """
+    # Compact before the payload outgrows the context window
+    conversation.compact(prompt_budget(model, tools))
+
+    parts = []
+    tool_calls = []
+
+    # The slot is held for the whole stream and freed before tools run
+    ticket = request_scheduler.submit(model)
+    stream = None
+    try:
+        if not ticket.granted:
+            with span('llm.queue', model=model):
+                async for position in _until_cancelled(ticket.wait(), cancel):
+                    yield TurnEvent('queued', content=str(position))
+
+        with span('llm.stream', model=model, tools=len(tools or [])) as stream_span:
+            request = achat(conversation.wire, model=model, tools=tools, stream=True, formatted=True, ticket=ticket)
+            stream = await (cancel.guard(request) if cancel is not None else request)
+            async for chunk in _until_cancelled(stream, cancel):
+                message = chunk['message']
+                content = message.get('content')
+                if content:
+                    if not parts and stream_span:
+                        current_trace().add('llm.first_token', stream_span.start, time.perf_counter())
+                    parts.append(content)
+                    yield TurnEvent('token', content=content)
+                if message.get('tool_calls'):
+                    tool_calls.extend(_tool_call_to_dict(tc) for tc in message['tool_calls'])
+                if chunk.get('done') and stream_span:
+                    # Ollama's own timings for this generation
+                    stream_span.attrs.update({k: chunk.get(k) for k in OLLAMA_STATS if chunk.get(k) is not None})
+    finally:
+        # Closing the response drops the connection, which stops Ollama generating
+        if stream is not None and hasattr(stream, 'aclose'):
+            await stream.aclose()
+        ticket.release()
+
+    assistant_message = {'role': 'assistant', 'content': ''.join(parts)}
+    if tool_calls:
+        assistant_message['tool_calls'] = tool_calls
+    yield TurnEvent('assistant', message=assistant_message)
+
+
+async def _replay(conversation: Conversation, messages: List[Dict[str, Any]]) -> AsyncIterator[TurnEvent]:
+    """Append a cached turn's messages, emitting the events a live turn would"""
+    yield TurnEvent('cached')
+    for message in messages:
+        if message['role'] == 'assistant':
+            content = message.get('content') or ''
+            for start in range(0, len(content), REPLAY_CHUNK_CHARS):
+                yield TurnEvent('token', content=content[start:start + REPLAY_CHUNK_CHARS])
+                # Let the consumer render as it would for a live stream
+                await asyncio.sleep(0)
+            conversation.append(message)
+            yield TurnEvent('assistant', message=message)
+        else:
+            conversation.append(message)
+            yield TurnEvent('tool_result', message=message)
+
+
+async def run_turn(
+    conversation: Conversation,
+    model: str,
+    tools: Optional[List[Dict[str, Any]]] = None,
+    execute_tools: Optional[ToolExecutor] = None,
+    max_rounds: int = MAX_TOOL_ROUNDS,
+    time_budget: float = TURN_TIME_BUDGET,
+    cancel: Optional[CancelToken] = None,
+    cache: Optional[ResponseCache] = None,
+    refresh_cache: bool = False,
+) -> AsyncIterator[TurnEvent]:
+    """
+    Run one assistant turn, streaming events as they happen.
+
+    The model may call tools over several rounds; each round's results are fed
+    back with the tools still available, and the turn ends as soon as the model
+    answers without calling a tool. Once ``max_rounds`` tool rounds have run or
+    ``time_budget`` seconds have passed, one last pass is made without tools so
+    the model has to answer with what it has. Tool calls that can't be run
+    (in that last pass, or without ``execute_tools``) are dropped from the
+    answer, and failed calls are fed back to the model as errors.
+
+    Messages produced by the turn are appended to ``conversation`` before the
+    matching event is yielded; callers only render them. A turn that does not
+    finish (cancelled, closed early or failed) is rolled back, so history never
+    holds half a turn.
+
+    Args:
+        conversation: Conversation so far, ending with the user's message
+        model: Name of the Ollama model to use
+        tools: Optional list of tool definitions
+        execute_tools: Coroutine function that runs tool calls, e.g.
+                       ``ToolDispatcher.dispatch``
+        max_rounds: Max rounds of tool calls in this turn
+        time_budget: Seconds after which no further tool round is started
+        cancel: Token that aborts the model stream and pending tool calls,
+                raising TurnCancelled
+        cache: Response cache to replay an identical earlier turn from, and
+               to store this one in if it completes without tool errors or
+               tool calls with side effects
+        refresh_cache: Run the turn even on a cache hit, replacing the entry
+    """
+    deadline = time.monotonic() + time_budget
+    rounds = 0
+    final = False
+    failed = False
+    checkpoint = conversation.checkpoint()
+    # MCP calls made by this turn's tools, to tell whether it may be replayed
+    mcp_calls: List[Tuple[str, str]] = []
+
+    try:
+        key = None
+        if cache is not None and cache.enabled:
+            key = cache.key(model, conversation.system_prompt, tools, conversation.messages)
+            cached = None if refresh_cache else cache.get(key)
+            if cached is not None:
+                with span('cache.replay', messages=len(cached)):
+                    async for event in _replay(conversation, cached):
+                        yield event
+                return
+
+        while True:
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+
+            assistant_message = None
+            async for event in stream_completion(conversation, model, tools=tools, cancel=cancel):
+                if event.type == 'assistant':
+                    assistant_message = event.message
+                    if assistant_message.get('tool_calls') and (final or execute_tools is None):
+                        # Calls without results would leave the history waiting on them
+                        dropped = assistant_message.pop('tool_calls')
+                        logging.warning(f"Dropped {len(dropped)} tool call(s) the turn can no longer run")
+                        if not assistant_message['content']:
+                            assistant_message['content'] = TOOLS_STOPPED_NOTICE
+                            yield TurnEvent('token', content=TOOLS_STOPPED_NOTICE)
+                    conversation.append(assistant_message)
+                yield event
+
+            tool_calls = assistant_message.get('tool_calls')
+            if not tool_calls:
+                if key is not None and not failed:
+                    cache.put(key, conversation.messages[checkpoint[0]:], mcp_calls)
+                return
+
+            with record_calls(mcp_calls):
+                execution = execute_tools(tool_calls)
+                outcomes = await (cancel.guard(execution) if cancel is not None else execution)
+            for outcome in outcomes:
+                result = outcome.to_message()
+                conversation.append(result)
+                if outcome.error:
+                    failed = True
+                    logging.error("Error details - Args: %s, Error: %s", Preview(outcome.arguments), outcome.error)
+                    yield TurnEvent('tool_error', content=f"Error executing {outcome.name}: {outcome.error}", message=result)
+                else:
+                    yield TurnEvent('tool_result', message=result)
+
+            rounds += 1
+            if rounds >= max_rounds or time.monotonic() >= deadline:
+                logging.info("Tool loop stopped after %d rounds (limit %d, budget %gs)", rounds, max_rounds, time_budget)
+                # Without tools the next pass has to be the final answer
+                tools = None
+                final = True
+    except BaseException:
+        conversation.rollback(checkpoint)
+        raise
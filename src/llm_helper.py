@@ -1,45 +1,419 @@
+import asyncio
 import json
+import logging
+import os
+import threading
+import time
+import weakref
+
+import httpx
 import ollama
 
-def chat(messages, model, tools=None, stream=True):
+from .logging_config import Preview
+from .scheduler import request_scheduler
+from .telemetry import span
+
+def _parse_keep_alive(value):
+    """Numbers become seconds; durations like '30m' are passed through as-is"""
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+# Ollama connection management
+REQUEST_TIMEOUT = float(os.getenv('OLLAMA_REQUEST_TIMEOUT', '300'))
+CONNECT_TIMEOUT = float(os.getenv('OLLAMA_CONNECT_TIMEOUT', '5'))
+MAX_CONNECTIONS = int(os.getenv('OLLAMA_MAX_CONNECTIONS', '10'))
+CONNECTION_IDLE_TIMEOUT = float(os.getenv('OLLAMA_CONNECTION_IDLE_TIMEOUT', '120'))
+
+# How long Ollama keeps a model loaded after a request (seconds or a duration
+# like '30m'; -1 keeps it loaded indefinitely)
+KEEP_ALIVE = _parse_keep_alive(os.getenv('OLLAMA_KEEP_ALIVE', '30m'))
+# Seconds before a failed model preload is attempted again
+WARMUP_RETRY_INTERVAL = 30
+
+# Context budgeting
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+DEFAULT_CONTEXT_TOKENS = 4096
+RESPONSE_RESERVE_TOKENS = int(os.getenv('CONTEXT_RESPONSE_RESERVE', '1024'))
+KEEP_RECENT_MESSAGES = int(os.getenv('CONTEXT_KEEP_RECENT', '6'))
+OLD_TOOL_OUTPUT_TOKENS = int(os.getenv('CONTEXT_OLD_TOOL_OUTPUT_TOKENS', '256'))
+
+# Context window per model family; CONTEXT_BUDGET_TOKENS overrides all of them
+MODEL_CONTEXT_TOKENS = {
+    'llama3.1': 8192,
+    'llama3.2': 8192,
+    'qwen2.5': 8192,
+    'mistral': 8192,
+    'deepseek-r1': 8192,
+    'llama2': 4096,
+    'codellama': 4096,
+}
+
+def context_budget(model):
+    """Prompt token budget for a model, leaving room for the response"""
+    if os.getenv('CONTEXT_BUDGET_TOKENS'):
+        window = int(os.getenv('CONTEXT_BUDGET_TOKENS'))
+    else:
+        family = model.split('/')[-1].split(':')[0]
+        window = MODEL_CONTEXT_TOKENS.get(family, DEFAULT_CONTEXT_TOKENS)
+    return max(window - RESPONSE_RESERVE_TOKENS, 0)
+
+def prompt_budget(model, tools=None):
+    """Token budget left for messages once the tool schemas are accounted for"""
+    budget = context_budget(model)
+    if tools:
+        budget -= len(json.dumps(tools)) // CHARS_PER_TOKEN
+    return budget
+
+def format_message(msg):
+    """Ollama wire form of a history message, or None for roles Ollama doesn't take"""
+    if msg["role"] in ["user", "assistant", "system"]:
+        return {
+            "role": msg["role"],
+            "content": msg["content"]
+        }
+    elif msg["role"] == "function":
+        # Convert function messages to user messages
+        return {
+            "role": "user",
+            "content": f"Function {msg.get('name', 'unknown')} returned: {msg['content']}",
+            "_tool_output": True
+        }
+    return None
+
+def _is_tool_output(msg):
+    return msg['role'] == 'function' or msg.get('_tool_output', False)
+
+def estimate_tokens(message):
     """
-    Chat with the Ollama model.
-    
-    Args:
-        messages: List of message dictionaries
-        model: Name of the Ollama model to use
-        tools: Optional list of tool definitions
-        stream: Whether to stream the response
+    Rough token count for a message.
+
+    The estimate is cached on the message dict and reused until its content changes.
+    """
+    content = message.get('content') or ''
+    cached = message.get('_token_estimate')
+    # Keyed on the content itself (a reference, not a copy), so any edit is
+    # noticed; comparing the same string object is immediate
+    if cached and cached[0] == content:
+        return cached[1]
+
+    tokens = len(content) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+    if isinstance(message, dict):
+        message['_token_estimate'] = (content, tokens)
+    return tokens
+
+def _truncate_content(message, max_tokens):
+    """Copy of a message with its content cut to head and tail around an omission marker"""
+    content = message.get('content') or ''
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(content) <= max_chars:
+        return message
+
+    head = content[:max_chars * 2 // 3]
+    tail = content[-(max_chars // 3):] if max_chars >= 3 else ''
+    omitted = len(content) - len(head) - len(tail)
+    truncated = dict(message)
+    truncated['content'] = f"{head}\n[... {omitted} characters omitted ...]\n{tail}"
+    truncated.pop('_token_estimate', None)
+    return truncated
+
+def _summarize_dropped(dropped):
+    """
+    Short note standing in for messages dropped from the context.
+
+    Earlier notes among ``dropped`` are merged in, so there is only ever one.
+    """
+    count, questions = 0, []
+    for msg in dropped:
+        if msg.get('_summary'):
+            earlier_count, earlier_questions = msg['_summary']
+            count += earlier_count
+            questions += earlier_questions
+            continue
+        count += 1
+        if msg['role'] == 'user' and msg.get('content'):
+            questions.append(" ".join(msg['content'].split())[:80])
+    questions = questions[-5:]
+    note = f"[{count} earlier messages omitted to fit the context window."
+    if questions:
+        note += " Earlier user requests: " + "; ".join(questions)
+    return {"role": "system", "content": note + "]", "_summary": (count, questions)}
+
+def fit_to_budget(messages, budget):
+    """
+    Trim a conversation to fit a token budget.
+
+    The leading system prompt and the most recent KEEP_RECENT_MESSAGES are kept.
+    Older tool outputs are truncated first; if that is not enough, the oldest
+    messages, and any later system messages (e.g. an earlier summary), are
+    replaced by a single one-line summary, and as a last resort recent tool
+    outputs are truncated too. Logs a warning if the result is still over budget.
     """
+    total = sum(estimate_tokens(msg) for msg in messages)
+    if total <= budget:
+        return messages
+
+    fitted = list(messages)
+    recent_start = max(len(fitted) - KEEP_RECENT_MESSAGES, 0)
+    # The system prompt at the top is never dropped
+    prompt_end = 1 if fitted and fitted[0]['role'] == 'system' and not fitted[0].get('_summary') else 0
+
+    # 1. Shrink old tool outputs
+    for i in range(recent_start):
+        if total <= budget:
+            break
+        if _is_tool_output(fitted[i]):
+            short = _truncate_content(fitted[i], OLD_TOOL_OUTPUT_TOKENS)
+            total -= estimate_tokens(fitted[i]) - estimate_tokens(short)
+            fitted[i] = short
+
+    # 2. Drop the oldest messages and later system messages behind one summary note
+    if total > budget:
+        dropped = []
+        note = None
+        candidates = [
+            i for i in range(prompt_end, len(fitted))
+            if i < recent_start or fitted[i]['role'] == 'system'
+        ]
+        for i in candidates:
+            # The note itself counts against the budget
+            if total + (estimate_tokens(note) if note else 0) <= budget:
+                break
+            total -= estimate_tokens(fitted[i])
+            dropped.append(fitted[i])
+            fitted[i] = None
+            note = _summarize_dropped(dropped)
+        if note:
+            total += estimate_tokens(note)
+            keep = [msg for msg in fitted[prompt_end:] if msg is not None]
+            fitted = fitted[:prompt_end] + [note] + keep
+
+    # 3. Shrink recent tool outputs, largest first
+    if total > budget:
+        order = sorted(
+            (i for i, msg in enumerate(fitted) if _is_tool_output(msg)),
+            key=lambda i: estimate_tokens(fitted[i]),
+            reverse=True
+        )
+        for i in order:
+            if total <= budget:
+                break
+            excess = total - budget
+            target = max(estimate_tokens(fitted[i]) - excess, OLD_TOOL_OUTPUT_TOKENS)
+            short = _truncate_content(fitted[i], target)
+            total -= estimate_tokens(fitted[i]) - estimate_tokens(short)
+            fitted[i] = short
+
+    if total > budget:
+        logging.warning(f"History is still {total} tokens after trimming, over the budget of {budget}")
+    return fitted
+
+def _build_payload(messages, model, tools, stream, budget, formatted):
+    """Format and fit the messages, then build the Ollama chat request."""
     # Ensure all messages are correctly formatted
-    formatted_messages = []
-    for msg in messages:
-        if msg["role"] in ["user", "assistant", "system"]:
-            formatted_messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
-        elif msg["role"] == "function":
-            # Convert function messages to user messages
-            formatted_messages.append({
-                "role": "user",
-                "content": f"Function {msg.get('name', 'unknown')} returned: {msg['content']}"
-            })
+    if not formatted:
+        messages = [m for m in map(format_message, messages) if m is not None]
+
+    # Fit the history to the model's context window
+    if budget is None:
+        budget = prompt_budget(model, tools)
+    messages = fit_to_budget(messages, budget)
 
     # Prepare the request payload
     payload = {
         "model": model,
-        "messages": formatted_messages,
-        "stream": stream
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": KEEP_ALIVE
     }
 
     if tools:
         payload["tools"] = tools
 
-    # Print the payload for debugging (can be removed in production)
-    print(f"Payload sent to Ollama: {json.dumps(payload, indent=2)}")
+    # Previews are only rendered if the record is emitted
+    logging.debug(
+        "Ollama chat request: model=%s messages=%d tools=%d stream=%s payload=%s",
+        model, len(messages), len(tools or []), stream, Preview(messages)
+    )
+    return payload
+
+def _keep_alive_seconds(value):
+    """Approximate seconds a model stays loaded; negative means forever"""
+    if isinstance(value, (int, float)):
+        return value
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    try:
+        return float(value[:-1]) * units[value[-1]]
+    except (KeyError, ValueError, IndexError):
+        return 300
+
+def _client_options():
+    """httpx settings shared by the sync and async clients"""
+    return {
+        'timeout': httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        'limits': httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_CONNECTIONS,
+            keepalive_expiry=CONNECTION_IDLE_TIMEOUT,
+        ),
+    }
+
+_client = None
+_client_lock = threading.Lock()
+
+def client() -> ollama.Client:
+    """Process-wide Ollama client with a persistent connection pool"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ollama.Client(**_client_options())
+    return _client
+
+# One AsyncClient per event loop; its connection pool is bound to the loop
+_async_clients = weakref.WeakKeyDictionary()
+
+def async_client() -> ollama.AsyncClient:
+    """Shared AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = ollama.AsyncClient(**_client_options())
+    return client
+
+def _release_after(stream, ticket):
+    try:
+        yield from stream
+    finally:
+        ticket.release()
+
+async def _arelease_after(stream, ticket):
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        ticket.release()
+
+def chat(messages, model, tools=None, stream=True, budget=None, formatted=False, ticket=None):
+    """
+    Chat with the Ollama model.
+    
+    Args:
+        messages: List of message dictionaries
+        model: Name of the Ollama model to use
+        tools: Optional list of tool definitions
+        stream: Whether to stream the response
+        budget: Message token budget, defaults to prompt_budget(model, tools)
+        formatted: Messages are already in wire form (see Conversation.wire)
+        ticket: Scheduler slot already held (and later released) by the caller;
+                without one, the request waits for a slot of its own
+    """
+    payload = _build_payload(messages, model, tools, stream, budget, formatted)
+
+    # Wait for a free slot for this model, unless the caller holds one
+    own = request_scheduler.acquire_sync(model) if ticket is None else None
+    try:
+        with span('llm.request', model=model, messages=len(payload['messages'])):
+            response = client().chat(**payload)
+    except BaseException:
+        if own is not None:
+            own.release()
+        raise
+    _mark_loaded(model)
+
+    if own is None:
+        return response
+    if stream:
+        # The slot is held until the stream is consumed
+        return _release_after(response, own)
+    own.release()
+    return response
+
+async def achat(messages, model, tools=None, stream=True, budget=None, formatted=False, ticket=None):
+    """
+    Async version of chat() using the loop's shared AsyncClient.
+
+    With ``stream=True`` the awaited result is an async iterator of chunks.
+    """
+    payload = _build_payload(messages, model, tools, stream, budget, formatted)
+
+    own = await request_scheduler.acquire(model) if ticket is None else None
+    try:
+        with span('llm.request', model=model, messages=len(payload['messages'])):
+            response = await async_client().chat(**payload)
+    except BaseException:
+        if own is not None:
+            own.release()
+        raise
+    _mark_loaded(model)
 
-    # Make the API call
-    response = ollama.chat(**payload)
+    if own is None:
+        return response
+    if stream:
+        return _arelease_after(response, own)
+    own.release()
+    return response
+
+# Model warmup: model -> (state, monotonic time of the last state change)
+_model_states = {}
+_model_states_lock = threading.Lock()
+
+def _mark_loaded(model):
+    """Any request resets the model's keep_alive timer on the server"""
+    with _model_states_lock:
+        _model_states[model] = ('ready', time.monotonic())
+
+def _current_state(state):
+    if state is None:
+        return None
+    name, since = state
+    age = time.monotonic() - since
+    seconds = _keep_alive_seconds(KEEP_ALIVE)
+    # Ollama has probably unloaded it since
+    if name == 'ready' and 0 <= seconds < age:
+        return None
+    # Retry failed loads, but not on every rerun
+    if name == 'failed' and age > WARMUP_RETRY_INTERVAL:
+        return None
+    return name
+
+def model_state(model):
+    """'loading', 'ready', 'failed', or None if the model is presumably not loaded"""
+    with _model_states_lock:
+        return _current_state(_model_states.get(model))
+
+def preload_model(model):
+    """Load a model into Ollama's memory and block until it is ready"""
+    with _model_states_lock:
+        _model_states[model] = ('loading', time.monotonic())
+    try:
+        # An empty prompt only loads the model
+        client().generate(model=model, keep_alive=KEEP_ALIVE)
+    except Exception as e:
+        logging.warning(f"Could not preload model {model}: {e}")
+        with _model_states_lock:
+            _model_states[model] = ('failed', time.monotonic())
+        return False
+    _mark_loaded(model)
+    logging.info(f"Model {model} loaded (keep_alive={KEEP_ALIVE})")
+    return True
+
+def warm_model(model):
+    """
+    Start loading ``model`` in the background unless it is loaded or loading.
+
+    Returns the model's state after the call, so callers can show progress.
+    """
+    with _model_states_lock:
+        state = _current_state(_model_states.get(model))
+        if state is not None:
+            return state
+        _model_states[model] = ('loading', time.monotonic())
 
-    return response
\ No newline at end of file
+    threading.Thread(target=preload_model, args=(model,), name='ollama-warmup', daemon=True).start()
+    return 'loading'
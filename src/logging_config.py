@@ -0,0 +1,169 @@
+"""
+Logging setup driven by Config.log_level / Config.debug.
+
+Records are handed to a queue and written to the log file by a background
+listener thread, so request handling never blocks on disk I/O. DEBUG records
+can be sampled, and large objects are logged through Preview(), which renders
+a size-capped summary only when a record is actually emitted.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+from typing import Any, Optional
+
+DEFAULT_PREVIEW_CHARS = 500
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_preview_chars = DEFAULT_PREVIEW_CHARS
+
+
+class Preview:
+    """
+    Lazy, size-capped rendering of a large object for log arguments.
+
+    ``logging.debug("payload %s", Preview(payload))`` costs nothing unless the
+    record is emitted, and then at most ``limit`` characters are produced
+    without serializing the whole object first.
+    """
+
+    def __init__(self, obj: Any, limit: Optional[int] = None):
+        self.obj = obj
+        self.limit = limit
+
+    def __str__(self) -> str:
+        limit = self.limit or _preview_chars
+        parts = []
+        size = _render(self.obj, parts, limit)
+        text = "".join(parts)
+        if size > limit:
+            text = f"{text[:limit]}... [truncated]"
+        return text
+
+    __repr__ = __str__
+
+
+def _render(obj: Any, parts: list, budget: int) -> int:
+    """Append a JSON-ish rendering of obj to parts, stopping once budget is spent"""
+    written = sum(len(p) for p in parts)
+    if written > budget:
+        return written
+
+    if isinstance(obj, dict):
+        parts.append("{")
+        for i, (key, value) in enumerate(obj.items()):
+            if i:
+                parts.append(", ")
+            parts.append(f"{json.dumps(str(key))}: ")
+            if _render(value, parts, budget) > budget:
+                return budget + 1
+        parts.append("}")
+    elif isinstance(obj, (list, tuple)):
+        parts.append("[")
+        for i, value in enumerate(obj):
+            if i:
+                parts.append(", ")
+            if _render(value, parts, budget) > budget:
+                return budget + 1
+        parts.append("]")
+    elif isinstance(obj, str):
+        # Never copy more of a long string than the budget allows
+        parts.append(json.dumps(obj[:budget + 1 - written]))
+    else:
+        parts.append(str(obj)[:budget + 1 - written])
+    return sum(len(p) for p in parts)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of DEBUG records; INFO and above always pass"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra`` fields"""
+
+    _RESERVED = set(vars(logging.makeLogRecord({})))
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED and key != 'message':
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps a record's traceback apart from its message.
+
+    The stock prepare() formats the traceback into ``msg`` and drops it, so
+    the file formatter could no longer put it in its own field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            # Traceback objects hold whole frames; only their text crosses the queue
+            record.exc_text = record.exc_text or _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exc_formatter = logging.Formatter()
+
+
+def setup_logging(config) -> None:
+    """Configure the root logger once per process; later calls are no-ops"""
+    global _listener, _preview_chars
+    if _listener is not None:
+        return
+
+    level = logging.DEBUG if config.debug else getattr(logging, config.log_level.upper(), logging.INFO)
+    _preview_chars = config.log_preview_chars
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        config.log_file, maxBytes=10 * 1024 * 1024, backupCount=3
+    )
+    if config.log_format == 'json':
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+        formatter.converter = time.gmtime
+        file_handler.setFormatter(formatter)
+
+    # The caller only enqueues; the listener thread does the file I/O
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(config.log_sample_rate))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
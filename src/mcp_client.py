@@ -2,11 +2,42 @@
 Dynamic MCP (Model Context Protocol) client that provides access to various server capabilities.
 """
 import json
-import os
-import platform
-from pathlib import Path
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from mcp import StdioServerParameters
+from mcp.types import CallToolResult
+from .mcp_pool import session_pool
+from .mcp_warmup import server_warmup
+from .server_config import candidate_paths, server_configs
+from .telemetry import span
+from .tool_cache import note_call, tool_cache
+from .tool_result import ToolResult
+
+def _server_params(server: str) -> StdioServerParameters:
+    """Resolved launch parameters for an enabled server, or ValueError"""
+    snapshot = server_configs.get()
+    if snapshot.path is None:
+        paths_checked = '\n'.join(str(p) for p in candidate_paths())
+        raise ValueError(f"No configuration file found. Checked:\n{paths_checked}")
+
+    servers = snapshot.servers
+    if not server:
+        raise ValueError("Server parameter required for tool operations")
+    if server not in servers:
+        raise ValueError(f"Server {server} not found")
+    if not servers[server].enabled:
+        raise ValueError(f"Server {server} is disabled in configuration")
+    return servers[server].params
+
+async def call_tool(server: str, tool: str, arguments: dict = None) -> CallToolResult:
+    """
+    Call a tool on a pooled server session and return the raw result.
+
+    Unlike mcp(), errors are raised rather than returned as strings.
+    """
+    params = _server_params(server)
+    return await session_pool.call(
+        server, params,
+        lambda session: session.call_tool(tool, arguments=arguments or {})
+    )
 
 async def mcp(server: str = None, tool: str = None, arguments: dict = None):
     """
@@ -20,88 +51,56 @@ async def mcp(server: str = None, tool: str = None, arguments: dict = None):
         arguments: Dictionary of tool-specific arguments
     
     Returns:
-        Tool execution results or discovery information
+        A size-capped ToolResult for tool calls, or a string with discovery
+        information or an error
     """
     try:
-        # Check multiple config locations
-        possible_paths = [
-            Path('mcp_config.json'),  # Current directory
-            Path.home() / '.config' / 'autogen' / 'mcp_config.json',  # User config dir
-            Path(os.getenv('MCP_CONFIG_PATH', 'mcp_config.json')),  # Environment variable
-        ]
-
-        config_path = None
-        for path in possible_paths:
-            if path.exists():
-                config_path = path
-                break
-
-        if not config_path:
-            paths_checked = '\n'.join(str(p) for p in possible_paths)
-            return f"Error: No configuration file found. Checked:\n{paths_checked}"
-
-        # Get system-specific npx path
-        system = platform.system()
-        if system == "Darwin":  # macOS
-            default_npx = Path("/opt/homebrew/bin/npx")
-        elif system == "Windows":
-            default_npx = Path(os.getenv("APPDATA")) / "npm/npx.cmd"
-        else:  # Linux and others
-            default_npx = Path("/usr/local/bin/npx")
-
-        # Find npx in PATH if default doesn't exist
-        npx_path = str(default_npx if default_npx.exists() else "npx")
-
-        # Load config
-        with open(config_path) as f:
-            config_data = json.load(f)
-            servers = config_data.get('mcpServers', {})
-
         # Handle list_available_servers
         if tool == 'list_available_servers':
-            enabled_servers = [name for name, cfg in servers.items() if cfg.get('enabled', True)]
+            snapshot = server_configs.get()
+            if snapshot.path is None:
+                paths_checked = '\n'.join(str(p) for p in candidate_paths())
+                return f"Error: No configuration file found. Checked:\n{paths_checked}"
+            enabled_servers = [name for name, srv in snapshot.servers.items() if srv.enabled]
             return json.dumps(enabled_servers, indent=2)
 
-        # Validate server
-        if not server:
-            return "Error: Server parameter required for tool operations"
-        if server not in servers:
-            return f"Error: Server {server} not found"
-        if not servers[server].get('enabled', True):
-            return f"Error: Server {server} is disabled in configuration"
-
-        # Build server connection
-        config = servers[server]
-        command = npx_path if config['command'] == 'npx' else config['command']
-        env = os.environ.copy()
-        env.update(config.get('env', {}))
-
-        arguments = arguments or {}
+        # Resolved config is cached and reloaded only when the file changes
+        params = _server_params(server)
 
-        # Connect to server and execute tool
-        async with stdio_client(StdioServerParameters(
-            command=command,
-            args=config.get('args', []),
-            env=env
-        )) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
+        # Handle tool_details
+        if tool == 'tool_details':
+            # Served from the startup warmup when the server is already up
+            tools = server_warmup.tools(server, params)
+            if tools is None:
+                result = await session_pool.call(server, params, lambda session: session.list_tools())
+                tools = result.tools
+            return json.dumps([{
+                'name': t.name,
+                'description': t.description,
+                'input_schema': t.inputSchema
+            } for t in tools], indent=2)
 
-                # Handle tool_details
-                if tool == 'tool_details':
-                    result = await session.list_tools()
-                    return json.dumps([{
-                        'name': t.name,
-                        'description': t.description,
-                        'input_schema': t.inputSchema
-                    } for t in result.tools], indent=2)
+        # Execute requested tool
+        if not tool:
+            return "Error: Tool name required"
 
-                # Execute requested tool
-                if not tool:
-                    return "Error: Tool name required"
+        with span('mcp.call', server=server, tool=tool) as call_span:
+            # Serve idempotent calls from the result cache
+            note_call(server, tool)
+            cached = tool_cache.get(server, tool, arguments)
+            if call_span:
+                call_span.attrs['cached'] = cached is not None
+            if cached is not None:
+                return cached
 
-                result = await session.call_tool(tool, arguments=arguments)
-                return str(result)
+            # Reuse the pooled server session instead of spawning a new process
+            result = ToolResult.from_call_result(await call_tool(server, tool, arguments))
+            tool_cache.invalidate(server, tool, arguments)
+            if not result.is_error:
+                tool_cache.put(server, tool, arguments, result)
+            if call_span:
+                call_span.attrs['bytes'] = result.total_bytes
+            return result
 
     except Exception as e:
         return f"Error: {str(e)}"
\ No newline at end of file
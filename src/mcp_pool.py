@@ -0,0 +1,344 @@
+"""
+Persistent MCP server session pool.
+
+Keeps one long-lived ClientSession per configured server so tool calls reuse a
+running server process instead of paying subprocess startup and the MCP
+handshake on every invocation.
+"""
+import asyncio
+import atexit
+import itertools
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from .runtime import BackgroundLoop
+from .telemetry import current_trace, span, within
+
+# Pool tuning (seconds unless noted)
+MAX_SESSIONS = int(os.getenv('MCP_POOL_MAX_SESSIONS', '8'))
+IDLE_TIMEOUT = float(os.getenv('MCP_POOL_IDLE_TIMEOUT', '600'))
+HEALTH_CHECK_INTERVAL = float(os.getenv('MCP_POOL_HEALTH_CHECK_INTERVAL', '30'))
+START_TIMEOUT = float(os.getenv('MCP_POOL_START_TIMEOUT', '60'))
+REQUEST_TIMEOUT = float(os.getenv('MCP_REQUEST_TIMEOUT', '120'))
+
+# Process-wide, so a restarted or re-created session never reuses a generation
+_generations = itertools.count(1)
+
+# Errors that mean the server process or its pipes went away
+_TRANSPORT_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    BrokenPipeError,
+    ConnectionError,
+)
+
+
+class ServerSession:
+    """A single long-lived connection to one MCP server."""
+
+    def __init__(self, name: str, params: StdioServerParameters):
+        self.name = name
+        self.params = params
+        self.session: Optional[ClientSession] = None
+        self.generation = 0
+        self.active_calls = 0
+        self.last_used = time.monotonic()
+        self.last_checked = 0.0
+        self._runner: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._start_lock = asyncio.Lock()
+        # Start in progress; it outlives callers that stop waiting for it
+        self._starting: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return (
+            self.session is not None
+            and self._runner is not None
+            and not self._runner.done()
+        )
+
+    async def ensure_healthy(self):
+        """Start the server if needed and ping it when it has been quiet for a while."""
+        async with self._start_lock:
+            if not self.alive:
+                await self._start()
+                return
+
+            now = time.monotonic()
+            if self.active_calls or now - self.last_checked < HEALTH_CHECK_INTERVAL:
+                return
+
+            try:
+                await asyncio.wait_for(self.session.send_ping(), timeout=5)
+                self.last_checked = now
+            except Exception as e:
+                logging.warning(f"MCP server {self.name} failed health check, restarting: {e}")
+                await self._stop_runner()
+                await self._start()
+
+    async def restart(self, generation: int):
+        """Restart the server unless someone else already did since ``generation``."""
+        async with self._start_lock:
+            if self.generation != generation and self.alive:
+                return
+            await self._stop_runner()
+            await self._start()
+
+    async def run(self, fn: Callable[[ClientSession], Awaitable[Any]]) -> Any:
+        """Run ``fn(session)``, failing fast if the server dies mid-call."""
+        call = asyncio.ensure_future(fn(self.session))
+        runner = self._runner
+        try:
+            await asyncio.wait({call, runner}, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            call.cancel()
+            raise
+
+        if not call.done():
+            call.cancel()
+            raise ConnectionError(f"MCP server {self.name} exited during call")
+        return call.result()
+
+    async def close(self):
+        if self._starting is not None and not self._starting.done():
+            self._starting.cancel()
+        async with self._start_lock:
+            await self._stop_runner()
+
+    async def _start(self):
+        """
+        Start the server process, or join a start already in progress.
+
+        The start runs in its own task, so a caller that gives up (e.g. a
+        tool call timing out on a cold npx install) leaves it running for the
+        next call instead of killing the half-started server.
+        """
+        if self._starting is None or self._starting.done():
+            self._starting = asyncio.get_running_loop().create_task(self._spawn())
+            # Nobody may be waiting any more when it fails
+            self._starting.add_done_callback(lambda task: task.cancelled() or task.exception())
+        await asyncio.shield(self._starting)
+
+    async def _spawn(self):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        self._stop = asyncio.Event()
+        self._runner = loop.create_task(self._run(ready, self._stop))
+
+        try:
+            with span('mcp.spawn', server=self.name):
+                await asyncio.wait_for(asyncio.shield(ready), timeout=START_TIMEOUT)
+        except BaseException:
+            await self._stop_runner()
+            raise
+
+        self.generation = next(_generations)
+        self.last_checked = time.monotonic()
+        logging.info(f"MCP server {self.name} started (generation {self.generation})")
+
+    async def _run(self, ready: asyncio.Future, stop: asyncio.Event):
+        # The stdio transport and session are context managers bound to the
+        # task that entered them, so they live in this task until stopped.
+        try:
+            async with stdio_client(self.params) as (read, write):
+                async with ClientSession(
+                    read, write,
+                    read_timeout_seconds=timedelta(seconds=REQUEST_TIMEOUT)
+                ) as session:
+                    # A server that exits during the handshake fails the start
+                    # now instead of after START_TIMEOUT
+                    initialize = asyncio.ensure_future(session.initialize())
+                    while not initialize.done():
+                        await asyncio.wait({initialize}, timeout=0.2)
+                        if not initialize.done() and read.statistics().open_send_streams == 0:
+                            initialize.cancel()
+                            raise ConnectionError("server process exited during startup")
+                    initialize.result()
+                    self.session = session
+                    ready.set_result(None)
+
+                    # Wake up periodically to notice a server that exited on its own
+                    while not stop.is_set():
+                        try:
+                            await asyncio.wait_for(stop.wait(), timeout=1)
+                        except asyncio.TimeoutError:
+                            if read.statistics().open_send_streams == 0:
+                                raise ConnectionError("server process exited")
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logging.warning(f"MCP server {self.name} session ended: {e}")
+        finally:
+            self.session = None
+
+    async def _stop_runner(self):
+        runner, self._runner = self._runner, None
+        if runner is None:
+            return
+
+        self._stop.set()
+        try:
+            await asyncio.wait_for(runner, timeout=5)
+        except Exception:
+            runner.cancel()
+        self.session = None
+
+
+class MCPSessionPool:
+    """Process-wide pool of MCP server sessions keyed by server name."""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_timeout: float = IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[str, ServerSession] = {}
+        self._loop_thread: Optional[BackgroundLoop] = None
+        self._loop_lock = threading.Lock()
+        self._released: Optional[asyncio.Condition] = None
+        self._reaper: Optional[asyncio.Task] = None
+        # Evictions started from cancelled calls, kept referenced until done
+        self._recycling: Set[asyncio.Task] = set()
+
+    @property
+    def loop_thread(self) -> BackgroundLoop:
+        with self._loop_lock:
+            if self._loop_thread is None:
+                self._loop_thread = BackgroundLoop('mcp-session-pool')
+            return self._loop_thread
+
+    async def call(
+        self,
+        server: str,
+        params: StdioServerParameters,
+        fn: Callable[[ClientSession], Awaitable[Any]],
+    ) -> Any:
+        """Run ``fn(session)`` against the pooled session for ``server``."""
+        # Carry the caller's trace over so server spawns show up in it
+        return await self.loop_thread.run(within(current_trace(), self._call(server, params, fn)))
+
+    def generation(self, server: str) -> int:
+        """
+        Identifier of the running process for ``server``, 0 if none.
+
+        Changes on every start or restart, so callers can key per-session
+        caches on it.
+        """
+        entry = self._sessions.get(server)
+        return entry.generation if entry else 0
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of pooled sessions for display and debugging."""
+        now = time.monotonic()
+        return {
+            name: {
+                'alive': entry.alive,
+                'generation': entry.generation,
+                'active_calls': entry.active_calls,
+                'idle_seconds': round(now - entry.last_used, 1),
+            }
+            for name, entry in self._sessions.items()
+        }
+
+    async def evict(self, server: str):
+        """Shut down the session for ``server`` if one is running."""
+        await self.loop_thread.run(self._evict(server))
+
+    def close_all(self):
+        """Shut down every pooled server. Safe to call at interpreter exit."""
+        if self._loop_thread is None:
+            return
+        try:
+            self._loop_thread.run_sync(self._close_all(), timeout=10)
+        except Exception as e:
+            logging.warning(f"Error closing MCP sessions: {e}")
+
+    async def _call(self, server, params, fn):
+        entry = await self._acquire(server, params)
+        entry.active_calls += 1
+        abandoned = False
+        try:
+            generation = entry.generation
+            try:
+                return await entry.run(fn)
+            except _TRANSPORT_ERRORS as e:
+                logging.warning(f"MCP server {server} connection lost, restarting: {e!r}")
+                await entry.restart(generation)
+                return await entry.run(fn)
+        except asyncio.CancelledError:
+            abandoned = True
+            raise
+        finally:
+            entry.active_calls -= 1
+            entry.last_used = time.monotonic()
+            if abandoned and entry.active_calls == 0 and self._sessions.get(server) is entry:
+                # The server may still be busy with the abandoned request, so
+                # replace the process; the next call starts a fresh one
+                logging.info(f"Recycling MCP server {server} after a cancelled call")
+                self._recycling.add(asyncio.ensure_future(self._evict(server)))
+                self._recycling = {task for task in self._recycling if not task.done()}
+            async with self._released:
+                self._released.notify_all()
+
+    async def _acquire(self, server: str, params: StdioServerParameters) -> ServerSession:
+        if self._released is None:
+            self._released = asyncio.Condition()
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+        entry = self._sessions.get(server)
+
+        # Server configuration changed since the session was started
+        if entry is not None and entry.params != params:
+            await self._evict(server)
+            entry = None
+
+        if entry is None:
+            await self._make_room()
+            entry = self._sessions.setdefault(server, ServerSession(server, params))
+
+        await entry.ensure_healthy()
+        return entry
+
+    async def _make_room(self):
+        """Wait until the pool has room for one more session, evicting idle ones."""
+        async with self._released:
+            while len(self._sessions) >= self.max_sessions:
+                idle = [s for s in self._sessions.values() if s.active_calls == 0]
+                if idle:
+                    victim = min(idle, key=lambda s: s.last_used)
+                    await self._evict(victim.name)
+                else:
+                    await self._released.wait()
+
+    async def _evict(self, server: str):
+        entry = self._sessions.pop(server, None)
+        if entry is not None:
+            logging.info(f"Closing MCP server {server}")
+            await entry.close()
+
+    async def _close_all(self):
+        for server in list(self._sessions):
+            await self._evict(server)
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, HEALTH_CHECK_INTERVAL))
+            now = time.monotonic()
+            for name, entry in list(self._sessions.items()):
+                if entry.active_calls == 0 and now - entry.last_used > self.idle_timeout:
+                    await self._evict(name)
+
+
+# Shared pool used by mcp_client.mcp
+session_pool = MCPSessionPool()
+atexit.register(session_pool.close_all)
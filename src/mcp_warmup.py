@@ -0,0 +1,142 @@
+"""
+Startup warmup of the enabled MCP servers.
+
+Every enabled server is launched in parallel on the session pool's loop as
+soon as the app starts and its ``list_tools()`` result is cached, so the first
+tool call of a session finds a running server instead of paying ``npx``
+package resolution and the MCP handshake. Servers that fail to start are
+reported per server, and their tools are left out of the model's tool schema
+until a later retry succeeds.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from mcp import StdioServerParameters
+
+from .mcp_pool import session_pool
+from .server_config import server_configs
+
+# Start the enabled servers in the background when the app loads
+ENABLED = os.getenv('MCP_PREWARM', 'true').lower() == 'true'
+# Seconds before a server that failed to start is tried again
+RETRY_INTERVAL = float(os.getenv('MCP_PREWARM_RETRY_INTERVAL', '60'))
+
+
+def _root_cause(error: BaseException) -> BaseException:
+    """The single error wrapped in (nested) task group exception groups"""
+    while len(getattr(error, 'exceptions', ())) == 1:
+        error = error.exceptions[0]
+    return error
+
+
+@dataclass
+class ServerStatus:
+    """Warmup state of one server: 'starting', 'ready' or 'failed'"""
+    state: str
+    params: StdioServerParameters
+    started_at: float
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    tools: List[Any] = field(default_factory=list)
+
+    @property
+    def seconds(self) -> Optional[float]:
+        """Time the start took, None while still starting"""
+        return None if self.finished_at is None else self.finished_at - self.started_at
+
+
+class ServerWarmup:
+    """Launches enabled servers once and tracks their readiness"""
+
+    def __init__(self, retry_interval: float = RETRY_INTERVAL):
+        self.retry_interval = retry_interval
+        self._statuses: Dict[str, ServerStatus] = {}
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> Dict[str, ServerStatus]:
+        """
+        Launch every enabled server that is not started yet.
+
+        Cheap enough to call on every Streamlit rerun: servers are only
+        (re)started when new, when their configuration changed, or when
+        they failed more than ``retry_interval`` seconds ago.
+        """
+        servers = {name: s for name, s in server_configs.get().servers.items() if s.enabled}
+        now = time.monotonic()
+        launch = []
+        with self._lock:
+            # Servers removed or disabled in the config are no longer reported
+            for name in set(self._statuses) - set(servers):
+                del self._statuses[name]
+
+            for name, server in servers.items():
+                status = self._statuses.get(name)
+                if status is not None and status.params == server.params:
+                    if status.state != 'failed' or now - status.finished_at < self.retry_interval:
+                        continue
+                self._statuses[name] = ServerStatus('starting', server.params, now)
+                launch.append((name, server.params))
+
+            for name, params in launch:
+                self._pending[name] = asyncio.run_coroutine_threadsafe(
+                    self._warm(name, params), session_pool.loop_thread.loop
+                )
+        return self.statuses()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the launched servers are up or failed; False on timeout"""
+        with self._lock:
+            pending = list(self._pending.values())
+        _, not_done = concurrent.futures.wait(pending, timeout=timeout)
+        return not not_done
+
+    def statuses(self) -> Dict[str, ServerStatus]:
+        with self._lock:
+            return dict(self._statuses)
+
+    def tools(self, server: str, params: Optional[StdioServerParameters] = None) -> Optional[List[Any]]:
+        """Cached ``list_tools()`` result of a ready server, None if unknown"""
+        status = self._statuses.get(server)
+        if status is None or status.state != 'ready':
+            return None
+        if params is not None and params != status.params:
+            return None
+        return status.tools
+
+    def unavailable(self) -> Set[str]:
+        """Servers whose last start failed"""
+        with self._lock:
+            return {name for name, status in self._statuses.items() if status.state == 'failed'}
+
+    async def _warm(self, name: str, params: StdioServerParameters):
+        try:
+            result = await session_pool.call(name, params, lambda session: session.list_tools())
+        except Exception as e:
+            error = _root_cause(e)
+            logging.warning(f"MCP server {name} failed to start: {error!r}")
+            self._finish(name, params, 'failed', error=str(error) or type(error).__name__)
+        else:
+            self._finish(name, params, 'ready', tools=list(result.tools))
+            logging.info(f"MCP server {name} ready with {len(result.tools)} tools")
+
+    def _finish(self, name: str, params: StdioServerParameters, state: str, **fields):
+        with self._lock:
+            status = self._statuses.get(name)
+            # The config changed while this server was starting
+            if status is None or status.params != params:
+                return
+            self._pending.pop(name, None)
+            self._statuses[name] = ServerStatus(
+                state, params, status.started_at, finished_at=time.monotonic(), **fields
+            )
+
+
+# Shared warmup state used by the app and mcp_client
+server_warmup = ServerWarmup()
@@ -0,0 +1,108 @@
+"""
+Exact-match cache of whole assistant turns.
+
+A turn is keyed by a hash of the model, system prompt, tool schemas and the
+normalized message history before it, so asking the same question in the same
+context (e.g. a quick-start prompt in a new chat) replays the stored messages
+instead of running the model and tools again. Entries expire after a TTL and
+are evicted LRU-first once the byte budget is exceeded. A turn whose tools made
+an MCP call with side effects, as judged by the tool cache policies, is never
+stored. Off by default.
+"""
+import copy
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .telemetry import turn_metrics
+from .tool_cache import ToolResultCache, tool_cache
+from .ttl_cache import TTLCache
+
+CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'false').lower() == 'true'
+CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+
+# Message fields that make up the conversation's meaning; the rest (spill
+# handles, cached token estimates) differs between identical conversations
+_KEY_FIELDS = ('role', 'content', 'name', 'tool_calls')
+
+
+def _normalize(message: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a message that matter for the key, with whitespace collapsed"""
+    normalized = {k: message[k] for k in _KEY_FIELDS if message.get(k)}
+    if isinstance(normalized.get('content'), str):
+        normalized['content'] = " ".join(normalized['content'].split())
+    return normalized
+
+
+class ResponseCache:
+    """TTL + LRU cache of the messages a turn added, with a byte budget"""
+
+    def __init__(
+        self,
+        ttl: float = CACHE_TTL,
+        max_bytes: int = CACHE_MAX_BYTES,
+        enabled: bool = CACHE_ENABLED,
+        tools: ToolResultCache = tool_cache,
+    ):
+        self.ttl = ttl
+        self.enabled = enabled
+        # Its policies say which MCP calls have side effects
+        self.tools = tools
+        self._store = TTLCache(max_bytes)
+
+    def key(
+        self,
+        model: str,
+        system_prompt: Optional[str],
+        tools: Optional[List[Dict[str, Any]]],
+        messages: List[Dict[str, Any]],
+    ) -> str:
+        payload = json.dumps(
+            [model, system_prompt, tools or [], [_normalize(m) for m in messages]],
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Copies of the cached turn's messages, or None on a miss"""
+        if not self.enabled:
+            return None
+        messages = self._store.get(key)
+        return copy.deepcopy(messages) if messages is not None else None
+
+    def put(self, key: str, messages: List[Dict[str, Any]], mcp_calls: Iterable[Tuple[str, str]] = ()):
+        """
+        Store a completed turn unless it changed something outside the chat.
+
+        Args:
+            key: Key from key()
+            messages: Messages the turn added
+            mcp_calls: (server, tool) of the MCP calls the turn made; a call
+                       the tool cache would not reuse (writes, tools without
+                       a policy) means replaying the turn would skip it
+        """
+        if not (self.enabled and self.ttl > 0 and messages):
+            return
+        if not all(self.tools.reusable(server, tool) for server, tool in mcp_calls):
+            return
+
+        stored = [{k: v for k, v in m.items() if not k.startswith('_')} for m in messages]
+        size = len(key) + len(json.dumps(stored, default=str))
+        self._store.put(key, copy.deepcopy(stored), size, self.ttl)
+
+    def clear(self):
+        self._store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._store.stats()
+
+    def gauges(self) -> Dict[str, float]:
+        """Hit and eviction totals for the metrics export"""
+        return self._store.gauges()
+
+
+# Shared cache used by the Streamlit app
+response_cache = ResponseCache()
+turn_metrics.add_gauges('response_cache', response_cache.gauges)
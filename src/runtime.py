@@ -0,0 +1,215 @@
+"""
+Background event loops.
+
+Streamlit reruns the script on its own thread for every interaction, so async
+work that has to outlive a single rerun (HTTP clients, MCP sessions) runs on
+an event loop that lives on a daemon thread. The script thread submits
+coroutines to it and consumes async generators as plain iterators.
+"""
+import asyncio
+import queue
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, List, Optional
+
+_DONE = object()
+
+# Seconds to wait for a cancelled generator to finish closing
+CLOSE_TIMEOUT = 5
+# Seconds between ``on_idle`` calls while iterate() waits for an item
+IDLE_INTERVAL = 0.1
+
+
+def _run_forever(loop: asyncio.AbstractEventLoop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+    # Let cancelled tasks run their cleanup (e.g. closing server processes)
+    pending = asyncio.all_tasks(loop)
+    for task in pending:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    loop.close()
+
+
+class TurnCancelled(Exception):
+    """Work was stopped because its CancelToken fired"""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation signal that can be fired from any thread.
+
+    Async work on any loop checks ``cancelled`` at safe points or awaits
+    through ``guard()``, which cancels the awaited task the moment the token
+    fires (closing HTTP streams, abandoning tool calls). The owner of the work
+    calls ``finish()`` once it has unwound, so whoever cancelled it can wait.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self._cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise TurnCancelled()
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run ``callback`` when the token fires (now, if it already has); returns an unregister function"""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._unregister(callback)
+        callback()
+        return lambda: None
+
+    def _unregister(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    async def guard(self, awaitable: Awaitable[Any]) -> Any:
+        """Await ``awaitable``, cancelling it and raising TurnCancelled as soon as the token fires"""
+        if self.cancelled:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise TurnCancelled()
+        task = asyncio.ensure_future(awaitable)
+        loop = asyncio.get_running_loop()
+        unregister = self.on_cancel(lambda: loop.call_soon_threadsafe(task.cancel))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if self.cancelled and task.cancelled():
+                raise TurnCancelled() from None
+            raise
+        finally:
+            unregister()
+
+    def finish(self):
+        """Mark the cancellable work as over"""
+        self._finished.set()
+
+    def wait_finished(self, timeout: Optional[float] = None) -> bool:
+        return self._finished.wait(timeout)
+
+
+class BackgroundLoop:
+    """An asyncio event loop running forever on a daemon thread."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        # The thread only holds the loop, so dropping the last reference to
+        # this object (e.g. when a Streamlit session ends) stops the loop
+        self._thread = threading.Thread(target=_run_forever, args=(self.loop,), name=name, daemon=True)
+        self._thread.start()
+        self._finalizer = weakref.finalize(self, self.loop.call_soon_threadsafe, self.loop.stop)
+        # At interpreter exit, owners (e.g. the MCP pool) still need the loop for cleanup
+        self._finalizer.atexit = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive() and self._finalizer.alive
+
+    async def run(self, coro: Awaitable[Any]) -> Any:
+        """Run a coroutine on this loop and await its result from any loop."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self.loop:
+            return await coro
+
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return await asyncio.wrap_future(future)
+
+    def run_sync(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on this loop and block the calling thread on it."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def iterate(
+        self,
+        agen: AsyncIterator[Any],
+        timeout: Optional[float] = None,
+        on_idle: Optional[Callable[[], None]] = None,
+    ) -> Iterator[Any]:
+        """
+        Consume an async generator on this loop from a synchronous caller.
+
+        The generator runs as a single task on the loop, so context variables
+        it sets (e.g. the active trace) stay in effect for its whole run, and
+        it keeps producing while the caller handles earlier items. Closing the
+        returned iterator early cancels and closes ``agen``. ``on_idle`` is
+        called every IDLE_INTERVAL seconds while no item has arrived, e.g. to
+        notice that the caller should stop.
+        """
+        items: queue.Queue = queue.Queue()
+        finished = threading.Event()
+        tasks: List[asyncio.Task] = []
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((item, None))
+                items.put((_DONE, None))
+            except BaseException as e:
+                items.put((_DONE, e))
+                raise
+            finally:
+                await agen.aclose()
+
+        def start():
+            task = self.loop.create_task(pump())
+            # Also fires for a task cancelled before its first step, whose finally never runs
+            task.add_done_callback(lambda _: finished.set())
+            tasks.append(task)
+
+        # Callbacks run in order, so the task exists before any cancel() below
+        self.loop.call_soon_threadsafe(start)
+        try:
+            while True:
+                item, error = self._next(items, timeout, on_idle)
+                if error is not None and not isinstance(error, asyncio.CancelledError):
+                    raise error
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            if not finished.is_set():
+                self.loop.call_soon_threadsafe(lambda: tasks[0].cancel())
+                finished.wait(timeout or CLOSE_TIMEOUT)
+
+    @staticmethod
+    def _next(items: queue.Queue, timeout: Optional[float], on_idle: Optional[Callable[[], None]]):
+        if on_idle is None:
+            return items.get(timeout=timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = IDLE_INTERVAL if deadline is None else min(IDLE_INTERVAL, deadline - time.monotonic())
+            try:
+                return items.get(timeout=max(wait, 0))
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+                on_idle()
+
+    def close(self):
+        """Stop the loop; pending work is abandoned."""
+        self._finalizer()
@@ -0,0 +1,292 @@
+"""
+Fair scheduling of Ollama requests.
+
+Every chat request goes through one process-wide scheduler, which limits how
+many requests run at once per model and queues the rest. Waiting requests are
+served round-robin across sessions, so a session with many requests (a batch
+run, a tool-heavy turn) cannot starve the others. The queue is bounded: when
+it is full, or a request has waited QUEUE_TIMEOUT seconds, the request fails
+fast with SchedulerOverloaded instead of piling onto the daemon.
+
+Sessions run on their own event loops and threads, so the state is guarded by
+a threading lock and waiters are woken on their own loop.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+from .telemetry import turn_metrics
+
+# Requests Ollama runs at the same time per model; match OLLAMA_NUM_PARALLEL
+MODEL_CONCURRENCY = int(os.getenv('OLLAMA_MODEL_CONCURRENCY', '2'))
+# Requests allowed to wait across all models before new ones are rejected
+MAX_QUEUE = int(os.getenv('SCHEDULER_MAX_QUEUE', '32'))
+# Seconds a request may wait for a slot before it is rejected
+QUEUE_TIMEOUT = float(os.getenv('SCHEDULER_QUEUE_TIMEOUT', '120'))
+
+DEFAULT_SESSION = 'default'
+
+_session: ContextVar[str] = ContextVar('scheduler_session', default=DEFAULT_SESSION)
+
+
+class SchedulerOverloaded(RuntimeError):
+    """The request was rejected because too many are already waiting"""
+
+
+@contextmanager
+def session_scope(session_id: str) -> Iterator[str]:
+    """Queue requests made in the enclosed block as ``session_id``"""
+    token = _session.set(session_id)
+    try:
+        yield session_id
+    finally:
+        _session.reset(token)
+
+
+async def in_session(session_id: str, events: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """Iterate an async generator with its requests queued as ``session_id``"""
+    with session_scope(session_id):
+        async for event in events:
+            yield event
+
+
+class Ticket:
+    """One request's place in the queue, and then its running slot"""
+
+    def __init__(self, scheduler: 'RequestScheduler', model: str, session: str):
+        self.scheduler = scheduler
+        self.model = model
+        self.session = session
+        self.enqueued_at = time.monotonic()
+        # Written under the scheduler lock
+        self.granted = False
+        self.released = False
+        self.position = 0
+        self._sync_event = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_event: Optional[asyncio.Event] = None
+
+    def _notify(self):
+        self._sync_event.set()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._async_event.set)
+            except RuntimeError:
+                # The waiter's loop is closed; nobody is listening
+                pass
+
+    def _deadline(self) -> float:
+        return self.enqueued_at + self.scheduler.queue_timeout
+
+    async def wait(self) -> AsyncIterator[int]:
+        """Yield the 1-based queue position whenever it changes, until the request may run"""
+        self._loop = asyncio.get_running_loop()
+        self._async_event = asyncio.Event()
+        last = None
+        while True:
+            self._async_event.clear()
+            with self.scheduler._lock:
+                granted, position = self.granted, self.position
+            if granted:
+                return
+            if position != last:
+                last = position
+                yield position
+
+            remaining = self._deadline() - time.monotonic()
+            if remaining <= 0:
+                self.scheduler._expire(self)
+                continue
+            try:
+                await asyncio.wait_for(self._async_event.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def wait_sync(self):
+        """Block the calling thread until the request may run"""
+        while True:
+            self._sync_event.clear()
+            with self.scheduler._lock:
+                if self.granted:
+                    return
+            remaining = self._deadline() - time.monotonic()
+            if remaining <= 0:
+                self.scheduler._expire(self)
+                continue
+            self._sync_event.wait(remaining)
+
+    def release(self):
+        """Free the slot, or leave the queue if still waiting; idempotent"""
+        self.scheduler._release(self)
+
+
+class RequestScheduler:
+    """Per-model concurrency limits with per-session round-robin queues"""
+
+    def __init__(
+        self,
+        concurrency: int = MODEL_CONCURRENCY,
+        max_queue: int = MAX_QUEUE,
+        queue_timeout: float = QUEUE_TIMEOUT,
+    ):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._running: Dict[str, int] = {}
+        # model -> session -> waiting tickets; session order is the service order
+        self._waiting: Dict[str, 'OrderedDict[str, Deque[Ticket]]'] = {}
+        self._queued = 0
+        self.counts = {'granted': 0, 'rejected': 0, 'timed_out': 0}
+        self.wait_seconds = {'sum': 0.0, 'max': 0.0}
+
+    def submit(self, model: str, session: Optional[str] = None) -> Ticket:
+        """
+        Queue a request for ``model``; raises SchedulerOverloaded if the queue is full.
+
+        The returned ticket is granted immediately when a slot is free; otherwise
+        wait on it. Always release it when the request is done.
+        """
+        ticket = Ticket(self, model, session or _session.get())
+        with self._lock:
+            sessions = self._waiting.setdefault(model, OrderedDict())
+            if self._running.get(model, 0) < self.concurrency and not sessions:
+                self._grant(ticket)
+                return ticket
+            if self._queued >= self.max_queue:
+                self.counts['rejected'] += 1
+                raise SchedulerOverloaded(
+                    f"Ollama is busy ({self._queued} requests waiting); please try again shortly"
+                )
+            sessions.setdefault(ticket.session, deque()).append(ticket)
+            self._queued += 1
+            self._renumber(model)
+        return ticket
+
+    async def acquire(self, model: str, session: Optional[str] = None) -> Ticket:
+        """Submit and wait for a slot"""
+        ticket = self.submit(model, session)
+        try:
+            async for _ in ticket.wait():
+                pass
+        except BaseException:
+            ticket.release()
+            raise
+        return ticket
+
+    def acquire_sync(self, model: str, session: Optional[str] = None) -> Ticket:
+        """Blocking version of acquire()"""
+        ticket = self.submit(model, session)
+        try:
+            ticket.wait_sync()
+        except BaseException:
+            ticket.release()
+            raise
+        return ticket
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Running and waiting requests per model"""
+        with self._lock:
+            models = set(self._running) | set(self._waiting)
+            return {
+                model: {
+                    'running': self._running.get(model, 0),
+                    'waiting': sum(len(q) for q in self._waiting.get(model, {}).values()),
+                }
+                for model in sorted(models)
+            }
+
+    def gauges(self) -> Dict[str, float]:
+        """Queue depth and totals for the metrics export"""
+        with self._lock:
+            return {
+                'running': sum(self._running.values()),
+                'waiting': self._queued,
+                **{f'{name}_total': count for name, count in self.counts.items()},
+                'wait_seconds_total': round(self.wait_seconds['sum'], 6),
+                'wait_seconds_max': round(self.wait_seconds['max'], 6),
+            }
+
+    def _grant(self, ticket: Ticket):
+        waited = time.monotonic() - ticket.enqueued_at
+        self._running[ticket.model] = self._running.get(ticket.model, 0) + 1
+        ticket.granted = True
+        ticket.position = 0
+        self.counts['granted'] += 1
+        self.wait_seconds['sum'] += waited
+        self.wait_seconds['max'] = max(self.wait_seconds['max'], waited)
+        ticket._notify()
+
+    def _dispatch(self, model: str):
+        """Hand free slots to waiting sessions in turn"""
+        sessions = self._waiting.get(model)
+        while sessions and self._running.get(model, 0) < self.concurrency:
+            session, queue = next(iter(sessions.items()))
+            ticket = queue.popleft()
+            self._queued -= 1
+            if queue:
+                sessions.move_to_end(session)
+            else:
+                del sessions[session]
+            self._grant(ticket)
+        self._renumber(model)
+
+    def _renumber(self, model: str):
+        """Update positions to the order _dispatch will serve them in"""
+        queues: List[Deque[Ticket]] = list(self._waiting.get(model, {}).values())
+        position, depth = 1, 0
+        while True:
+            layer = [q[depth] for q in queues if len(q) > depth]
+            if not layer:
+                break
+            for ticket in layer:
+                if ticket.position != position:
+                    ticket.position = position
+                    ticket._notify()
+                position += 1
+            depth += 1
+
+    def _remove(self, ticket: Ticket) -> bool:
+        sessions = self._waiting.get(ticket.model, {})
+        queue = sessions.get(ticket.session)
+        if queue is None or ticket not in queue:
+            return False
+        queue.remove(ticket)
+        self._queued -= 1
+        if not queue:
+            del sessions[ticket.session]
+        self._renumber(ticket.model)
+        return True
+
+    def _expire(self, ticket: Ticket):
+        """Reject a ticket that waited too long, unless it was granted meanwhile"""
+        with self._lock:
+            if ticket.granted:
+                return
+            self._remove(ticket)
+            ticket.released = True
+            self.counts['timed_out'] += 1
+        raise SchedulerOverloaded(
+            f"Ollama is busy; no slot for {ticket.model} within {self.queue_timeout:g}s"
+        )
+
+    def _release(self, ticket: Ticket):
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket.granted:
+                self._running[ticket.model] -= 1
+                self._dispatch(ticket.model)
+            else:
+                self._remove(ticket)
+
+
+# Shared scheduler in front of llm_helper.chat and achat
+request_scheduler = RequestScheduler()
+turn_metrics.add_gauges('scheduler', request_scheduler.gauges)
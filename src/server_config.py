@@ -0,0 +1,183 @@
+"""
+Shared, resolved MCP server configuration.
+
+mcp_config.json is located and parsed once, environment overrides are applied,
+and each server's launch command and environment are resolved. The result is
+cached and only reloaded when the file's mtime (or location) changes, so tool
+calls do no file I/O beyond a throttled stat().
+"""
+import json
+import logging
+import os
+import platform
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from mcp import StdioServerParameters
+
+# Load environment variables
+load_dotenv()
+
+# Seconds between checks for an edited or moved config file
+CHECK_INTERVAL = float(os.getenv('MCP_CONFIG_CHECK_INTERVAL', '2'))
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def candidate_paths() -> List[Path]:
+    """Config file locations, in priority order"""
+    paths = []
+    if os.getenv('MCP_CONFIG_PATH'):
+        paths.append(Path(os.getenv('MCP_CONFIG_PATH')))
+    paths += [
+        Path('mcp_config.json'),  # Current directory
+        PROJECT_ROOT / 'mcp_config.json',  # Project root
+        Path.home() / '.config' / 'autogen' / 'mcp_config.json',  # User config dir
+    ]
+    return paths
+
+
+def resolve_npx() -> str:
+    """System-specific npx path, falling back to npx on PATH"""
+    system = platform.system()
+    if system == "Darwin":  # macOS
+        default_npx = Path("/opt/homebrew/bin/npx")
+    elif system == "Windows":
+        default_npx = Path(os.getenv("APPDATA", "")) / "npm/npx.cmd"
+    else:  # Linux and others
+        default_npx = Path("/usr/local/bin/npx")
+
+    return str(default_npx if default_npx.exists() else "npx")
+
+
+def apply_env_overrides(servers: Dict[str, Dict[str, Any]]):
+    """Apply environment variable overrides to server configs in place"""
+    for server_name, config in servers.items():
+        prefix = f"{server_name.upper().replace('-', '_')}_"
+
+        # Override enabled status
+        if os.getenv(f"{prefix}ENABLED"):
+            config['enabled'] = os.getenv(f"{prefix}ENABLED").lower() == 'true'
+
+        # Override command
+        if os.getenv(f"{prefix}COMMAND"):
+            config['command'] = os.getenv(f"{prefix}COMMAND")
+
+        # Override args
+        if os.getenv(f"{prefix}ARGS"):
+            config['args'] = os.getenv(f"{prefix}ARGS").split()
+
+        # Add/override environment variables
+        if 'env' not in config:
+            config['env'] = {}
+
+        # Special handling for API keys and paths
+        if server_name == 'brave-search' and os.getenv('BRAVE_API_KEY'):
+            config['env']['BRAVE_API_KEY'] = os.getenv('BRAVE_API_KEY')
+        elif server_name == 'filesystem' and os.getenv('FILESYSTEM_PATHS'):
+            paths = os.getenv('FILESYSTEM_PATHS').split(':')
+            config['args'] = ['-y', '@modelcontextprotocol/server-filesystem'] + paths
+
+
+@dataclass
+class ResolvedServer:
+    """One server entry with its launch parameters resolved"""
+    name: str
+    config: Dict[str, Any]
+    params: StdioServerParameters
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.get('enabled', True)
+
+
+@dataclass
+class ServerConfigSnapshot:
+    """An immutable view of the config file as of one load"""
+    path: Optional[Path] = None
+    raw: Dict[str, Any] = field(default_factory=lambda: {"mcpServers": {}})
+    servers: Dict[str, ResolvedServer] = field(default_factory=dict)
+
+
+def build_snapshot(path: Optional[Path]) -> ServerConfigSnapshot:
+    """Load, override and resolve the config at ``path``"""
+    if path is None:
+        return ServerConfigSnapshot()
+
+    with open(path) as f:
+        raw = json.load(f)
+    raw.setdefault('mcpServers', {})
+    apply_env_overrides(raw['mcpServers'])
+
+    npx_path = resolve_npx()
+    servers = {}
+    for name, config in raw['mcpServers'].items():
+        command = npx_path if config.get('command') == 'npx' else config.get('command')
+        env = os.environ.copy()
+        env.update(config.get('env', {}))
+        servers[name] = ResolvedServer(
+            name=name,
+            config=config,
+            params=StdioServerParameters(
+                command=command,
+                args=config.get('args', []),
+                env=env
+            )
+        )
+    return ServerConfigSnapshot(path=path, raw=raw, servers=servers)
+
+
+class ServerConfigCache:
+    """Load-once cache of the resolved server config with mtime invalidation"""
+
+    def __init__(self, check_interval: float = CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._snapshot: Optional[ServerConfigSnapshot] = None
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> ServerConfigSnapshot:
+        """Current snapshot, reloaded only when the file changed"""
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            path, signature = self._locate()
+            if self._snapshot is None or signature != self._signature:
+                try:
+                    self._snapshot = build_snapshot(path)
+                    self._signature = signature
+                    logging.info(f"Loaded MCP config from {path}")
+                except (OSError, ValueError) as e:
+                    # Keep serving the last good config while the file is mid-edit
+                    logging.error(f"Failed to load MCP config {path}: {e}")
+                    if self._snapshot is None:
+                        self._snapshot = ServerConfigSnapshot()
+            self._checked_at = now
+            return self._snapshot
+
+    def invalidate(self):
+        """Force a reload on the next get()"""
+        with self._lock:
+            self._snapshot = None
+            self._signature = None
+
+    @staticmethod
+    def _locate() -> Tuple[Optional[Path], Optional[Tuple]]:
+        for path in candidate_paths():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            return path, (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+        return None, None
+
+
+# Shared cache used by Config and mcp_client
+server_configs = ServerConfigCache()
@@ -0,0 +1,235 @@
+"""
+Per-turn timing spans.
+
+A Trace collects the spans of one assistant turn: the Ollama request, first
+token, tool dispatch, each tool call, MCP server spawns and UI rendering. The
+active trace lives in a context variable, so ``span()`` calls anywhere below a
+``tracing()`` block (including tasks it spawns) attach to it, and cost only a
+lookup when nothing is being traced.
+
+Finished traces are aggregated into ``turn_metrics``, which can be exported as
+JSON or Prometheus text for scraping.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+
+# File the aggregated metrics are written to after each turn (.prom for
+# Prometheus text, anything else for JSON); unset disables the export
+EXPORT_PATH = os.getenv('TELEMETRY_EXPORT_PATH')
+
+# Fields from Ollama's final chunk, durations in nanoseconds
+OLLAMA_STATS = (
+    'total_duration', 'load_duration', 'prompt_eval_count',
+    'prompt_eval_duration', 'eval_count', 'eval_duration',
+)
+
+
+@dataclass
+class Span:
+    """One timed step; times are perf_counter seconds"""
+    name: str
+    start: float
+    end: Optional[float] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class Trace:
+    """Spans recorded during one turn"""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Span]:
+        """Time the enclosed block; the yielded span accepts more attrs"""
+        span = Span(name, time.perf_counter(), attrs=attrs)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            # list.append is atomic, so spans may come from other threads
+            self.spans.append(span)
+
+    def add(self, name: str, start: float, end: float, **attrs) -> Span:
+        """Record a span whose times were measured elsewhere"""
+        span = Span(name, start, end, attrs)
+        self.spans.append(span)
+        return span
+
+    def finish(self) -> 'Trace':
+        if self.end is None:
+            self.end = time.perf_counter()
+        return self
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Waterfall form: offsets and durations in milliseconds"""
+        return {
+            'name': self.name,
+            'attrs': self.attrs,
+            'duration_ms': round(self.duration * 1000, 3),
+            'spans': [
+                {
+                    'name': s.name,
+                    'offset_ms': round((s.start - self.start) * 1000, 3),
+                    'duration_ms': round(s.duration * 1000, 3),
+                    'attrs': s.attrs,
+                }
+                for s in sorted(self.spans, key=lambda s: (s.start, -s.duration))
+            ],
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar('trace', default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def tracing(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """Make ``trace`` the active trace for the enclosed block"""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+async def within(trace: Optional[Trace], coro: Awaitable[Any]) -> Any:
+    """Await ``coro`` with ``trace`` active, e.g. on another event loop"""
+    with tracing(trace):
+        return await coro
+
+
+async def traced(trace: Optional[Trace], events: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """Iterate an async generator with ``trace`` active throughout"""
+    with tracing(trace):
+        async for event in events:
+            yield event
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Optional[Span]]:
+    """Time the enclosed block in the active trace; a no-op without one"""
+    trace = _current.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, **attrs) as s:
+        yield s
+
+
+class TurnMetrics:
+    """Process-wide totals of finished traces"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.turn_seconds = 0.0
+        self.spans: Dict[str, Dict[str, float]] = {}
+        self.tokens = {'prompt': 0, 'completion': 0}
+        self._gauges: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def add_gauges(self, name: str, collect: Callable[[], Dict[str, float]]):
+        """Include the current values returned by ``collect`` in every export"""
+        self._gauges[name] = collect
+
+    def record(self, trace: Trace):
+        with self._lock:
+            self.turns += 1
+            self.turn_seconds += trace.duration
+            for s in trace.spans:
+                stats = self.spans.setdefault(s.name, {'count': 0, 'sum': 0.0, 'max': 0.0})
+                stats['count'] += 1
+                stats['sum'] += s.duration
+                stats['max'] = max(stats['max'], s.duration)
+                self.tokens['prompt'] += s.attrs.get('prompt_eval_count') or 0
+                self.tokens['completion'] += s.attrs.get('eval_count') or 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                'turns': self.turns,
+                'turn_seconds': round(self.turn_seconds, 6),
+                'tokens': dict(self.tokens),
+                'spans': {name: dict(stats) for name, stats in self.spans.items()},
+            }
+        data['gauges'] = {name: collect() for name, collect in self._gauges.items()}
+        return data
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        data = self.to_dict()
+        lines = [
+            '# HELP ollamaassist_turns_total Assistant turns completed',
+            '# TYPE ollamaassist_turns_total counter',
+            f"ollamaassist_turns_total {data['turns']}",
+            '# HELP ollamaassist_turn_seconds_total Wall time spent in turns',
+            '# TYPE ollamaassist_turn_seconds_total counter',
+            f"ollamaassist_turn_seconds_total {data['turn_seconds']}",
+            '# HELP ollamaassist_tokens_total Tokens reported by Ollama',
+            '# TYPE ollamaassist_tokens_total counter',
+        ]
+        lines += [f'ollamaassist_tokens_total{{kind="{kind}"}} {count}' for kind, count in data['tokens'].items()]
+        lines += [
+            '# HELP ollamaassist_span_seconds Time spent per span name',
+            '# TYPE ollamaassist_span_seconds summary',
+        ]
+        for name, stats in sorted(data['spans'].items()):
+            lines.append(f'ollamaassist_span_seconds_sum{{span="{name}"}} {stats["sum"]:.6f}')
+            lines.append(f'ollamaassist_span_seconds_count{{span="{name}"}} {stats["count"]}')
+        lines += [
+            '# HELP ollamaassist_span_max_seconds Slowest occurrence per span name',
+            '# TYPE ollamaassist_span_max_seconds gauge',
+        ]
+        for name, stats in sorted(data['spans'].items()):
+            lines.append(f'ollamaassist_span_max_seconds{{span="{name}"}} {stats["max"]:.6f}')
+        for group, values in sorted(data['gauges'].items()):
+            for key, value in sorted(values.items()):
+                kind = 'counter' if key.endswith('_total') else 'gauge'
+                lines.append(f'# TYPE ollamaassist_{group}_{key} {kind}')
+                lines.append(f'ollamaassist_{group}_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: str):
+        """Atomically write the totals; the format follows the file suffix"""
+        text = self.to_prometheus() if path.endswith('.prom') else json.dumps(self.to_dict(), indent=2)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+turn_metrics = TurnMetrics()
+
+
+def finish_turn(trace: Trace) -> Trace:
+    """Close a turn's trace, add it to the totals and export them if configured"""
+    trace.finish()
+    turn_metrics.record(trace)
+    if EXPORT_PATH:
+        try:
+            turn_metrics.export(EXPORT_PATH)
+        except OSError as e:
+            logging.warning(f"Could not export metrics to {EXPORT_PATH}: {e}")
+    return trace
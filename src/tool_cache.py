@@ -0,0 +1,187 @@
+"""
+Result cache for idempotent MCP tool calls.
+
+Entries are keyed by server, tool and arguments, with free-text arguments such
+as search queries normalized. Each tool has its own policy (TTL, whether it is
+cacheable, which argument holds a local path).
+Entries are evicted LRU-first once the memory budget is exceeded, and cached
+filesystem reads are dropped when the file's mtime changes or a write touches
+the same path. The policies also tell the response cache which tool calls have
+side effects, see record_calls().
+"""
+import json
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .ttl_cache import TTLCache
+
+CACHE_ENABLED = os.getenv('TOOL_CACHE_ENABLED', 'true').lower() == 'true'
+CACHE_MAX_BYTES = int(os.getenv('TOOL_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """How results of one tool are cached"""
+    ttl: float = 0
+    cacheable: bool = True
+    # Argument holding a local path used for mtime checks and invalidation
+    path_arg: Optional[str] = None
+    # Calling this tool invalidates cached entries for its path
+    invalidates: bool = False
+    # Free-text arguments (e.g. search queries) matched ignoring case and
+    # spacing; all other arguments, paths and patterns included, must match exactly
+    text_args: Tuple[str, ...] = ()
+
+
+DEFAULT_POLICIES: Dict[Tuple[str, str], CachePolicy] = {
+    ('brave-search', 'brave_web_search'): CachePolicy(ttl=900, text_args=('query',)),
+    ('brave-search', 'brave_local_search'): CachePolicy(ttl=900, text_args=('query',)),
+    ('filesystem', 'read_file'): CachePolicy(ttl=300, path_arg='path'),
+    ('filesystem', 'list_directory'): CachePolicy(ttl=60, path_arg='path'),
+    ('filesystem', 'get_file_info'): CachePolicy(ttl=60, path_arg='path'),
+    ('filesystem', 'search_files'): CachePolicy(ttl=60, path_arg='path'),
+    ('filesystem', 'write_file'): CachePolicy(cacheable=False, path_arg='path', invalidates=True),
+}
+
+# Tools without a policy are never cached
+_NO_CACHE = CachePolicy(cacheable=False)
+
+
+@dataclass
+class _Cached:
+    server: str
+    value: Any
+    path: Optional[str]
+    mtime_ns: Optional[int]
+
+
+# MCP calls made in the current context, see record_calls()
+_calls: ContextVar[Optional[List[Tuple[str, str]]]] = ContextVar('mcp_calls', default=None)
+
+
+@contextmanager
+def record_calls(calls: List[Tuple[str, str]]) -> Iterator[List[Tuple[str, str]]]:
+    """Append the (server, tool) of every MCP call made in the enclosed block to ``calls``"""
+    token = _calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _calls.reset(token)
+
+
+def note_call(server: str, tool: str):
+    """Record an MCP call for an enclosing record_calls() block, if any"""
+    calls = _calls.get()
+    if calls is not None:
+        calls.append((server, tool))
+
+
+def _normalize_text(value: Any) -> Any:
+    """Lowercase and collapse whitespace so trivially different queries share a key"""
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return value
+
+
+def _file_changed(cached: _Cached) -> bool:
+    return bool(cached.path) and cached.mtime_ns is not None and _mtime_ns(cached.path) != cached.mtime_ns
+
+
+def _mtime_ns(path: Optional[str]) -> Optional[int]:
+    if not path:
+        return None
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        # Not visible locally (e.g. a containerized server); rely on the TTL
+        return None
+
+
+class ToolResultCache:
+    """TTL + LRU cache for MCP tool results with a byte budget"""
+
+    def __init__(
+        self,
+        policies: Dict[Tuple[str, str], CachePolicy] = None,
+        max_bytes: int = CACHE_MAX_BYTES,
+        enabled: bool = CACHE_ENABLED,
+    ):
+        self.policies = dict(DEFAULT_POLICIES if policies is None else policies)
+        self.enabled = enabled
+        self._store = TTLCache(max_bytes)
+
+    def policy(self, server: str, tool: str) -> CachePolicy:
+        return self.policies.get((server, tool), _NO_CACHE)
+
+    def set_policy(self, server: str, tool: str, policy: CachePolicy):
+        self.policies[(server, tool)] = policy
+
+    def reusable(self, server: str, tool: str) -> bool:
+        """Whether a call's result may be reused instead of calling again, i.e. it has no side effects"""
+        policy = self.policy(server, tool)
+        return policy.cacheable and not policy.invalidates
+
+    def key(self, server: str, tool: str, arguments: Optional[Dict[str, Any]]) -> str:
+        policy = self.policy(server, tool)
+        args = dict(arguments or {})
+        for name in policy.text_args:
+            if name in args:
+                args[name] = _normalize_text(args[name])
+        if policy.path_arg and args.get(policy.path_arg):
+            args[policy.path_arg] = os.path.normpath(args[policy.path_arg])
+        return json.dumps([server, tool, args], sort_keys=True, default=str)
+
+    def get(self, server: str, tool: str, arguments: Optional[Dict[str, Any]]) -> Optional[Any]:
+        """Cached result, or None on a miss"""
+        policy = self.policy(server, tool)
+        if not (self.enabled and policy.cacheable):
+            return None
+
+        cached = self._store.get(self.key(server, tool, arguments), is_stale=_file_changed)
+        return cached.value if cached is not None else None
+
+    def put(self, server: str, tool: str, arguments: Optional[Dict[str, Any]], value: Any):
+        """Store a result if the tool's policy allows it"""
+        policy = self.policy(server, tool)
+        if not (self.enabled and policy.cacheable and policy.ttl > 0):
+            return
+
+        key = self.key(server, tool, arguments)
+        path = (arguments or {}).get(policy.path_arg) if policy.path_arg else None
+        cached = _Cached(server=server, value=value, path=path, mtime_ns=_mtime_ns(path))
+        self._store.put(key, cached, len(key) + len(str(value)), policy.ttl)
+
+    def invalidate(self, server: str, tool: str, arguments: Optional[Dict[str, Any]]):
+        """Drop entries a mutating call may have made stale"""
+        policy = self.policy(server, tool)
+        if not policy.invalidates:
+            return
+
+        path = (arguments or {}).get(policy.path_arg) if policy.path_arg else None
+        target = os.path.abspath(path) if path else None
+        # Without a path, drop everything cached for this server
+        self._store.discard(lambda cached: cached.server == server and (
+            target is None or cached.path is None or self._related(target, cached.path)
+        ))
+
+    def clear(self):
+        self._store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._store.stats()
+
+    @staticmethod
+    def _related(target: str, cached: str) -> bool:
+        """The written path is the cached path or lies beneath it (e.g. a listed dir)"""
+        cached = os.path.abspath(cached)
+        try:
+            return os.path.commonpath([target, cached]) == cached
+        except ValueError:
+            return False
+
+
+# Shared cache used by mcp_client.mcp
+tool_cache = ToolResultCache()
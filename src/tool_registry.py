@@ -0,0 +1,201 @@
+"""
+Tool registry.
+
+Tools register once at import time; their JSON schemas are built at
+registration (signature reflection plus parameter descriptions parsed from
+the docstring's ``Args:`` section) and served from a cached list afterwards.
+A compact variant of each schema, with only the first paragraph of the
+description, is built alongside for prompts that send a selection of tools.
+"""
+import inspect
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Python annotation to JSON schema type
+_JSON_TYPES = {
+    int: 'integer',
+    float: 'number',
+    bool: 'boolean',
+    list: 'array',
+    dict: 'object',
+}
+
+_ARG_LINE = re.compile(r'^\s*(\w+)\s*(?:\([^)]*\))?\s*:\s*(.*)$')
+
+
+def parse_docstring(doc: Optional[str]) -> Tuple[str, Dict[str, str]]:
+    """
+    Split a Google-style docstring into its description and parameter docs.
+
+    Returns:
+        (description without the Args section, {param_name: description})
+    """
+    lines = inspect.cleandoc(doc or "").splitlines()
+    description, params = [], {}
+    in_args = False
+    current = None
+    args_indent = 0
+
+    for line in lines:
+        stripped = line.strip()
+        if stripped in ('Args:', 'Arguments:', 'Parameters:'):
+            in_args = True
+            current = None
+            continue
+
+        if in_args:
+            indent = len(line) - len(line.lstrip())
+            if not stripped:
+                current = None
+                continue
+            # A non-indented line ends the Args section
+            if indent == 0:
+                in_args = False
+            else:
+                match = _ARG_LINE.match(line)
+                if match and (current is None or indent <= args_indent):
+                    args_indent = indent
+                    current = match.group(1)
+                    params[current] = match.group(2).strip()
+                elif current:
+                    # Continuation of the previous parameter description
+                    params[current] = f"{params[current]} {stripped}".strip()
+                continue
+
+        description.append(line)
+
+    return "\n".join(description).strip(), params
+
+
+@dataclass
+class RegisteredTool:
+    """A callable tool with its precomputed schemas."""
+    name: str
+    func: Callable
+    server: Optional[str]
+    schema: Dict[str, Any]
+    compact: Dict[str, Any]
+    # Extra words the tool selection index matches this tool on
+    keywords: Tuple[str, ...] = ()
+    # Sent with every selection, e.g. tools that follow up on other tools' results
+    always: bool = False
+
+
+def build_schema(name: str, func: Callable) -> Dict[str, Any]:
+    """Build the Ollama tool schema for ``func`` from its signature and docstring."""
+    description, param_docs = parse_docstring(func.__doc__)
+    properties = {}
+    required = []
+
+    for param_name, param in inspect.signature(func).parameters.items():
+        properties[param_name] = {
+            'type': _JSON_TYPES.get(param.annotation, 'string'),
+            'description': param_docs.get(param_name, ''),
+        }
+
+        # Add default value if one exists
+        if param.default is not param.empty:
+            properties[param_name]['default'] = param.default
+        else:
+            required.append(param_name)
+
+    parameters = {'type': 'object', 'properties': properties}
+    if required:
+        parameters['required'] = required
+
+    return {
+        'type': 'function',
+        'function': {
+            'name': name,
+            'description': description,
+            'parameters': parameters,
+        }
+    }
+
+
+def build_compact_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of ``schema`` whose description is cut to its first paragraph."""
+    function = schema['function']
+    summary = function['description'].split('\n\n', 1)[0]
+    return {
+        'type': schema['type'],
+        'function': {**function, 'description': ' '.join(summary.split())},
+    }
+
+
+class ToolRegistry:
+    """Name to callable dispatch plus a stable, precomputed schema list."""
+
+    def __init__(self):
+        self._tools: Dict[str, RegisteredTool] = {}
+        self._schemas: Optional[List[Dict[str, Any]]] = None
+        # Live dispatch tables, updated in place on registration
+        self.functions: Dict[str, Callable] = {}
+        self.servers: Dict[str, str] = {}
+
+    def register(
+        self,
+        func: Callable = None,
+        *,
+        name: str = None,
+        server: str = None,
+        keywords: Iterable[str] = (),
+        always: bool = False,
+    ):
+        """
+        Register a tool. Usable as ``@registry.register`` or
+        ``@registry.register(server="brave-search")``.
+
+        Args:
+            func: The tool function (sync or async)
+            name: Tool name exposed to the model, defaults to the function name
+            server: MCP server the tool talks to, used for per-server limits
+            keywords: Words users may ask with that the docstring doesn't
+                      contain, used by tool selection
+            always: Send the tool even when tool selection didn't pick it
+        """
+        def decorator(f: Callable) -> Callable:
+            tool_name = name or f.__name__
+            schema = build_schema(tool_name, f)
+            self._tools[tool_name] = RegisteredTool(
+                name=tool_name,
+                func=f,
+                server=server,
+                schema=schema,
+                compact=build_compact_schema(schema),
+                keywords=tuple(keywords),
+                always=always,
+            )
+            self.functions[tool_name] = f
+            if server:
+                self.servers[tool_name] = server
+            self._schemas = None
+            return f
+
+        return decorator(func) if func is not None else decorator
+
+    def get(self, name: str) -> Optional[RegisteredTool]:
+        return self._tools.get(name)
+
+    def tools(self) -> List[RegisteredTool]:
+        return list(self._tools.values())
+
+    def schemas(self, exclude_servers: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """
+        All tool schemas, built once and reused until a tool is registered.
+
+        Args:
+            exclude_servers: Leave out tools backed by these MCP servers,
+                             e.g. servers that failed to start
+        """
+        if self._schemas is None:
+            self._schemas = [tool.schema for tool in self._tools.values()]
+        exclude = set(exclude_servers)
+        if not exclude:
+            return self._schemas
+        return [tool.schema for tool in self._tools.values() if tool.server not in exclude]
+
+
+# Shared registry populated by src.tools
+registry = ToolRegistry()
@@ -0,0 +1,141 @@
+"""
+Structured, size-capped MCP tool results.
+
+A CallToolResult is reduced to the text the model should see, capped at
+``TOOL_RESULT_MAX_BYTES`` with a head/tail cut, plus a short description of
+each content block. When a result is cut, the full text is written to a spill
+file and referenced by a handle, so neither the history nor the prompt ever
+holds more than the cap. The model pages through spilled results with the
+``read_result`` tool.
+"""
+import hashlib
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from mcp.types import CallToolResult
+
+MAX_RESULT_BYTES = int(os.getenv('TOOL_RESULT_MAX_BYTES', str(32 * 1024)))
+SPILL_DIR = Path(os.getenv('TOOL_RESULT_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'ollamaassist-results')))
+SPILL_TTL = float(os.getenv('TOOL_RESULT_SPILL_TTL', str(24 * 3600)))
+
+
+@dataclass
+class ToolResult:
+    """Capped text of a tool result; ``str()`` gives what the model sees"""
+    text: str
+    is_error: bool = False
+    blocks: List[Dict[str, Any]] = field(default_factory=list)
+    total_bytes: int = 0
+    truncated: bool = False
+    # Spill file holding the full text when it was truncated
+    handle: Optional[str] = None
+
+    def __str__(self) -> str:
+        return f"Error: {self.text}" if self.is_error else self.text
+
+    @classmethod
+    def from_call_result(cls, result: CallToolResult, max_bytes: int = MAX_RESULT_BYTES) -> 'ToolResult':
+        """Cap a raw MCP result, spilling the full text if it is over ``max_bytes``"""
+        parts, blocks = [], []
+        for block in result.content:
+            text = _block_text(block)
+            blocks.append(_describe(block, text))
+            if text is not None:
+                parts.append(text)
+            else:
+                parts.append(f"[{blocks[-1]['type']} content, {blocks[-1].get('mimeType', 'binary')}]")
+
+        full = "\n".join(parts)
+        data = full.encode('utf-8')
+        if len(data) <= max_bytes:
+            return cls(full, result.isError, blocks, len(data))
+
+        handle = spill(data)
+        return cls(truncate(data, max_bytes, handle), result.isError, blocks, len(data), True, handle)
+
+
+def _block_text(block) -> Optional[str]:
+    """Text carried by a content block, None for binary content"""
+    if block.type == 'text':
+        return block.text
+    if block.type == 'resource':
+        return getattr(block.resource, 'text', None)
+    return None
+
+
+def _describe(block, text: Optional[str]) -> Dict[str, Any]:
+    info = {'type': block.type}
+    mime = getattr(block, 'mimeType', None) or getattr(getattr(block, 'resource', None), 'mimeType', None)
+    if mime:
+        info['mimeType'] = mime
+    if text is not None:
+        info['bytes'] = len(text.encode('utf-8'))
+    else:
+        # Base64 payload; report the decoded size
+        payload = getattr(block, 'data', None) or getattr(getattr(block, 'resource', None), 'blob', '')
+        info['bytes'] = len(payload) * 3 // 4
+    return info
+
+
+def truncate(data: bytes, max_bytes: int, handle: Optional[str] = None) -> str:
+    """Head and tail of ``data`` around an omission marker"""
+    head = data[:max_bytes * 2 // 3].decode('utf-8', errors='ignore')
+    tail = data[len(data) - max_bytes // 3:].decode('utf-8', errors='ignore')
+    omitted = len(data) - len(head.encode('utf-8')) - len(tail.encode('utf-8'))
+    note = f"[... {omitted} bytes omitted"
+    if handle:
+        note += f"; read_result('{handle}') has the rest"
+    return f"{head}\n{note} ...]\n{tail}"
+
+
+def spill(data: bytes) -> str:
+    """Write an oversized payload to the spill directory and return its handle"""
+    SPILL_DIR.mkdir(parents=True, exist_ok=True)
+    _prune()
+    handle = f"result-{hashlib.sha256(data).hexdigest()[:16]}"
+    path = SPILL_DIR / f"{handle}.txt"
+    if not path.exists():
+        tmp = path.with_suffix('.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    return handle
+
+
+def spill_path(handle: str) -> Optional[Path]:
+    """Path of a spilled result, None if it is unknown or expired"""
+    # Handles are generated here; reject anything that could escape the directory
+    if not handle.startswith('result-') or not handle[7:].isalnum():
+        return None
+    path = SPILL_DIR / f"{handle}.txt"
+    return path if path.exists() else None
+
+
+def read_spilled(handle: str, offset: int = 0, size: int = MAX_RESULT_BYTES) -> Optional[str]:
+    """Read part of a spilled result, for paging through it"""
+    path = spill_path(handle)
+    if path is None:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size).decode('utf-8', errors='ignore')
+
+
+def spilled_size(handle: str) -> Optional[int]:
+    """Size in bytes of a spilled result, None if it is unknown or expired"""
+    path = spill_path(handle)
+    return path.stat().st_size if path is not None else None
+
+
+def _prune():
+    """Remove spill files older than SPILL_TTL"""
+    cutoff = time.time() - SPILL_TTL
+    for path in SPILL_DIR.glob('result-*.txt'):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,213 @@
+"""
+Query-aware tool selection.
+
+Every tool schema sent with a request costs prompt-eval time on every turn,
+and the full schemas carry whole docstrings. Registered tools are indexed
+(BM25 over their names, keywords, descriptions and parameter docs) and scored
+against the user's latest message; only the best TOP_K are sent, in their
+compact form. When no tool matches the message (e.g. a follow-up like "go
+on"), the full set is sent unchanged so the model never loses a tool it needs.
+Tools registered with ``always=True`` are never ranked; they are added to
+every selection that matched another tool.
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .llm_helper import CHARS_PER_TOKEN
+from .telemetry import turn_metrics
+from .tool_registry import RegisteredTool, ToolRegistry, registry
+
+SELECTION_ENABLED = os.getenv('TOOL_SELECTION_ENABLED', 'true').lower() == 'true'
+# Tools sent when the message matches some of them
+TOP_K = int(os.getenv('TOOL_SELECTION_TOP_K', '4'))
+# Scores below this are chance overlaps (one common word) and don't count as a match
+MIN_SCORE = float(os.getenv('TOOL_SELECTION_MIN_SCORE', '1.0'))
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+# Field weights: a word in the tool's name or keywords counts this many times
+_NAME_WEIGHT = 3
+_KEYWORD_WEIGHT = 2
+
+_WORD = re.compile(r'[a-z0-9]+')
+_STOPWORDS = frozenset("""
+    a about all an and any are as at be by can could do does for from get give have help how i in into is it
+    its me my of on or our please show some tell that the their them there these this to us use using want
+    what when where which who why will with would you your
+""".split())
+
+
+def _stem(word: str) -> str:
+    """Fold common English inflections so 'files' and 'listing' match 'file' and 'list'"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('ches', 'shes', 'xes', 'sses')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    if len(word) > 5 and word.endswith('ing'):
+        return word[:-3]
+    if len(word) > 4 and word.endswith('ed'):
+        return word[:-2]
+    return word
+
+
+def terms(text: str) -> List[str]:
+    """Lowercased, stemmed words of ``text`` without stopwords"""
+    return [_stem(w) for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def _document(tool: RegisteredTool) -> List[str]:
+    function = tool.schema['function']
+    name = function['name'].replace('_', ' ')
+    parameters = ' '.join(
+        f"{param} {details.get('description', '')}"
+        for param, details in function['parameters']['properties'].items()
+    )
+    return (
+        terms(name) * _NAME_WEIGHT
+        + terms(' '.join(tool.keywords)) * _KEYWORD_WEIGHT
+        + terms(function['description'])
+        + terms(parameters)
+    )
+
+
+def _schema_tokens(schemas: List[Dict[str, Any]]) -> int:
+    # Same estimate prompt_budget() charges the context window for tools
+    return len(json.dumps(schemas)) // CHARS_PER_TOKEN if schemas else 0
+
+
+@dataclass
+class ToolSelection:
+    """Schemas chosen for one request and what they cost"""
+    tools: List[Dict[str, Any]]
+    # False when no tool matched and the full set is sent
+    matched: bool
+    full_tokens: int
+    sent_tokens: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.full_tokens - self.sent_tokens
+
+    @property
+    def names(self) -> List[str]:
+        return [tool['function']['name'] for tool in self.tools]
+
+
+class ToolIndex:
+    """BM25 index over a registry's tools, rebuilt when tools are registered"""
+
+    def __init__(
+        self,
+        registry: ToolRegistry,
+        top_k: int = TOP_K,
+        min_score: float = MIN_SCORE,
+        enabled: bool = SELECTION_ENABLED,
+    ):
+        self.registry = registry
+        self.top_k = top_k
+        self.min_score = min_score
+        self.enabled = enabled
+        self.counts = {'selections': 0, 'fallbacks': 0, 'tokens_saved': 0}
+        self._lock = threading.Lock()
+        self._built_for: Tuple[str, ...] = ()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+
+    def _ensure_index(self) -> List[RegisteredTool]:
+        # Tools sent with every selection are never ranked
+        tools = [tool for tool in self.registry.tools() if not tool.always]
+        names = tuple(tool.name for tool in tools)
+        if names != self._built_for:
+            postings: Dict[str, Dict[str, int]] = {}
+            lengths = {}
+            for tool in tools:
+                document = _document(tool)
+                lengths[tool.name] = len(document)
+                for term, count in Counter(document).items():
+                    postings.setdefault(term, {})[tool.name] = count
+            self._postings, self._lengths, self._built_for = postings, lengths, names
+        return tools
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """BM25 score of every tool that shares a term with ``query``"""
+        with self._lock:
+            self._ensure_index()
+            count = len(self._lengths)
+            if not count:
+                return {}
+            average = sum(self._lengths.values()) / count
+            scores: Dict[str, float] = {}
+            for term in set(terms(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for name, frequency in postings.items():
+                    norm = frequency + _K1 * (1 - _B + _B * self._lengths[name] / average)
+                    scores[name] = scores.get(name, 0.0) + idf * frequency * (_K1 + 1) / norm
+            return scores
+
+    def select(self, query: str, exclude_servers: Iterable[str] = ()) -> ToolSelection:
+        """
+        Compact schemas of the top ``top_k`` tools for ``query``.
+
+        Falls back to every (full) schema when no tool scores ``min_score``
+        or selection is disabled. Tools registered with ``always=True`` are
+        not ranked and only join a selection that matched another tool.
+        Tools of ``exclude_servers`` are never sent.
+        """
+        full = self.registry.schemas(exclude_servers=exclude_servers)
+        full_tokens = _schema_tokens(full)
+        if not self.enabled or not full:
+            return ToolSelection(full, False, full_tokens, full_tokens)
+
+        exclude = set(exclude_servers)
+        scores = self.scores(query)
+        ranked = sorted(
+            (
+                tool for tool in self.registry.tools()
+                if not tool.always and scores.get(tool.name, 0) >= self.min_score and tool.server not in exclude
+            ),
+            key=lambda tool: scores[tool.name],
+            reverse=True,
+        )[:self.top_k]
+
+        if ranked:
+            ranked += [
+                tool for tool in self.registry.tools()
+                if tool.always and tool.server not in exclude
+            ]
+            tools = [tool.compact for tool in ranked]
+            selection = ToolSelection(tools, True, full_tokens, _schema_tokens(tools))
+        else:
+            selection = ToolSelection(full, False, full_tokens, full_tokens)
+
+        with self._lock:
+            self.counts['selections'] += 1
+            self.counts['fallbacks'] += not selection.matched
+            self.counts['tokens_saved'] += selection.tokens_saved
+        logging.debug(
+            "Tool selection: %s (%d of %d schema tokens, matched=%s)",
+            selection.names, selection.sent_tokens, full_tokens, selection.matched,
+        )
+        return selection
+
+    def gauges(self) -> Dict[str, float]:
+        """Selection totals for the metrics export"""
+        with self._lock:
+            return {f'{name}_total': count for name, count in self.counts.items()}
+
+
+# Shared index over the tools registered by src.tools
+tool_index = ToolIndex(registry)
+turn_metrics.add_gauges('tool_selection', tool_index.gauges)
@@ -2,11 +2,18 @@ import logging
 import asyncio
 from typing import Any
 from dotenv import load_dotenv
+from .allowed_dirs import allowed_directories
 from .mcp_client import mcp
+from .tool_registry import registry
+from .tool_result import MAX_RESULT_BYTES, read_spilled, spilled_size
 
 # Load environment variables
 load_dotenv()
 
+@registry.register(
+    server="brave-search",
+    keywords=("news", "latest", "recent", "current", "find", "lookup", "internet", "online", "trends", "nearby"),
+)
 async def brave(action: str, query: str = "", count: int = 5, offset: int = 0) -> Any:
     """
     Brave Search API with web and local search capabilities
@@ -20,9 +27,15 @@ async def brave(action: str, query: str = "", count: int = 5, offset: int = 0) -
     - Local business/places search
     - Multiple result formats
     - Safe search options
+
+    Args:
+        action: Search type, either 'web' or 'local'
+        query: Search terms
+        count: Number of results to return
+        offset: Result offset for paging through web results
     """
     try:
-        logging.debug(f"Brave search called with: action={action}, query={query}, count={count}, offset={offset}")
+        logging.debug("Brave search called with: action=%s, query=%s, count=%s, offset=%s", action, query, count, offset)
         server_name = "brave-search"
 
         if action == "web":
@@ -31,7 +44,7 @@ async def brave(action: str, query: str = "", count: int = 5, offset: int = 0) -
                 "count": int(count),
                 "offset": int(offset)
             }
-            logging.debug(f"Calling brave web search with args: {args}")
+            logging.debug("Calling brave web search with args: %s", args)
             return await mcp(
                 server=server_name,
                 tool="brave_web_search",
@@ -43,7 +56,7 @@ async def brave(action: str, query: str = "", count: int = 5, offset: int = 0) -
                 "query": str(query),
                 "count": int(count)
             }
-            logging.debug(f"Calling brave local search with args: {args}")
+            logging.debug("Calling brave local search with args: %s", args)
             return await mcp(
                 server=server_name,
                 tool="brave_local_search",
@@ -57,6 +70,10 @@ async def brave(action: str, query: str = "", count: int = 5, offset: int = 0) -
         logging.error(f"Brave search error: {str(e)}", exc_info=True)
         return {"error": f"Brave search failed: {str(e)}"}
 
+@registry.register(
+    server="filesystem",
+    keywords=("folder", "document", "contents", "save", "open", "create", "delete", "move", "rename"),
+)
 async def filesystem(action: str, path: str = "", content: str = "") -> Any:
     """
     Filesystem MCP Server for file operations within allowed directories.
@@ -76,9 +93,21 @@ async def filesystem(action: str, path: str = "", content: str = "") -> Any:
     - Search files
     - Get file metadata
     - Allowed directories can be restricted in the server config
+
+    Args:
+        action: One of read, write, list, info, search, allowed
+        path: File or directory path to operate on
+        content: Text to write, or the name pattern for search
     """
     server_name = "filesystem"
 
+    # Reject paths outside the allowed directories locally; the directory
+    # list is fetched once per server session, not once per call
+    if path and action in ("read", "write", "list", "info", "search"):
+        allowed = await allowed_directories.get(server_name)
+        if allowed is not None and not allowed.contains(path):
+            return {"error": f"Path '{path}' is not in allowed directories"}
+
     # read a file
     if action == "read":
         return await mcp(
@@ -144,6 +173,31 @@ async def filesystem(action: str, path: str = "", content: str = "") -> Any:
             )
         }
 
+# Only called by the model after a cut result; never ranked by tool selection
+@registry.register(always=True)
+def read_result(handle: str, offset: int = 0, limit: int = MAX_RESULT_BYTES) -> Any:
+    """
+    Page through a result that was cut short. Call it only with the handle
+    named in a cut result, e.g. read_result('result-0123abcd'), passing the
+    offset given at the end of each part.
+
+    Args:
+        handle: Handle named in the cut result, starting with 'result-'
+        offset: Byte offset to start reading from
+        limit: Maximum number of bytes to return
+    """
+    total = spilled_size(str(handle))
+    if total is None:
+        return {"error": f"Unknown or expired result handle '{handle}'"}
+
+    offset = max(0, int(offset))
+    limit = max(1, min(int(limit), MAX_RESULT_BYTES))
+    text = read_spilled(str(handle), offset, limit)
+    end = min(offset + limit, total)
+    if end < total:
+        return f"{text}\n[bytes {offset}-{end} of {total}; continue with offset={end}]"
+    return f"{text}\n[bytes {offset}-{total} of {total}; end of result]"
+
 if __name__ == "__main__":
     async def main():
         # Test Brave
@@ -0,0 +1,109 @@
+"""
+In-memory store with per-entry TTLs and an LRU byte budget.
+
+Shared by the tool result cache and the response cache, which decide what is
+cached and under which key; the store handles expiry, LRU ordering, eviction
+once ``max_bytes`` is exceeded, and hit/miss counts.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    expires_at: float
+
+
+class TTLCache:
+    """Thread-safe TTL + LRU store with a byte budget"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, is_stale: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        Stored value, or None on a miss.
+
+        Args:
+            key: Entry key
+            is_stale: Extra check on an unexpired value; stale entries are dropped
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if time.monotonic() > entry.expires_at or (is_stale is not None and is_stale(entry.value)):
+                    self._remove(key)
+                    entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: str, value: Any, size: int, ttl: float) -> bool:
+        """Store ``value``, evicting the least recently used entries; False if it can never fit"""
+        if size > self.max_bytes:
+            return False
+
+        entry = _Entry(value=value, size=size, expires_at=time.monotonic() + ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def discard(self, predicate: Callable[[Any], bool]):
+        """Drop every entry whose value matches ``predicate``"""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if predicate(entry.value):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+        }
+
+    def gauges(self) -> Dict[str, float]:
+        """Hit and eviction totals for the metrics export"""
+        with self._lock:
+            return {
+                'hits_total': self.hits,
+                'misses_total': self.misses,
+                'evictions_total': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
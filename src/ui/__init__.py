@@ -1,3 +1,7 @@
+from .servers import render_server_status
 from .sidebar import render_system_prompt_editor
+from .stream import StreamRenderer
+from .timings import display_turn_timings
+from .tool_output import render_tool_output
 
-__all__ = ['render_system_prompt_editor']
\ No newline at end of file
+__all__ = ['render_server_status', 'render_system_prompt_editor', 'StreamRenderer', 'display_turn_timings', 'render_tool_output']
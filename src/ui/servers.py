@@ -0,0 +1,19 @@
+import streamlit as st
+
+_ICONS = {'starting': "🟡", 'ready': "🟢", 'failed': "🔴"}
+
+def render_server_status(statuses):
+    """Sidebar list of MCP servers and whether they finished starting"""
+    if not statuses:
+        return
+    st.sidebar.markdown("## MCP Servers")
+    for name, status in sorted(statuses.items()):
+        if status.state == 'ready':
+            detail = f"ready in {status.seconds:.1f}s, {len(status.tools)} tools"
+        elif status.state == 'failed':
+            detail = "failed to start, tools hidden"
+        else:
+            detail = "starting..."
+        st.sidebar.markdown(f"{_ICONS.get(status.state, '⚪')} **{name}** — {detail}")
+        if status.error:
+            st.sidebar.caption(status.error)
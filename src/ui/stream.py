@@ -0,0 +1,68 @@
+"""
+Throttled rendering of streamed assistant text.
+
+Writing every chunk to a Streamlit placeholder re-sends the whole growing
+markdown string each time, which is quadratic in response length. Chunks are
+buffered here and pushed to the placeholder at most ``STREAM_RENDER_FPS``
+times per second, or sooner once ``STREAM_FLUSH_TOKENS`` chunks are waiting.
+"""
+import os
+import time
+from typing import Callable, List
+
+STREAM_RENDER_FPS = float(os.getenv('STREAM_RENDER_FPS', '10'))
+STREAM_FLUSH_TOKENS = int(os.getenv('STREAM_FLUSH_TOKENS', '50'))
+CURSOR = "▌"
+
+
+class StreamRenderer:
+    """Buffer streamed chunks and render them to a placeholder in batches"""
+
+    def __init__(
+        self,
+        placeholder,
+        fps: float = STREAM_RENDER_FPS,
+        flush_tokens: int = STREAM_FLUSH_TOKENS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            placeholder: Anything with a ``markdown(text)`` method, e.g. ``st.empty()``
+            fps: Max renders per second while streaming
+            flush_tokens: Render early once this many chunks are buffered
+            clock: Monotonic time source
+        """
+        self.placeholder = placeholder
+        self.interval = 1 / fps if fps > 0 else 0
+        self.flush_tokens = flush_tokens
+        self.clock = clock
+        self._rendered = ""
+        self._pending: List[str] = []
+        self._last_flush = clock()
+
+    @property
+    def text(self) -> str:
+        """Everything written so far, rendered or not"""
+        return self._rendered + "".join(self._pending)
+
+    def write(self, chunk: str):
+        """Buffer a chunk, rendering if the frame interval or chunk limit is reached"""
+        self._pending.append(chunk)
+        if (len(self._pending) >= self.flush_tokens
+                or self.clock() - self._last_flush >= self.interval):
+            self.flush()
+
+    def flush(self, final: bool = False):
+        """Render everything buffered; the cursor is left off on the final flush"""
+        if self._pending:
+            self._rendered += "".join(self._pending)
+            self._pending.clear()
+        elif not final:
+            return
+        self.placeholder.markdown(self._rendered if final else self._rendered + CURSOR)
+        self._last_flush = self.clock()
+
+    def close(self) -> str:
+        """Final render without the cursor; returns the full text"""
+        self.flush(final=True)
+        return self._rendered
@@ -0,0 +1,61 @@
+import json
+
+import streamlit as st
+
+# Width of the waterfall bars in characters
+BAR_WIDTH = 24
+
+def _waterfall(trace):
+    """Text waterfall of a trace dict: one row per span, bars on a shared time axis"""
+    total = trace['duration_ms'] or 1
+    name_width = max([len(s['name']) for s in trace['spans']] + [4])
+    rows = []
+    for s in trace['spans']:
+        start = int(s['offset_ms'] / total * BAR_WIDTH)
+        length = max(1, round(s['duration_ms'] / total * BAR_WIDTH))
+        bar = (" " * start + "█" * length)[:BAR_WIDTH].ljust(BAR_WIDTH)
+        rows.append(f"{s['name']:<{name_width}} |{bar}| {s['duration_ms']:>8.1f} ms")
+    rows.append(f"{'turn':<{name_width}} |{'█' * BAR_WIDTH}| {total:>8.1f} ms")
+    return "\n".join(rows)
+
+def _ollama_summary(trace):
+    """Ollama's own prompt/eval timings summed over the turn's generations"""
+    stats = [s['attrs'] for s in trace['spans'] if s['name'] == 'llm.stream' and 'eval_count' in s['attrs']]
+    if not stats:
+        return None
+    prompt_tokens = sum(a.get('prompt_eval_count') or 0 for a in stats)
+    prompt_ms = sum(a.get('prompt_eval_duration') or 0 for a in stats) / 1e6
+    eval_tokens = sum(a.get('eval_count') or 0 for a in stats)
+    eval_ms = sum(a.get('eval_duration') or 0 for a in stats) / 1e6
+    rate = f", {eval_tokens / eval_ms * 1000:.1f} tok/s" if eval_ms else ""
+    return (f"Prompt eval: {prompt_tokens} tokens in {prompt_ms:.0f} ms · "
+            f"Generation: {eval_tokens} tokens in {eval_ms:.0f} ms{rate}")
+
+def _tool_summary(trace):
+    """Tools sent with the turn and the schema tokens tool selection saved"""
+    names = trace['attrs'].get('tools')
+    if names is None:
+        return None
+    saved = trace['attrs'].get('tool_tokens_saved') or 0
+    sent = ", ".join(names) or "none"
+    return f"Tools sent: {sent}" + (f" · ~{saved} prompt tokens saved" if saved else "")
+
+def display_turn_timings(trace):
+    """Sidebar panel with the latency breakdown of the last turn"""
+    if trace is None:
+        return
+    data = trace.to_dict()
+    with st.sidebar.expander("⏱️ Last Turn Timing", expanded=False):
+        st.code(_waterfall(data), language=None)
+        summary = _ollama_summary(data)
+        if summary:
+            st.caption(summary)
+        tools = _tool_summary(data)
+        if tools:
+            st.caption(tools)
+        st.download_button(
+            "Download trace (JSON)",
+            data=json.dumps(data, indent=2),
+            file_name="turn_trace.json",
+            mime="application/json",
+        )
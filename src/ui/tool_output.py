@@ -0,0 +1,31 @@
+import os
+
+import streamlit as st
+from src.tool_result import spill_path
+
+# Characters of a tool result shown before the rest is folded away
+PREVIEW_CHARS = int(os.getenv('TOOL_OUTPUT_PREVIEW_CHARS', '1500'))
+
+def render_tool_output(message, collapsed=False):
+    """
+    Render a 'function' message, folding long output into an expander.
+
+    With ``collapsed`` (used for history) the whole output sits in a closed expander.
+    """
+    content = message.get('content') or ''
+    with st.chat_message("tool"):
+        if collapsed:
+            with st.expander(f"Output of {message.get('name', 'tool')} ({len(content):,} characters)"):
+                st.code(content, language=None)
+        elif len(content) <= PREVIEW_CHARS:
+            st.markdown(content)
+        else:
+            st.markdown(content[:PREVIEW_CHARS] + " …")
+            with st.expander(f"Full output ({len(content):,} characters)"):
+                st.code(content, language=None)
+
+        # Truncated results keep the complete payload on disk
+        handle = message.get('handle')
+        path = spill_path(handle) if handle else None
+        if path is not None:
+            st.caption(f"Result truncated; complete output ({path.stat().st_size:,} bytes) saved to `{path}`")
@@ -1,18 +1,42 @@
-import asyncio
-import inspect
 import json
 import logging
+import os
+import time
+import uuid
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequestType
 
 from src.config import config
-from src.llm_helper import chat
-from src.tools import brave, filesystem
-from src.ui import render_system_prompt_editor
+from src.conversation import Conversation
+from src.conversation_store import conversation_store
+from src.dispatcher import ToolDispatcher
+from src.engine import run_turn
+from src.llm_helper import warm_model
+from src.mcp_warmup import ENABLED as PREWARM_SERVERS, server_warmup
+from src.logging_config import setup_logging
+from src.response_cache import response_cache
+from src.runtime import CLOSE_TIMEOUT, BackgroundLoop, CancelToken, TurnCancelled
+from src.scheduler import SchedulerOverloaded, in_session
+from src.telemetry import Trace, finish_turn, traced
+from src.tools import registry
+from src.tool_selection import tool_index
+from src.ui import (
+    StreamRenderer, display_turn_timings, render_server_status, render_system_prompt_editor, render_tool_output
+)
 from src.prompts import SystemPrompt
 
 # Configure logging
-logging.basicConfig(filename='debug.log', level=logging.DEBUG)
+setup_logging(config)
+
+tool_dispatcher = ToolDispatcher(registry.functions, registry.servers)
+
+# Messages rendered from history per page; older ones load on request
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '30'))
+# Chats listed in the sidebar: 'session' (saved from this browser session),
+# 'all' (every stored chat; single-user installs only) or 'off'
+RECENT_CHATS = os.getenv('RECENT_CHATS', 'session').lower()
 
 def display_tool_details(tools):
     """Display available tools and their details in the sidebar."""
@@ -34,31 +58,80 @@ def setup_sidebar():
         render_system_prompt_editor()
         
         # Model selection and tool toggle
-        model = st.selectbox('Model:', config.OLLAMA_MODELS, 
-                           index=config.OLLAMA_MODELS.index(config.DEFAULT_MODEL))
+        models = config.models()
+        model = st.selectbox('Model:', models,
+                           index=models.index(config.default_model()))
+        # Load the selected model while the user is still typing
+        if warm_model(model) == 'loading':
+            st.caption("⏳ Loading model into memory...")
         use_tools = st.toggle('Use Tools', value=True)
+        if response_cache.enabled:
+            st.toggle('Reuse cached answers', value=True, key='reuse_cached_answers',
+                      help='Turn off to have the next answers generated again')
         
         # Display tool details if enabled
         if use_tools:
+            render_server_status(server_warmup.statuses())
             tools = load_tools_from_functions()
             display_tool_details(tools)
             
         if st.button('New Chat', key='new_chat', help='Start a new chat'):
-            st.session_state.messages = []
+            st.session_state.conversation.clear()
+            st.session_state.pop('history_shown', None)
+            st.query_params.pop('chat', None)
             st.rerun()
+
+        display_recent_chats()
             
     return model, use_tools
 
+def display_recent_chats():
+    """Links to stored chats; each opens in its own session"""
+    if RECENT_CHATS == 'off':
+        return
+    chats = conversation_store.recent(owner=None if RECENT_CHATS == 'all' else get_session_id())
+    if not chats:
+        return
+    with st.expander("Recent Chats", expanded=False):
+        for chat in chats:
+            title = (chat['title'] or 'Untitled').replace('[', '(').replace(']', ')').replace('\n', ' ')
+            st.markdown(f"- [{title}](?chat={chat['id']})")
+
+def load_conversation():
+    """The stored chat named in the URL, or a new one"""
+    chat_id = st.query_params.get('chat')
+    conversation = conversation_store.load(chat_id) if chat_id else None
+    return conversation or Conversation()
+
+def save_conversation():
+    """Store new messages and keep the chat's id in the URL so it survives restarts"""
+    conversation = st.session_state.conversation
+    if conversation_store.save(conversation, owner=get_session_id()) and st.query_params.get('chat') != conversation.id:
+        st.query_params['chat'] = conversation.id
+
 def display_previous_messages():
-    for message in st.session_state.messages:
+    """Render the most recent page of history, so rerun cost doesn't grow with the chat"""
+    messages = st.session_state.conversation.messages
+    shown = st.session_state.get('history_shown', HISTORY_PAGE_SIZE)
+    start = max(0, len(messages) - shown)
+    # Never open the window in the middle of a turn
+    while start > 0 and messages[start]["role"] != "user":
+        start -= 1
+
+    if start > 0 and st.button(f"Show older messages ({start} hidden)", key='show_older'):
+        st.session_state.history_shown = shown + HISTORY_PAGE_SIZE
+        st.rerun()
+
+    for message in messages[start:]:
         display_role = message["role"]
         if display_role == "assistant" and "tool_calls" in message:
+            if message["content"]:
+                with st.chat_message("assistant"):
+                    st.markdown(message["content"])
             for tool_call in message["tool_calls"]:
-                function_name = tool_call["function"]["name"]
-                function_args = tool_call["function"]["arguments"]
-                content = f"**Function Call ({function_name}):**\n```json\n{json.dumps(function_args, indent=2)}\n```"
-                with st.chat_message("tool"):
-                    st.markdown(content)
+                display_tool_call(tool_call, collapsed=True)
+        elif display_role == "function":
+            render_tool_output(message, collapsed=True)
         else:
             with st.chat_message(display_role):
                 st.markdown(message["content"])
@@ -67,145 +140,151 @@ def process_user_input():
     if user_prompt := st.chat_input("What would you like to ask?"):
         with st.chat_message("user"):
             st.markdown(user_prompt)
-        st.session_state.messages.append({"role": "user", "content": user_prompt})
+        st.session_state.conversation.append({"role": "user", "content": user_prompt})
+        save_conversation()
 
 def load_tools_from_functions():
-    tools = []
-    available_functions = {
-        'brave': brave,
-        'filesystem': filesystem
-    }
-    
-    for name, func in available_functions.items():
-        sig = inspect.signature(func)
-        params = {}
-        
-        for param_name, param in sig.parameters.items():
-            param_type = 'string'  # default
-            if param.annotation == int:
-                param_type = 'integer'
-            elif param.annotation == list:
-                param_type = 'array'
-            elif param.annotation == dict:
-                param_type = 'object'
-                
-            params[param_name] = {
-                'type': param_type,
-                'description': '',  # Let the docstring explain the parameters
-            }
-            
-            # Add default value if one exists
-            if param.default != param.empty:
-                params[param_name]['default'] = param.default
-
-        tools.append({
-            'type': 'function',
-            'function': {
-                'name': name,
-                'description': func.__doc__,
-                'parameters': {
-                    'type': 'object',
-                    'properties': params
-                },
-                'is_async': asyncio.iscoroutinefunction(func)
-            }
-        })
-    return tools
+    """Tool schemas, precomputed by the registry, minus those of servers that failed to start."""
+    return registry.schemas(exclude_servers=server_warmup.unavailable())
+
+def select_tools(query):
+    """Compact schemas of the tools relevant to ``query``; all schemas if none match."""
+    return tool_index.select(query, exclude_servers=server_warmup.unavailable())
+
+def display_tool_call(tool_call, collapsed=False):
+    """Render a tool call made by the assistant; history shows it collapsed."""
+    function_name = tool_call["function"]["name"]
+    function_args = tool_call["function"]["arguments"]
+    with st.chat_message("tool"):
+        if collapsed:
+            with st.expander(f"Function Call ({function_name})"):
+                st.code(json.dumps(function_args, indent=2), language="json")
+        else:
+            st.markdown(f"**Function Call ({function_name}):**\n```json\n{json.dumps(function_args, indent=2)}\n```")
+
+def get_runtime():
+    """Event loop for this browser session; the LLM stream and tool calls run on it."""
+    if 'runtime' not in st.session_state:
+        st.session_state.runtime = BackgroundLoop('chat-session')
+    return st.session_state.runtime
+
+def get_session_id():
+    """Identifies this browser session to the request scheduler"""
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+def rerun_requested():
+    """True once Streamlit has asked this script run to stop or rerun"""
+    ctx = get_script_run_ctx()
+    requests = getattr(ctx, 'script_requests', None)
+    # There is no public accessor; Streamlit itself only acts on the request
+    # at the next st.* call, which a run waiting on the model doesn't make
+    state = getattr(requests, '_state', ScriptRequestType.CONTINUE)
+    return state is not ScriptRequestType.CONTINUE
+
+def cancel_running_turn():
+    """
+    Wait for a turn still running from an earlier script run of this session.
+
+    The old run cancels its own turn as soon as an interaction (New Chat, new
+    input) requests a rerun, see generate_response. With runner.fastReruns
+    (the default) Streamlit starts this run without waiting for the old one
+    to unwind, so make sure the old turn has been rolled back before this run
+    touches the conversation.
+    """
+    token = st.session_state.get('turn_cancel')
+    if token is not None:
+        token.cancel()
+        if not token.wait_finished(CLOSE_TIMEOUT):
+            logging.warning("Cancelled turn did not stop in time")
 
 def generate_response(model, use_tools):
-    if st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
+    conversation = st.session_state.conversation
+    if conversation.messages and conversation.messages[-1]["role"] == "user":
         with st.spinner('Generating response...'):
             # Get current system prompt
             system_prompt = SystemPrompt(
                 additional_instructions=st.session_state.get('additional_instructions')
             ).get_full_prompt()
             
-            # Add system prompt to messages
-            messages = [{"role": "system", "content": system_prompt}] + st.session_state.messages
-            
-            tools = load_tools_from_functions() if use_tools else []
-            response = chat(messages, model=model, tools=tools, stream=False)
+            # Unchanged prompts keep the payload prefix stable across turns
+            conversation.set_system_prompt(system_prompt)
             
-            if "tool_calls" in response['message']:
-                assistant_message = response['message']
-                st.session_state.messages.append(assistant_message)
-                
-                for tool_call in assistant_message['tool_calls']:
-                    function_name = tool_call["function"]["name"]
-                    function_args = tool_call["function"]["arguments"]
-                    
-                    # Debug logging
-                    logging.debug(f"Tool call detected: {function_name}")
-                    logging.debug(f"Arguments type: {type(function_args)}")
-                    logging.debug(f"Arguments content: {function_args}")
-                    
-                    with st.chat_message("tool"):
-                        content = f"**Function Call ({function_name}):**\n```json\n{json.dumps(function_args, indent=2)}\n```"
-                        st.markdown(content)
-                    
-                    available_functions = {
-                        'brave': {'func': brave, 'is_async': True},
-                        'filesystem': {'func': filesystem, 'is_async': True}
-                    }
-
-                    if function_name in available_functions:
-                        func_info = available_functions[function_name]
-                        try:
-                            # Parse arguments if they're a string
-                            args = function_args if isinstance(function_args, dict) else json.loads(function_args)
-                            
-                            logging.debug(f"Calling {function_name} with args: {args}")
-                            
-                            if func_info['is_async']:
-                                try:
-                                    function_response = asyncio.run(func_info['func'](**args))
-                                    if isinstance(function_response, dict) and 'error' in function_response:
-                                        raise Exception(function_response['error'])
-                                except Exception as e:
-                                    logging.error(f"Async function error: {str(e)}", exc_info=True)
-                                    raise
-                            else:
-                                function_response = func_info['func'](**args)
-                            
-                            logging.debug(f"Function response: {function_response}")
-                            
-                            tool_message = {
-                                'role': 'function',
-                                'name': function_name,
-                                'content': str(function_response)
-                            }
-                            st.session_state.messages.append(tool_message)
-                            with st.chat_message("tool"):
-                                st.markdown(tool_message['content'])
-                        except Exception as e:
-                            error_message = f"Error executing {function_name}: {str(e)}"
-                            logging.error(f"Error details - Args: {function_args}, Error: {str(e)}")
-                            st.error(error_message)
-                            logging.error(error_message)
-
-                # Stream the assistant's response
-                llm_stream = chat(messages, model=model, stream=True)
-                assistant_response = ""
-                with st.chat_message("assistant"):
-                    stream_placeholder = st.empty()
-                    for chunk in llm_stream:
-                        content = chunk['message']['content']
-                        assistant_response += content
-                        stream_placeholder.markdown(assistant_response + "▌")
-                    stream_placeholder.markdown(assistant_response)
-                st.session_state.messages.append({"role": "assistant", "content": assistant_response})
-            else:
-                # Handle responses without tool calls
-                llm_stream = chat(messages, model=model, stream=True)
-                assistant_response = ""
-                with st.chat_message("assistant"):
-                    stream_placeholder = st.empty()
-                    for chunk in llm_stream:
-                        content = chunk['message']['content']
-                        assistant_response += content
-                        stream_placeholder.markdown(assistant_response + "▌")
-                    stream_placeholder.markdown(assistant_response)
-                st.session_state.messages.append({"role": "assistant", "content": assistant_response})
+            trace = Trace('turn', model=model)
+            tools = []
+            if use_tools:
+                selection = select_tools(conversation.messages[-1]["content"])
+                tools = selection.tools
+                trace.attrs.update(tools=selection.names, tool_tokens_saved=selection.tokens_saved)
+
+            # Single streamed pass; tool calls are detected from the stream
+            renderer = None
+            queue_notice = None
+            render_start, render_seconds = None, 0.0
+            cancel = st.session_state.turn_cancel = CancelToken()
+            turn = run_turn(
+                conversation, model, tools=tools, execute_tools=tool_dispatcher.dispatch, cancel=cancel,
+                cache=response_cache, refresh_cache=not st.session_state.get('reuse_cached_answers', True),
+            )
+            # A new interaction can't interrupt the wait for the next event, so watch for it
+            events = get_runtime().iterate(
+                traced(trace, in_session(get_session_id(), turn)),
+                on_idle=lambda: rerun_requested() and cancel.cancel(),
+            )
+            try:
+                for event in events:
+                    started = time.perf_counter()
+                    render_start = render_start or started
+                    if event.type == 'queued':
+                        queue_notice = queue_notice or st.empty()
+                        queue_notice.info(f"⏳ Waiting for {model}: position {event.content} in the queue")
+                        continue
+                    if queue_notice is not None:
+                        queue_notice.empty()
+                        queue_notice = None
+
+                    if event.type == 'cached':
+                        st.caption("⚡ Cached answer")
+
+                    elif event.type == 'token':
+                        if renderer is None:
+                            with st.chat_message("assistant"):
+                                renderer = StreamRenderer(st.empty())
+                        renderer.write(event.content)
+
+                    elif event.type == 'assistant':
+                        if renderer is not None:
+                            renderer.close()
+                        renderer = None
+                        for tool_call in event.message.get('tool_calls', []):
+                            display_tool_call(tool_call)
+
+                    elif event.type == 'tool_result':
+                        render_tool_output(event.message)
+
+                    elif event.type == 'tool_error':
+                        st.error(event.content)
+                    render_seconds += time.perf_counter() - started
+            except SchedulerOverloaded as e:
+                # The question stays in history and is retried on the next interaction
+                if queue_notice is not None:
+                    queue_notice.empty()
+                st.warning(str(e))
+            except TurnCancelled:
+                # A rerun was requested; the next run renders the page
+                return
+            finally:
+                events.close()
+                cancel.finish()
+                if st.session_state.get('turn_cancel') is cancel:
+                    del st.session_state.turn_cancel
+
+            # Rendering is interleaved with the stream; record its total busy time
+            if render_start is not None:
+                trace.add('ui.render', render_start, render_start + render_seconds)
+            st.session_state.last_trace = finish_turn(trace)
+            save_conversation()
 
 def show_quick_start_buttons():
     """Display quick start buttons for tool discovery."""
@@ -215,7 +294,7 @@ def show_quick_start_buttons():
     col1, col2, col3, col4, col5 = st.columns(5)
     
     # Only show buttons if no messages exist
-    if not st.session_state.messages:
+    if not st.session_state.conversation.messages:
         with col1:
             if st.button("🔍 Deep Seek AI News"):
                 return "Can you help me search the web for projects integrating with Deep Seek AI, as well as other important news about it?"
@@ -239,23 +318,31 @@ def main():
         initial_sidebar_state="expanded"
     )
     st.title(config.PAGE_TITLE)
+
+    # Start MCP servers in the background so the first tool call finds them running
+    if PREWARM_SERVERS:
+        server_warmup.start()
+
+    cancel_running_turn()
+    if "conversation" not in st.session_state:
+        st.session_state.conversation = load_conversation()
+
     model, use_tools = setup_sidebar()
     
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-    
     # Show quick start buttons and handle their actions
     quick_start_action = show_quick_start_buttons()
     if quick_start_action:
-        st.session_state.messages.append({
+        st.session_state.conversation.append({
             "role": "user",
             "content": quick_start_action
         })
+        save_conversation()
         st.rerun()
     
     display_previous_messages()
     process_user_input()
     generate_response(model, use_tools)
+    display_turn_timings(st.session_state.get('last_trace'))
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,26 @@
+from mcp.types import CallToolResult, TextContent
+
+from src.allowed_dirs import AllowedDirectories
+
+def test_contains_uses_path_components_not_string_prefix(tmp_path):
+    project = tmp_path / "project"
+    allowed = AllowedDirectories([str(project)])
+
+    assert allowed.contains(str(project))
+    assert allowed.contains(str(project / "src" / "app.py"))
+    assert allowed.contains(str(project / "src" / ".." / "README.md"))
+    assert not allowed.contains(str(tmp_path / "project-secrets" / "key.pem"))
+    assert not allowed.contains(str(project / ".." / "other"))
+
+def test_symlinks_are_resolved(tmp_path):
+    real = tmp_path / "real"
+    real.mkdir()
+    link = tmp_path / "link"
+    link.symlink_to(real)
+
+    assert AllowedDirectories([str(link)]).contains(str(real / "file.txt"))
+    assert not AllowedDirectories([str(real)]).contains(str(tmp_path / "file.txt"))
+
+def test_from_result_parses_server_listing():
+    result = CallToolResult(content=[TextContent(type="text", text="Allowed directories:\n/srv/data\n/home/me")])
+    assert AllowedDirectories.from_result(result).directories == ("/srv/data", "/home/me")
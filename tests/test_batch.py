@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import pytest
+from ollama import ChatResponse, Message
+
+from src import batch, engine
+from src.scheduler import RequestScheduler
+
+
+async def echo_chat(messages, model, tools=None, stream=True, formatted=False, ticket=None):
+    """Answers every conversation with its last message"""
+    async def replay():
+        text = messages[-1]["content"]
+        if text == "explode":
+            raise RuntimeError("model crashed")
+        yield ChatResponse(model=model, done=True, message=Message(role="assistant", content=f"echo: {text}"))
+    return replay()
+
+
+def write_jsonl(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records))
+
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_runs_every_prompt_and_records_results(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "achat", echo_chat)
+    prompts, results = tmp_path / "prompts.jsonl", tmp_path / "results.jsonl"
+    write_jsonl(prompts, [
+        {"prompt": "one"},
+        {"id": "custom", "messages": [{"role": "user", "content": "two"}]},
+        {"prompt": "explode"},
+    ])
+
+    counts = await batch.run_batch(str(prompts), str(results), model="test", concurrency=2, use_tools=False)
+
+    assert counts == {"run": 3, "skipped": 0, "failed": 1}
+    by_id = {r["id"]: r for r in read_jsonl(results)}
+    assert by_id[1]["response"] == "echo: one"
+    assert by_id["custom"]["response"] == "echo: two"
+    assert by_id[3]["error"] == "model crashed"
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_finished_prompts(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "achat", echo_chat)
+    prompts, results = tmp_path / "prompts.jsonl", tmp_path / "results.jsonl"
+    write_jsonl(prompts, [{"prompt": "one"}, {"prompt": "two"}, {"prompt": "three"}])
+    # An interrupted run: one finished result and a line cut off mid-write
+    results.write_text(json.dumps({"id": 1, "response": "done", "error": None}) + '\n{"id": 2, "resp')
+
+    counts = await batch.run_batch(str(prompts), str(results), model="test", use_tools=False)
+
+    assert counts == {"run": 2, "skipped": 1, "failed": 0}
+    lines = results.read_text().splitlines()
+    assert lines[1] == '{"id": 2, "resp'
+    assert sorted(json.loads(line)["id"] for line in lines[2:]) == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_prompts_wait_out_a_busy_scheduler(tmp_path, monkeypatch):
+    """More conversations than model slots: nothing fails, all queue as the batch session"""
+    scheduler = RequestScheduler(concurrency=1, queue_timeout=0.05)
+    sessions = []
+    submit = scheduler.submit
+
+    def record_session(model, session=None):
+        ticket = submit(model, session)
+        sessions.append(ticket.session)
+        return ticket
+
+    async def slow_chat(messages, model, **kwargs):
+        await asyncio.sleep(0.03)
+        return await echo_chat(messages, model)
+
+    monkeypatch.setattr(scheduler, "submit", record_session)
+    monkeypatch.setattr(engine, "request_scheduler", scheduler)
+    monkeypatch.setattr(engine, "achat", slow_chat)
+    monkeypatch.setattr(batch, "BATCH_RETRY_DELAY", 0.01)
+    prompts, results = tmp_path / "prompts.jsonl", tmp_path / "results.jsonl"
+    write_jsonl(prompts, [{"prompt": str(i)} for i in range(8)])
+
+    counts = await batch.run_batch(str(prompts), str(results), model="test", concurrency=4, use_tools=False)
+
+    assert counts == {"run": 8, "skipped": 0, "failed": 0}
+    assert scheduler.gauges()["timed_out_total"] > 0
+    assert set(sessions) == {batch.BATCH_SESSION}
+
+
+def test_cli_defaults_to_the_resolved_model(tmp_path, monkeypatch):
+    calls = []
+
+    async def fake_run_batch(input_path, output_path, model, **kwargs):
+        calls.append(model)
+        return {"run": 0, "skipped": 0, "failed": 0}
+
+    monkeypatch.setattr(batch, "run_batch", fake_run_batch)
+    monkeypatch.setattr(batch.config, "default_model", lambda: "installed:latest")
+    monkeypatch.setattr(batch, "setup_logging", lambda config: None)
+
+    assert batch.main([str(tmp_path / "in.jsonl"), "-o", str(tmp_path / "out.jsonl")]) == 0
+    assert calls == ["installed:latest"]
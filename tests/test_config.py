@@ -0,0 +1,78 @@
+import threading
+import time
+
+from src import config as config_module
+from src.config import Config
+
+def test_model_discovery_is_lazy_and_cached(monkeypatch):
+    calls = []
+
+    def fake_list():
+        calls.append(1)
+        return {"models": [{"model": "qwen2.5:7b"}, {"model": "llama3.2:latest"}]}
+
+    monkeypatch.setattr(config_module.ollama, "list", fake_list)
+    config = Config()
+    assert calls == []
+
+    assert config.models() == ("qwen2.5:7b", "llama3.2:latest")
+    assert config.default_model() == "llama3.2:latest"
+    config.models()
+    assert len(calls) == 1
+
+def test_stale_models_refresh_in_background(monkeypatch):
+    released = threading.Event()
+    responses = [["a"], ["a", "b"]]
+
+    def fake_list():
+        if len(responses) == 1:
+            # Background refresh: hold until the test lets it finish
+            released.wait(timeout=5)
+        names = responses.pop(0) if len(responses) > 1 else responses[0]
+        return {"models": [{"model": name} for name in names]}
+
+    monkeypatch.setattr(config_module.ollama, "list", fake_list)
+    config = Config()
+    config.MODELS_TTL = 0
+
+    assert config.models() == ("a",)
+    # Stale: the cached list is returned while the refresh runs
+    assert config.models() == ("a",)
+    released.set()
+    for _ in range(100):
+        if config.models() == ("a", "b"):
+            break
+        time.sleep(0.01)
+    assert config.models() == ("a", "b")
+
+def test_unreachable_daemon_falls_back_to_default(monkeypatch):
+    def fail():
+        raise ConnectionError("daemon down")
+
+    monkeypatch.setattr(config_module.ollama, "list", fail)
+    config = Config()
+    assert config.models() == (Config.DEFAULT_MODEL,)
+    assert config.default_model() == Config.DEFAULT_MODEL
+
+def test_failed_refresh_keeps_the_last_good_list(monkeypatch):
+    responses = [{"models": [{"model": "qwen2.5:7b"}]}, ConnectionError("daemon down")]
+    calls = []
+
+    def flaky_list():
+        calls.append(1)
+        response = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(config_module.ollama, "list", flaky_list)
+    config = Config()
+    config.MODELS_TTL = 30
+    assert config.models() == ("qwen2.5:7b",)
+
+    config._fetch_models()
+    config._fetch_models()
+    assert config.models() == ("qwen2.5:7b",)
+    # Each failure doubles the wait before the next attempt
+    assert config._models_expire_at - time.monotonic() > 50
+    assert len(calls) == 3
@@ -0,0 +1,74 @@
+from src.conversation import Conversation
+from src.llm_helper import estimate_tokens
+
+def test_messages_are_formatted_once_on_append():
+    conversation = Conversation("be brief")
+    conversation.append({"role": "user", "content": "hi"})
+    first_user = conversation.wire[1]
+    conversation.append({"role": "function", "name": "brave", "content": "results"})
+
+    assert conversation.wire[1] is first_user
+    assert conversation.wire[0] == {"role": "system", "content": "be brief"}
+    assert conversation.wire[2]["role"] == "user"
+    assert conversation.wire[2]["content"] == "Function brave returned: results"
+    assert len(conversation.messages) == 2
+
+def test_unchanged_system_prompt_keeps_prefix():
+    conversation = Conversation("be brief")
+    system = conversation.wire[0]
+    conversation.set_system_prompt("be brief")
+    assert conversation.wire[0] is system
+
+    conversation.set_system_prompt("be thorough")
+    assert conversation.wire[0]["content"] == "be thorough"
+
+def test_clear_keeps_system_prompt():
+    conversation = Conversation("be brief")
+    conversation.append({"role": "user", "content": "hi"})
+    conversation.clear()
+    assert conversation.messages == []
+    assert conversation.wire == [{"role": "system", "content": "be brief"}]
+
+def test_compaction_leaves_display_history_intact():
+    conversation = Conversation("be brief")
+    for i in range(20):
+        conversation.append({"role": "user", "content": f"question {i} " + "x" * 400})
+        conversation.append({"role": "assistant", "content": "answer"})
+
+    assert conversation.compact(1000)
+    assert len(conversation.messages) == 40
+    assert conversation.wire[0]["content"] == "be brief"
+    assert "omitted" in conversation.wire[1]["content"]
+    # Now under budget: the compacted prefix is reused as-is
+    assert not conversation.compact(1000)
+
+def test_rollback_drops_messages_after_checkpoint():
+    conversation = Conversation("system")
+    conversation.append({"role": "user", "content": "hi"})
+    checkpoint = conversation.checkpoint()
+    wire = list(conversation.wire)
+
+    conversation.append({"role": "assistant", "content": "partial"})
+    conversation.rollback(checkpoint)
+    assert conversation.messages == [{"role": "user", "content": "hi"}]
+    assert conversation.wire == wire
+
+    # Also after the wire list was replaced by compaction
+    conversation.append({"role": "assistant", "content": "partial"})
+    conversation.wire = list(conversation.wire)
+    conversation.rollback(checkpoint)
+    assert conversation.wire == wire
+
+def test_long_chats_stay_within_budget_with_one_summary():
+    conversation = Conversation("be brief")
+    compactions = 0
+    for i in range(400):
+        conversation.append({"role": "user", "content": f"question {i} " + "x" * 280})
+        conversation.append({"role": "assistant", "content": "answer " + "y" * 280})
+        compactions += conversation.compact(2000)
+
+        assert sum(estimate_tokens(m) for m in conversation.wire) <= 2000
+        assert len([m for m in conversation.wire if m["role"] == "system"]) <= 2
+
+    # Compacting to COMPACT_TARGET leaves room for several turns in between
+    assert compactions < 400 / 3
@@ -0,0 +1,98 @@
+import sqlite3
+
+from src.conversation import Conversation
+from src.conversation_store import ConversationStore
+
+def test_conversation_survives_a_new_store(tmp_path):
+    path = str(tmp_path / "chats.db")
+    conversation = Conversation("be brief")
+    conversation.append({"role": "user", "content": "hi"})
+    conversation.append({"role": "assistant", "content": "hello", "tool_calls": [
+        {"function": {"name": "brave", "arguments": {"query": "x"}}}
+    ]})
+    conversation.append({"role": "function", "name": "brave", "content": "results", "handle": "abc"})
+    assert ConversationStore(path).save(conversation)
+
+    loaded = ConversationStore(path).load(conversation.id, "be brief")
+    assert loaded.messages == conversation.messages
+    assert loaded.wire == conversation.wire
+    assert loaded.saved == 3
+
+def test_only_new_messages_are_written(tmp_path):
+    store = ConversationStore(str(tmp_path / "chats.db"))
+    conversation = Conversation()
+    conversation.append({"role": "user", "content": "one"})
+    store.save(conversation)
+    conversation.append({"role": "assistant", "content": "two"})
+    store.save(conversation)
+    store.save(conversation)
+
+    rows = sqlite3.connect(store.path).execute(
+        "SELECT seq, role FROM messages WHERE conversation_id = ? ORDER BY seq", (conversation.id,)
+    ).fetchall()
+    assert rows == [(0, "user"), (1, "assistant")]
+    assert sqlite3.connect(store.path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_private_keys_are_not_stored(tmp_path):
+    store = ConversationStore(str(tmp_path / "chats.db"))
+    conversation = Conversation()
+    conversation.append({"role": "user", "content": "hi", "_token_estimate": ("hi", 1)})
+    store.save(conversation)
+    assert store.load(conversation.id).messages == [{"role": "user", "content": "hi"}]
+
+def test_cleared_conversation_starts_a_new_chat(tmp_path):
+    store = ConversationStore(str(tmp_path / "chats.db"))
+    conversation = Conversation()
+    conversation.append({"role": "user", "content": "first chat"})
+    store.save(conversation)
+    first_id = conversation.id
+
+    conversation.clear()
+    conversation.append({"role": "user", "content": "second chat"})
+    store.save(conversation)
+
+    assert conversation.id != first_id
+    assert [c["title"] for c in store.recent()] == ["second chat", "first chat"]
+    assert store.load(first_id).messages == [{"role": "user", "content": "first chat"}]
+
+def test_unknown_or_unreadable_chats_load_as_none(tmp_path):
+    assert ConversationStore(str(tmp_path / "chats.db")).load("missing") is None
+
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    store = ConversationStore(str(blocker / "chats.db"))
+    conversation = Conversation()
+    conversation.append({"role": "user", "content": "hi"})
+    assert not store.save(conversation)
+    assert conversation.id is None and conversation.saved == 0
+    assert store.load("any") is None
+
+def test_chat_changed_by_another_session_is_forked(tmp_path):
+    path = str(tmp_path / "chats.db")
+    original = Conversation()
+    original.append({"role": "user", "content": "shared"})
+    ConversationStore(path).save(original)
+
+    first = ConversationStore(path).load(original.id)
+    second = ConversationStore(path).load(original.id)
+    first.append({"role": "user", "content": "from first tab"})
+    second.append({"role": "user", "content": "from second tab"})
+    assert ConversationStore(path).save(first)
+    assert ConversationStore(path).save(second)
+
+    assert first.id == original.id
+    assert second.id != original.id and second.saved == 2
+    second.append({"role": "assistant", "content": "reply"})
+    assert ConversationStore(path).save(second)
+    assert ConversationStore(path).load(second.id).messages == second.messages
+    assert ConversationStore(path).load(original.id).messages == first.messages
+
+def test_recent_chats_can_be_limited_to_their_owner(tmp_path):
+    store = ConversationStore(str(tmp_path / "chats.db"))
+    for owner in ("alice", "bob"):
+        conversation = Conversation()
+        conversation.append({"role": "user", "content": f"{owner}'s chat"})
+        store.save(conversation, owner=owner)
+
+    assert [c["title"] for c in store.recent(owner="alice")] == ["alice's chat"]
+    assert len(store.recent()) == 2
@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+import pytest
+
+from src.dispatcher import ToolDispatcher
+
+def call(name, **arguments):
+    return {"function": {"name": name, "arguments": arguments}}
+
+async def slow(delay: float):
+    await asyncio.sleep(delay)
+    return f"slept {delay}"
+
+@pytest.mark.asyncio
+async def test_calls_run_concurrently_in_order():
+    """Three calls take about as long as the slowest, results keep call order"""
+    dispatcher = ToolDispatcher({"slow": slow})
+    started = time.monotonic()
+    outcomes = await dispatcher.dispatch([call("slow", delay=0.3), call("slow", delay=0.1), call("slow", delay=0.2)])
+    assert time.monotonic() - started < 0.5
+    assert [o.content for o in outcomes] == ["slept 0.3", "slept 0.1", "slept 0.2"]
+
+@pytest.mark.asyncio
+async def test_server_concurrency_limit():
+    """Calls to the same server respect its concurrency limit"""
+    dispatcher = ToolDispatcher({"slow": slow}, servers={"slow": "server"}, server_concurrency=1)
+    started = time.monotonic()
+    await dispatcher.dispatch([call("slow", delay=0.1), call("slow", delay=0.1)])
+    assert time.monotonic() - started >= 0.2
+
+@pytest.mark.asyncio
+async def test_timeouts_and_errors_are_reported_per_call():
+    """A failing call does not affect the others"""
+    async def broken():
+        return {"error": "boom"}
+
+    dispatcher = ToolDispatcher({"slow": slow, "broken": broken}, timeout=0.1)
+    outcomes = await dispatcher.dispatch([call("slow", delay=1), call("broken"), call("missing"), call("slow", delay=0)])
+    assert outcomes[0].error == "Timed out after 0.1s"
+    assert outcomes[1].error == "boom"
+    assert outcomes[2].error == "Unknown tool 'missing'"
+    assert outcomes[3].to_message() == {"role": "function", "name": "slow", "content": "slept 0"}
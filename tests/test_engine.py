@@ -0,0 +1,288 @@
+import asyncio
+import threading
+
+import pytest
+from ollama import ChatResponse, Message
+
+from src import engine
+from src.conversation import Conversation
+from src.dispatcher import ToolOutcome
+from src.response_cache import ResponseCache
+from src.tool_cache import note_call
+from src.runtime import CancelToken, TurnCancelled
+
+def chunk(content="", tool_calls=None, done=False):
+    return ChatResponse(
+        model="test",
+        done=done,
+        message=Message(role="assistant", content=content, tool_calls=tool_calls),
+    )
+
+def tool_call(name, **arguments):
+    return Message.ToolCall(function=Message.ToolCall.Function(name=name, arguments=arguments))
+
+async def replay(chunks):
+    for c in chunks:
+        yield c
+
+async def collect(events):
+    return [event async for event in events]
+
+class ScriptedChat:
+    """Stands in for llm_helper.achat, replaying one scripted stream per call"""
+
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.calls = []
+
+    async def __call__(self, messages, model, tools=None, stream=True, formatted=False, ticket=None):
+        self.calls.append({"messages": list(messages), "tools": tools, "stream": stream})
+        return replay(self.streams.pop(0))
+
+@pytest.mark.asyncio
+async def test_plain_turn_makes_one_streamed_call(monkeypatch):
+    """A turn without tool calls costs exactly one model call"""
+    fake = ScriptedChat([chunk("Hel"), chunk("lo"), chunk(done=True)])
+    monkeypatch.setattr(engine, "achat", fake)
+
+    conversation = Conversation("system")
+    conversation.append({"role": "user", "content": "hi"})
+    events = await collect(engine.run_turn(conversation, "test", tools=[{}]))
+
+    assert [e.content for e in events if e.type == "token"] == ["Hel", "lo"]
+    assert events[-1].type == "assistant"
+    assert events[-1].message == {"role": "assistant", "content": "Hello"}
+    assert len(fake.calls) == 1
+    assert fake.calls[0]["stream"] is True
+    assert conversation.messages[-1] == {"role": "assistant", "content": "Hello"}
+
+@pytest.mark.asyncio
+async def test_tool_calls_are_detected_and_fed_back(monkeypatch):
+    """Tool calls from the stream are executed and their results sent back"""
+    fake = ScriptedChat(
+        [chunk(tool_calls=[tool_call("brave", action="web", query="mcp")], done=True)],
+        [chunk("Found it", done=True)],
+    )
+    monkeypatch.setattr(engine, "achat", fake)
+
+    async def execute(tool_calls):
+        return [ToolOutcome(tc["function"]["name"], tc["function"]["arguments"], content="result") for tc in tool_calls]
+
+    conversation = Conversation("system")
+    conversation.append({"role": "user", "content": "search"})
+    events = await collect(engine.run_turn(conversation, "test", execute_tools=execute))
+
+    assert [e.type for e in events] == ["assistant", "tool_result", "token", "assistant"]
+    assert events[0].message["tool_calls"] == [
+        {"function": {"name": "brave", "arguments": {"action": "web", "query": "mcp"}}}
+    ]
+    follow_up = fake.calls[1]["messages"]
+    assert follow_up[-1]["content"] == "Function brave returned: result"
+    assert events[-1].message["content"] == "Found it"
+    assert [m["role"] for m in conversation.messages] == ["user", "assistant", "function", "assistant"]
+
+@pytest.mark.asyncio
+async def test_failed_tool_calls_are_reported_and_fed_back(monkeypatch):
+    fake = ScriptedChat(
+        [chunk(tool_calls=[tool_call("ok"), tool_call("broken")], done=True)],
+        [chunk("Partial answer", done=True)],
+    )
+    monkeypatch.setattr(engine, "achat", fake)
+
+    async def execute(tool_calls):
+        return [ToolOutcome("ok", {}, content="fine"), ToolOutcome("broken", {}, error="boom")]
+
+    conversation = Conversation("system")
+    conversation.append({"role": "user", "content": "go"})
+    events = await collect(engine.run_turn(conversation, "test", execute_tools=execute))
+
+    assert [e.type for e in events] == ["assistant", "tool_result", "tool_error", "token", "assistant"]
+    assert events[2].content == "Error executing broken: boom"
+    assert [m["role"] for m in conversation.messages] == ["user", "assistant", "function", "function", "assistant"]
+    # The model sees the failure and can answer around it
+    assert fake.calls[1]["messages"][-1]["content"] == "Function broken returned: Error: boom"
+
+async def execute_ok(tool_calls):
+    return [ToolOutcome(tc["function"]["name"], {}, content="result") for tc in tool_calls]
+
+@pytest.mark.asyncio
+async def test_tool_rounds_continue_with_tools_until_final_answer(monkeypatch):
+    """Each round sees the previous results and still has the tools available"""
+    fake = ScriptedChat(
+        [chunk("Looking", tool_calls=[tool_call("search")], done=True)],
+        [chunk(tool_calls=[tool_call("read")], done=True)],
+        [chunk("Done", done=True)],
+    )
+    monkeypatch.setattr(engine, "achat", fake)
+
+    conversation = Conversation("system")
+    conversation.append({"role": "user", "content": "go"})
+    events = await collect(engine.run_turn(conversation, "test", tools=[{}], execute_tools=execute_ok))
+
+    assert [e.type for e in events] == [
+        "token", "assistant", "tool_result", "assistant", "tool_result", "token", "assistant"
+    ]
+    assert [call["tools"] for call in fake.calls] == [[{}], [{}], [{}]]
+    assert fake.calls[2]["messages"][-1]["content"] == "Function read returned: result"
+
+@pytest.mark.asyncio
+async def test_round_limit_forces_a_final_answer_without_tools(monkeypatch):
+    fake = ScriptedChat(
+        [chunk(tool_calls=[tool_call("search")], done=True)],
+        [chunk(tool_calls=[tool_call("search")], done=True)],
+        [chunk("Best effort", done=True)],
+    )
+    monkeypatch.setattr(engine, "achat", fake)
+
+    conversation = Conversation("system")
+    conversation.append({"role": "user", "content": "go"})
+    events = await collect(engine.run_turn(
+        conversation, "test", tools=[{}], execute_tools=execute_ok, max_rounds=2
+    ))
+
+    assert [call["tools"] for call in fake.calls] == [[{}], [{}], None]
+    assert events[-1].message == {"role": "assistant", "content": "Best effort"}
+
+@pytest.mark.asyncio
+async def test_tool_calls_in_the_final_pass_are_dropped(monkeypatch):
+    """A model that keeps calling tools without tools available gets a notice, not dangling calls"""
+    fake = ScriptedChat(
+        [chunk(tool_calls=[tool_call("search")], done=True)],
+        [chunk(tool_calls=[tool_call("search")], done=True)],
+    )
+    monkeypatch.setattr(engine, "achat", fake)
+
+    conversation = Conversation("system")
+    conversation.append({"role": "user", "content": "go"})
+    events = await collect(engine.run_turn(
+        conversation, "test", tools=[{}], execute_tools=execute_ok, max_rounds=1
+    ))
+
+    assert [e.type for e in events] == ["assistant", "tool_result", "token", "assistant"]
+    assert events[-1].message == {"role": "assistant", "content": engine.TOOLS_STOPPED_NOTICE}
+    assert conversation.messages[-1] == events[-1].message
+    assert not any(m.get("tool_calls") for m in conversation.messages[2:])
+
+@pytest.mark.asyncio
+async def test_time_budget_stops_further_tool_rounds(monkeypatch):
+    fake = ScriptedChat(
+        [chunk(tool_calls=[tool_call("search")], done=True)],
+        [chunk("Out of time", done=True)],
+    )
+    monkeypatch.setattr(engine, "achat", fake)
+
+    conversation = Conversation("system")
+    conversation.append({"role": "user", "content": "go"})
+    await collect(engine.run_turn(conversation, "test", tools=[{}], execute_tools=execute_ok, time_budget=0))
+
+    assert [call["tools"] for call in fake.calls] == [[{}], None]
+
+async def endless():
+    yield chunk("partial")
+    await asyncio.Event().wait()
+
+@pytest.mark.asyncio
+async def test_cancelling_mid_stream_closes_it_and_rolls_back(monkeypatch):
+    closed = []
+
+    async def stream(messages, model, **kwargs):
+        async def chunks():
+            try:
+                async for c in endless():
+                    yield c
+            finally:
+                closed.append(True)
+        return chunks()
+    monkeypatch.setattr(engine, "achat", stream)
+
+    conversation = Conversation("system")
+    conversation.append({"role": "user", "content": "go"})
+    cancel = CancelToken()
+    events = engine.run_turn(conversation, "test", cancel=cancel)
+
+    assert (await events.__anext__()).content == "partial"
+    threading.Timer(0.05, cancel.cancel).start()
+    with pytest.raises(TurnCancelled):
+        await asyncio.wait_for(events.__anext__(), 2)
+    assert closed == [True]
+    assert [m["role"] for m in conversation.messages] == ["user"]
+
+@pytest.mark.asyncio
+async def test_cancelling_during_tool_calls_drops_the_whole_turn(monkeypatch):
+    fake = ScriptedChat([chunk(tool_calls=[tool_call("slow")], done=True)])
+    monkeypatch.setattr(engine, "achat", fake)
+    abandoned = []
+
+    async def execute(tool_calls):
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            abandoned.append(True)
+            raise
+
+    conversation = Conversation("system")
+    conversation.append({"role": "user", "content": "go"})
+    wire = list(conversation.wire)
+    cancel = CancelToken()
+    events = engine.run_turn(conversation, "test", execute_tools=execute, cancel=cancel)
+
+    assert (await events.__anext__()).type == "assistant"
+    threading.Timer(0.05, cancel.cancel).start()
+    with pytest.raises(TurnCancelled):
+        await asyncio.wait_for(collect(events), 2)
+    assert abandoned == [True]
+    assert [m["role"] for m in conversation.messages] == ["user"]
+    assert conversation.wire == wire
+
+@pytest.mark.asyncio
+async def test_identical_turn_is_replayed_from_the_response_cache(monkeypatch):
+    fake = ScriptedChat(
+        [chunk(tool_calls=[tool_call("search")], done=True)],
+        [chunk("Found it", done=True)],
+        [chunk("Fresh", done=True)],
+    )
+    monkeypatch.setattr(engine, "achat", fake)
+    cache = ResponseCache(enabled=True)
+
+    def ask():
+        conversation = Conversation("system")
+        conversation.append({"role": "user", "content": "search"})
+        return conversation
+
+    first = ask()
+    await collect(engine.run_turn(first, "test", tools=[{}], execute_tools=execute_ok, cache=cache))
+
+    second = ask()
+    events = await collect(engine.run_turn(second, "test", tools=[{}], execute_tools=execute_ok, cache=cache))
+    assert len(fake.calls) == 2
+    assert [e.type for e in events] == ["cached", "assistant", "tool_result", "token", "assistant"]
+    assert second.messages == first.messages
+    assert [m["content"] for m in second.wire] == [m["content"] for m in first.wire]
+
+    # Refreshing runs the model again and replaces the entry
+    third = ask()
+    await collect(engine.run_turn(third, "test", execute_tools=execute_ok, cache=cache, refresh_cache=True))
+    assert len(fake.calls) == 3
+    assert third.messages[-1]["content"] == "Fresh"
+
+@pytest.mark.asyncio
+async def test_turns_with_mutating_mcp_calls_are_not_cached(monkeypatch):
+    cache = ResponseCache(enabled=True)
+
+    def run(tool_name, mcp_tool):
+        async def execute(tool_calls):
+            # What the tool wrapper's MCP call records
+            note_call("filesystem", mcp_tool)
+            return [ToolOutcome(tool_name, {}, content="ok")]
+
+        monkeypatch.setattr(engine, "achat", ScriptedChat(
+            [chunk(tool_calls=[tool_call(tool_name)], done=True)],
+            [chunk("Done", done=True)],
+        ))
+        conversation = Conversation("system")
+        conversation.append({"role": "user", "content": f"use {tool_name}"})
+        return collect(engine.run_turn(conversation, "test", tools=[{}], execute_tools=execute, cache=cache))
+
+    await run("reader", "read_file")
+    await run("writer", "write_file")
+    assert cache.stats()["entries"] == 1
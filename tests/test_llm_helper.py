@@ -0,0 +1,79 @@
+from src import llm_helper
+from src.llm_helper import estimate_tokens, fit_to_budget
+
+def conversation(turns, tool_output_chars=4000):
+    messages = [{"role": "system", "content": "You are helpful."}]
+    for i in range(turns):
+        messages += [
+            {"role": "user", "content": f"question {i}"},
+            {"role": "function", "name": "brave", "content": "x" * tool_output_chars},
+            {"role": "assistant", "content": f"answer {i}"},
+        ]
+    return messages
+
+def total(messages):
+    return sum(estimate_tokens(m) for m in messages)
+
+def test_estimate_is_cached_on_message():
+    message = {"role": "user", "content": "a" * 40}
+    assert estimate_tokens(message) == 10 + llm_helper.MESSAGE_OVERHEAD_TOKENS
+    assert message["_token_estimate"] == ("a" * 40, 14)
+
+    # An edit that keeps the length still refreshes the estimate
+    message["content"] = "b" * 40
+    estimate_tokens(message)
+    assert message["_token_estimate"][0] == "b" * 40
+
+    message["content"] = "a" * 80
+    assert estimate_tokens(message) == 24
+
+def test_history_within_budget_is_untouched():
+    messages = conversation(2, tool_output_chars=100)
+    assert fit_to_budget(messages, 10_000) is messages
+
+def test_old_tool_outputs_are_truncated_first():
+    messages = conversation(4)
+    fitted = fit_to_budget(messages, 3000)
+
+    assert total(fitted) <= 3000
+    assert len(fitted) == len(messages)
+    assert "characters omitted" in fitted[2]["content"]
+    # Recent turns are kept verbatim and the original history is not modified
+    assert fitted[-2] is messages[-2]
+    assert "omitted" not in messages[2]["content"]
+
+def test_oldest_messages_are_summarized_when_truncation_is_not_enough():
+    messages = conversation(30, tool_output_chars=100)
+    fitted = fit_to_budget(messages, 400)
+
+    assert total(fitted) <= 400
+    assert fitted[0] == messages[0]
+    assert fitted[1]["role"] == "system"
+    assert "earlier messages omitted" in fitted[1]["content"]
+    assert fitted[-1] is messages[-1]
+
+def test_extra_system_messages_are_merged_into_one_note():
+    messages = [{"role": "system", "content": "You are helpful."}]
+    messages += [{"role": "system", "content": "note " + "x" * 800} for _ in range(3)]
+    messages += [{"role": "user", "content": "hi"}]
+    fitted = fit_to_budget(messages, 100)
+
+    assert total(fitted) <= 100
+    assert fitted[0] == messages[0]
+    assert [m["role"] for m in fitted] == ["system", "system", "user"]
+    assert "3 earlier messages omitted" in fitted[1]["content"]
+
+def test_earlier_summary_is_replaced_not_repeated():
+    fitted = fit_to_budget(conversation(30, tool_output_chars=100), 400)
+    fitted = fit_to_budget(fitted + conversation(30, tool_output_chars=100)[1:], 400)
+
+    notes = [m for m in fitted if m.get("_summary")]
+    assert len(notes) == 1
+    # Every message of both histories is either kept or counted in the note
+    assert notes[0]["_summary"][0] + len(fitted) - 2 == 180
+    assert total(fitted) <= 400
+
+def test_oversized_system_prompt_is_reported(caplog):
+    messages = [{"role": "system", "content": "x" * 4000}, {"role": "user", "content": "hi"}]
+    fit_to_budget(messages, 100)
+    assert "over the budget of 100" in caplog.text
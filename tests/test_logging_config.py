@@ -0,0 +1,46 @@
+import json
+import logging
+import queue
+
+from src.logging_config import JsonFormatter, Preview, SamplingFilter, StructuredQueueHandler
+
+
+def test_preview_caps_large_payloads():
+    payload = {"messages": [{"role": "user", "content": "x" * 100_000}] * 1000}
+    text = str(Preview(payload, limit=200))
+    assert len(text) <= 200 + len("... [truncated]")
+    assert text.endswith("[truncated]")
+    assert text.startswith('{"messages": [{"role": "user"')
+
+
+def test_preview_leaves_small_objects_intact():
+    assert str(Preview({"a": [1, "b"]}, limit=100)) == '{"a": [1, "b"]}'
+
+
+def test_sampling_only_drops_debug_records():
+    drop_all = SamplingFilter(0.0)
+    debug = logging.makeLogRecord({'levelno': logging.DEBUG})
+    info = logging.makeLogRecord({'levelno': logging.INFO})
+    assert not drop_all.filter(debug)
+    assert drop_all.filter(info)
+    assert SamplingFilter(1.0).filter(debug)
+
+
+def test_exceptions_keep_their_own_json_field():
+    records = queue.Queue()
+    logger = logging.getLogger("test-json-exc")
+    logger.propagate = False
+    handler = StructuredQueueHandler(records)
+    logger.addHandler(handler)
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.error("Division %s", "failed", exc_info=True)
+    finally:
+        logger.removeHandler(handler)
+
+    entry = json.loads(JsonFormatter().format(records.get_nowait()))
+    assert entry["msg"] == "Division failed"
+    assert entry["exc"].startswith("Traceback")
+    assert "ZeroDivisionError" in entry["exc"]
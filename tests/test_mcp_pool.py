@@ -0,0 +1,117 @@
+import asyncio
+import os
+import signal
+import sys
+import textwrap
+
+import pytest
+from mcp import StdioServerParameters
+
+from src.mcp_pool import MCPSessionPool, ServerSession
+
+SERVER_SCRIPT = textwrap.dedent("""
+    import os
+    import time
+    from mcp.server.fastmcp import FastMCP
+
+    time.sleep(float(os.environ.get('ECHO_START_DELAY', '0')))
+
+    app = FastMCP('echo')
+
+    @app.tool()
+    def pid() -> str:
+        return str(os.getpid())
+
+    @app.tool()
+    def hang() -> str:
+        time.sleep(60)
+        return 'done'
+
+    app.run()
+""")
+
+@pytest.fixture
+def server_params(tmp_path):
+    script = tmp_path / "echo_server.py"
+    script.write_text(SERVER_SCRIPT)
+    return StdioServerParameters(command=sys.executable, args=[str(script)], env=dict(os.environ))
+
+async def server_pid(pool, params, name="echo"):
+    result = await pool.call(name, params, lambda session: session.call_tool("pid", arguments={}))
+    return int(result.content[0].text)
+
+@pytest.mark.asyncio
+async def test_session_is_reused(server_params):
+    """Consecutive calls hit the same server process"""
+    pool = MCPSessionPool()
+    try:
+        first = await server_pid(pool, server_params)
+        second = await server_pid(pool, server_params)
+        assert first == second
+        assert pool.generation("echo") != 0
+    finally:
+        pool.close_all()
+
+@pytest.mark.asyncio
+async def test_crashed_server_is_restarted(server_params):
+    """A killed server is restarted transparently on the next call"""
+    pool = MCPSessionPool()
+    try:
+        first = await server_pid(pool, server_params)
+        generation = pool.generation("echo")
+        os.kill(first, signal.SIGKILL)
+        second = await server_pid(pool, server_params)
+        assert second != first
+        assert pool.generation("echo") != generation
+    finally:
+        pool.close_all()
+
+@pytest.mark.asyncio
+async def test_session_cap_evicts_idle_server(server_params):
+    """Starting a session beyond the cap closes the least recently used one"""
+    pool = MCPSessionPool(max_sessions=1)
+    try:
+        await server_pid(pool, server_params, name="a")
+        await server_pid(pool, server_params, name="b")
+        assert list(pool.stats()) == ["b"]
+    finally:
+        pool.close_all()
+
+@pytest.mark.asyncio
+async def test_cancelled_call_recycles_the_server(server_params):
+    """A server left busy with an abandoned request is replaced"""
+    pool = MCPSessionPool()
+    try:
+        first = await server_pid(pool, server_params)
+        call = asyncio.ensure_future(
+            pool.call("echo", server_params, lambda session: session.call_tool("hang", arguments={}))
+        )
+        await asyncio.sleep(0.5)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert await server_pid(pool, server_params) != first
+    finally:
+        pool.close_all()
+
+@pytest.mark.asyncio
+async def test_slow_start_survives_a_caller_that_gives_up(server_params, monkeypatch):
+    """A call timing out during a cold start doesn't kill the server being started"""
+    spawns = []
+    spawn = ServerSession._spawn
+
+    async def counted_spawn(self):
+        spawns.append(self)
+        return await spawn(self)
+
+    monkeypatch.setattr(ServerSession, "_spawn", counted_spawn)
+    server_params.env["ECHO_START_DELAY"] = "1.5"
+    pool = MCPSessionPool()
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(server_pid(pool, server_params), 0.5)
+        # The start carried on, so this call joins it instead of starting over
+        await asyncio.wait_for(server_pid(pool, server_params), 10)
+        assert len(spawns) == 1
+    finally:
+        pool.close_all()
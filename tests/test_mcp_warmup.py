@@ -0,0 +1,99 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.mcp_client import mcp
+from src.mcp_pool import session_pool
+from src.mcp_warmup import ServerWarmup
+from src.server_config import server_configs
+from src.tool_registry import ToolRegistry
+
+FAKE_MCP_SERVER = Path(__file__).parents[1] / "bench" / "fake_mcp_server.py"
+
+@pytest.fixture
+def servers(tmp_path, monkeypatch):
+    """One working fake filesystem server and one that exits immediately"""
+    config = tmp_path / "mcp_config.json"
+    config.write_text(json.dumps({"mcpServers": {
+        "filesystem": {"command": sys.executable, "args": [str(FAKE_MCP_SERVER), str(tmp_path)]},
+        "broken": {"command": sys.executable, "args": ["-c", "raise SystemExit(1)"]},
+        "off": {"command": sys.executable, "args": ["-c", "pass"], "enabled": False},
+    }}))
+    monkeypatch.setenv("MCP_CONFIG_PATH", str(config))
+    for name in ("FILESYSTEM_ENABLED", "FILESYSTEM_PATHS", "FILESYSTEM_COMMAND", "FILESYSTEM_ARGS"):
+        monkeypatch.setenv(name, "")
+    server_configs.invalidate()
+
+    yield config
+
+    session_pool.close_all()
+    server_configs.invalidate()
+
+def test_enabled_servers_start_in_parallel(servers):
+    warmup = ServerWarmup()
+    statuses = warmup.start()
+    assert set(statuses) == {"filesystem", "broken"}
+    assert all(s.state == "starting" for s in statuses.values())
+
+    assert warmup.wait(timeout=30)
+    statuses = warmup.statuses()
+    assert statuses["filesystem"].state == "ready"
+    assert statuses["broken"].state == "failed"
+    assert statuses["broken"].error
+    assert session_pool.stats()["filesystem"]["alive"]
+    assert "read_file" in [t.name for t in warmup.tools("filesystem")]
+    assert warmup.tools("broken") is None
+    assert warmup.unavailable() == {"broken"}
+
+def test_start_is_idempotent_until_retry(servers):
+    warmup = ServerWarmup(retry_interval=3600)
+    warmup.start()
+    warmup.wait(timeout=30)
+    before = warmup.statuses()
+
+    # Neither the ready nor the recently failed server is launched again
+    assert warmup.start() == before
+
+    warmup.retry_interval = 0
+    statuses = warmup.start()
+    assert statuses["broken"].state == "starting"
+    assert statuses["filesystem"] is before["filesystem"]
+    warmup.wait(timeout=30)
+
+def test_failed_servers_tools_are_excluded():
+    registry = ToolRegistry()
+
+    @registry.register(server="filesystem")
+    def files(path: str):
+        """Read files"""
+
+    @registry.register(server="broken")
+    def search(query: str):
+        """Search"""
+
+    @registry.register
+    def local():
+        """No server"""
+
+    names = lambda schemas: [s['function']['name'] for s in schemas]
+    assert names(registry.schemas()) == ["files", "search", "local"]
+    assert names(registry.schemas(exclude_servers={"broken"})) == ["files", "local"]
+    assert registry.schemas(exclude_servers=()) is registry.schemas()
+
+@pytest.mark.asyncio
+async def test_tool_details_use_warmup_cache(servers, monkeypatch):
+    from src import mcp_client
+
+    warmup = ServerWarmup()
+    warmup.start()
+    warmup.wait(timeout=30)
+    monkeypatch.setattr(mcp_client, "server_warmup", warmup)
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("list_tools should come from the cache")
+    monkeypatch.setattr(session_pool, "call", fail)
+
+    details = json.loads(await mcp(server="filesystem", tool="tool_details"))
+    assert "read_file" in [t["name"] for t in details]
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from bench.fake_ollama import FakeOllama
+from src import llm_helper
+
+
+@pytest.fixture
+def fake_ollama(monkeypatch):
+    with FakeOllama(tokens=2, load_delay=0.2) as fake:
+        monkeypatch.setenv("OLLAMA_HOST", fake.url)
+        monkeypatch.setattr(llm_helper, "_client", None)
+        monkeypatch.setattr(llm_helper, "_model_states", {})
+        yield fake
+
+
+def test_requests_share_one_pooled_client_and_send_keep_alive(fake_ollama):
+    first = llm_helper.client()
+    list(llm_helper.chat([{"role": "user", "content": "hi"}], "m"))
+    list(llm_helper.chat([{"role": "user", "content": "again"}], "m"))
+
+    assert llm_helper.client() is first
+    assert fake_ollama.last_request["keep_alive"] == llm_helper.KEEP_ALIVE
+    assert llm_helper.model_state("m") == "ready"
+
+
+def test_warm_model_preloads_once_in_the_background(fake_ollama, monkeypatch):
+    started = []
+    real_preload = llm_helper.preload_model
+    monkeypatch.setattr(llm_helper, "preload_model", lambda model: started.append(model) or real_preload(model))
+
+    assert llm_helper.warm_model("m") == "loading"
+    assert llm_helper.warm_model("m") == "loading"
+
+    for thread in threading.enumerate():
+        if thread.name == "ollama-warmup":
+            thread.join(5)
+    assert started == ["m"]
+    assert llm_helper.warm_model("m") == "ready"
+    assert fake_ollama.last_request["model"] == "m"
+    assert fake_ollama.last_request["keep_alive"] == llm_helper.KEEP_ALIVE
+    assert not fake_ollama.last_request.get("prompt")
+
+
+def test_failed_preload_is_not_retried_immediately(monkeypatch):
+    monkeypatch.setenv("OLLAMA_HOST", "http://127.0.0.1:9")
+    monkeypatch.setattr(llm_helper, "_client", None)
+    monkeypatch.setattr(llm_helper, "_model_states", {})
+
+    assert llm_helper.preload_model("m") is False
+    assert llm_helper.warm_model("m") == "failed"
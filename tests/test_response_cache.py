@@ -0,0 +1,54 @@
+import time
+
+from src.response_cache import ResponseCache
+
+def history(*contents):
+    return [{"role": "user", "content": c} for c in contents]
+
+def test_key_ignores_whitespace_and_private_fields():
+    cache = ResponseCache(enabled=True)
+    key = cache.key("m", "system", [], history("what  tools?"))
+
+    assert cache.key("m", "system", [], [{"role": "user", "content": " what tools? ", "_token_estimate": (" what tools? ", 1)}]) == key
+    assert cache.key("other", "system", [], history("what tools?")) != key
+    assert cache.key("m", "changed", [], history("what tools?")) != key
+    assert cache.key("m", "system", [{"type": "function"}], history("what tools?")) != key
+    assert cache.key("m", "system", [], history("earlier", "what tools?")) != key
+
+def test_hits_return_copies_until_expired(monkeypatch):
+    cache = ResponseCache(ttl=10, enabled=True)
+    cache.put("k", [{"role": "assistant", "content": "answer"}])
+
+    replayed = cache.get("k")
+    replayed[0]["content"] = "edited"
+    assert cache.get("k") == [{"role": "assistant", "content": "answer"}]
+
+    now = time.monotonic()
+    monkeypatch.setattr("src.ttl_cache.time.monotonic", lambda: now + 11)
+    assert cache.get("k") is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_lru_eviction_within_byte_budget():
+    cache = ResponseCache(max_bytes=300, enabled=True)
+    for key in "abc":
+        cache.put(key, [{"role": "assistant", "content": "x" * 60}])
+    cache.get("a")
+    cache.put("d", [{"role": "assistant", "content": "x" * 60}])
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.stats()["bytes"] <= 300
+
+def test_turns_with_side_effects_or_a_disabled_cache_are_not_stored():
+    cache = ResponseCache(enabled=True)
+    answer = [{"role": "assistant", "content": "done"}]
+    cache.put("write", answer, [("filesystem", "read_file"), ("filesystem", "write_file")])
+    cache.put("unknown", answer, [("github", "create_issue")])
+    cache.put("search", answer, [("brave-search", "brave_web_search")])
+    assert cache.get("write") is None
+    assert cache.get("unknown") is None
+    assert cache.get("search") == answer
+
+    disabled = ResponseCache(enabled=False)
+    disabled.put("k", [{"role": "assistant", "content": "answer"}])
+    assert disabled.get("k") is None
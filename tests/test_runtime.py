@@ -0,0 +1,133 @@
+import asyncio
+import queue
+import threading
+import time
+
+import pytest
+
+from src import runtime as runtime_module
+from src.runtime import BackgroundLoop, CancelToken, TurnCancelled
+
+
+async def numbers(n, seen):
+    try:
+        for i in range(n):
+            seen.append(threading.current_thread().name)
+            await asyncio.sleep(0)
+            yield i
+    finally:
+        seen.append("closed")
+
+
+def test_iterate_runs_generator_on_the_loop_thread():
+    runtime = BackgroundLoop("test-runtime")
+    seen = []
+    try:
+        assert list(runtime.iterate(numbers(3, seen))) == [0, 1, 2]
+        assert seen == ["test-runtime"] * 3 + ["closed"]
+    finally:
+        runtime.close()
+
+
+def test_closing_iterator_early_closes_generator():
+    runtime = BackgroundLoop("test-runtime")
+    seen = []
+    try:
+        items = runtime.iterate(numbers(10, seen))
+        assert next(items) == 0
+        items.close()
+        assert seen[-1] == "closed"
+    finally:
+        runtime.close()
+
+
+def test_resources_are_shared_across_calls():
+    """Everything submitted to one runtime sees the same loop"""
+    runtime = BackgroundLoop("test-runtime")
+    try:
+        loops = {runtime.run_sync(_current_loop()) for _ in range(3)}
+        assert loops == {runtime.loop}
+    finally:
+        runtime.close()
+
+
+@pytest.mark.asyncio
+async def test_run_awaits_from_another_loop():
+    runtime = BackgroundLoop("test-runtime")
+    try:
+        assert await runtime.run(_current_loop()) is runtime.loop
+    finally:
+        runtime.close()
+
+
+async def _current_loop():
+    return asyncio.get_running_loop()
+
+
+@pytest.mark.asyncio
+async def test_cancel_token_stops_a_guarded_await_from_another_thread():
+    token = CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+    with pytest.raises(TurnCancelled):
+        await asyncio.wait_for(token.guard(asyncio.sleep(10)), 2)
+
+    with pytest.raises(TurnCancelled):
+        await token.guard(asyncio.sleep(0))
+
+
+def test_interrupted_before_the_generator_starts_returns_promptly(monkeypatch):
+    """A caller interrupted while the loop is still busy doesn't wait out CLOSE_TIMEOUT"""
+    class InterruptedQueue(queue.Queue):
+        def get(self, *args, **kwargs):
+            # Like a Streamlit rerun raised into the script thread
+            raise RuntimeError("rerun")
+
+    runtime = BackgroundLoop("test-runtime")
+    seen = []
+    try:
+        monkeypatch.setattr(runtime_module.queue, "Queue", InterruptedQueue)
+        # Keep the loop busy so the generator's task is cancelled before its first step
+        runtime.loop.call_soon_threadsafe(time.sleep, 0.2)
+        started = time.monotonic()
+        with pytest.raises(RuntimeError):
+            next(runtime.iterate(numbers(3, seen)))
+        assert time.monotonic() - started < 2
+        assert seen == []
+    finally:
+        runtime.close()
+
+
+def test_on_idle_runs_while_waiting_and_can_cancel():
+    """A caller blocked on a slow generator still gets to notice it should stop"""
+    token = CancelToken()
+    idle_calls = []
+
+    async def slow():
+        yield "first"
+        await token.guard(asyncio.sleep(30))
+        yield "never"
+
+    def on_idle():
+        idle_calls.append(1)
+        if len(idle_calls) == 2:
+            token.cancel()
+
+    runtime = BackgroundLoop("test-runtime")
+    try:
+        items = runtime.iterate(slow(), on_idle=on_idle)
+        assert next(items) == "first"
+        started = time.monotonic()
+        with pytest.raises(TurnCancelled):
+            next(items)
+        assert time.monotonic() - started < 2
+        assert len(idle_calls) == 2
+
+        with pytest.raises(queue.Empty):
+            next(runtime.iterate(slow_start(), timeout=0.25, on_idle=lambda: None))
+    finally:
+        runtime.close()
+
+
+async def slow_start():
+    await asyncio.sleep(30)
+    yield "late"
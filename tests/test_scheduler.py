@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import pytest
+
+from bench.fake_ollama import FakeOllama
+from src import llm_helper
+from src.scheduler import RequestScheduler, SchedulerOverloaded, request_scheduler, session_scope
+
+def test_requests_beyond_the_model_limit_wait():
+    scheduler = RequestScheduler(concurrency=2)
+    first, second = scheduler.submit("m"), scheduler.submit("m")
+    third = scheduler.submit("m")
+    other_model = scheduler.submit("other")
+
+    assert first.granted and second.granted and other_model.granted
+    assert not third.granted and third.position == 1
+    assert scheduler.stats()["m"] == {"running": 2, "waiting": 1}
+
+    first.release()
+    assert third.granted
+    assert scheduler.stats()["m"] == {"running": 2, "waiting": 0}
+
+def test_sessions_are_served_round_robin():
+    scheduler = RequestScheduler(concurrency=1)
+    holder = scheduler.submit("m", "a")
+    a1, a2, a3 = (scheduler.submit("m", "a") for _ in range(3))
+    b1 = scheduler.submit("m", "b")
+
+    # b's only request goes ahead of a's backlog
+    assert [t.position for t in (a1, b1, a2, a3)] == [1, 2, 3, 4]
+
+    order = []
+    running = holder
+    for _ in range(4):
+        running.release()
+        running = next(t for t in (a1, a2, a3, b1) if t.granted and not t.released)
+        order.append(running)
+    assert order == [a1, b1, a2, a3]
+
+def test_full_queue_rejects_new_requests():
+    scheduler = RequestScheduler(concurrency=1, max_queue=1)
+    scheduler.submit("m")
+    waiting = scheduler.submit("m")
+    with pytest.raises(SchedulerOverloaded):
+        scheduler.submit("m")
+    assert scheduler.gauges()["rejected_total"] == 1
+
+    # A request that gives up frees its place
+    waiting.release()
+    scheduler.submit("m")
+
+@pytest.mark.asyncio
+async def test_waiters_see_positions_and_wake_up_from_other_threads():
+    scheduler = RequestScheduler(concurrency=1)
+    holder = scheduler.submit("m", "a")
+    first = scheduler.submit("m", "b")
+    second = scheduler.submit("m", "c")
+
+    positions = []
+
+    async def wait(ticket):
+        async for position in ticket.wait():
+            positions.append(position)
+
+    waiter = asyncio.create_task(wait(second))
+    await asyncio.sleep(0.01)
+    threading.Thread(target=holder.release).start()
+    await asyncio.sleep(0.05)
+    threading.Thread(target=first.release).start()
+    await asyncio.wait_for(waiter, 2)
+
+    assert positions == [2, 1]
+    assert second.granted
+
+@pytest.mark.asyncio
+async def test_requests_that_wait_too_long_are_rejected():
+    scheduler = RequestScheduler(concurrency=1, queue_timeout=0.05)
+    scheduler.submit("m")
+    with pytest.raises(SchedulerOverloaded):
+        await scheduler.acquire("m")
+    assert scheduler.stats()["m"]["waiting"] == 0
+    assert scheduler.gauges()["timed_out_total"] == 1
+
+def test_session_scope_sets_the_default_session():
+    scheduler = RequestScheduler(concurrency=0)
+    with session_scope("browser-1"):
+        ticket = scheduler.submit("m")
+    assert ticket.session == "browser-1"
+
+@pytest.mark.asyncio
+async def test_achat_holds_a_slot_until_the_stream_is_consumed(monkeypatch):
+    with FakeOllama(tokens=3) as fake:
+        monkeypatch.setenv("OLLAMA_HOST", fake.url)
+        stream = await llm_helper.achat([{"role": "user", "content": "hi"}], "m")
+        assert request_scheduler.stats()["m"]["running"] == 1
+        chunks = [chunk async for chunk in stream]
+        assert chunks[-1]["done"]
+        assert request_scheduler.stats()["m"]["running"] == 0
@@ -0,0 +1,35 @@
+import json
+import os
+
+from src.server_config import ServerConfigCache
+
+def write_config(path, servers):
+    path.write_text(json.dumps({"mcpServers": servers}))
+
+def test_config_is_cached_until_file_changes(tmp_path, monkeypatch):
+    config_file = tmp_path / "mcp_config.json"
+    write_config(config_file, {"fake": {"command": "python", "args": ["a.py"]}})
+    monkeypatch.setenv("MCP_CONFIG_PATH", str(config_file))
+
+    cache = ServerConfigCache(check_interval=0)
+    first = cache.get()
+    assert first.path == config_file
+    assert cache.get() is first
+
+    mtime_ns = config_file.stat().st_mtime_ns
+    write_config(config_file, {"fake": {"command": "python", "args": ["b.py", "--changed"]}})
+    os.utime(config_file, ns=(mtime_ns, mtime_ns + 1_000_000))
+    second = cache.get()
+    assert second is not first
+    assert second.servers["fake"].params.args == ["b.py", "--changed"]
+
+def test_env_overrides_reach_resolved_params(tmp_path, monkeypatch):
+    config_file = tmp_path / "mcp_config.json"
+    write_config(config_file, {"brave-search": {"command": "docker", "args": ["run"]}})
+    monkeypatch.setenv("MCP_CONFIG_PATH", str(config_file))
+    monkeypatch.setenv("BRAVE_SEARCH_ENABLED", "false")
+    monkeypatch.setenv("BRAVE_API_KEY", "secret")
+
+    server = ServerConfigCache(check_interval=0).get().servers["brave-search"]
+    assert server.enabled is False
+    assert server.params.env["BRAVE_API_KEY"] == "secret"
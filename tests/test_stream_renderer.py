@@ -0,0 +1,50 @@
+from src.ui.stream import CURSOR, StreamRenderer
+
+
+class FakePlaceholder:
+    def __init__(self):
+        self.renders = []
+
+    def markdown(self, text):
+        self.renders.append(text)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_chunks_within_a_frame_are_batched():
+    placeholder, clock = FakePlaceholder(), FakeClock()
+    renderer = StreamRenderer(placeholder, fps=10, flush_tokens=1000, clock=clock)
+
+    for word in ["a", "b", "c"]:
+        renderer.write(word)
+    assert placeholder.renders == []
+
+    clock.now = 0.1
+    renderer.write("d")
+    assert placeholder.renders == ["abcd" + CURSOR]
+
+
+def test_flushes_early_after_token_limit():
+    placeholder = FakePlaceholder()
+    renderer = StreamRenderer(placeholder, fps=1, flush_tokens=3, clock=FakeClock())
+
+    for word in ["a", "b", "c", "d"]:
+        renderer.write(word)
+    assert placeholder.renders == ["abc" + CURSOR]
+    assert renderer.text == "abcd"
+
+
+def test_close_renders_remaining_text_without_cursor():
+    placeholder = FakePlaceholder()
+    renderer = StreamRenderer(placeholder, fps=1, flush_tokens=100, clock=FakeClock())
+
+    renderer.write("hello ")
+    renderer.write("world")
+    assert renderer.close() == "hello world"
+    assert placeholder.renders == ["hello world"]
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from ollama import ChatResponse, Message
+
+from src import engine
+from src.conversation import Conversation
+from src.runtime import BackgroundLoop
+from src.telemetry import Trace, TurnMetrics, span, traced, tracing, within
+
+
+def test_span_is_a_noop_without_a_trace():
+    with span("anything") as s:
+        assert s is None
+
+
+@pytest.mark.asyncio
+async def test_spans_from_child_tasks_and_other_loops_join_the_trace():
+    trace = Trace("turn")
+    other = BackgroundLoop("test-telemetry")
+
+    async def tool():
+        with span("tool.child"):
+            await asyncio.sleep(0)
+
+    try:
+        with tracing(trace):
+            with span("tool.dispatch", calls=2):
+                await asyncio.gather(tool(), tool())
+            await other.run(within(trace, tool()))
+    finally:
+        other.close()
+
+    names = [s["name"] for s in trace.finish().to_dict()["spans"]]
+    assert names == ["tool.dispatch", "tool.child", "tool.child", "tool.child"]
+
+
+@pytest.mark.asyncio
+async def test_ollama_stats_are_captured_from_the_final_chunk(monkeypatch):
+    async def fake_achat(messages, model, tools=None, stream=True, formatted=False, ticket=None):
+        async def replay():
+            yield ChatResponse(model=model, done=False, message=Message(role="assistant", content="Hi"))
+            yield ChatResponse(model=model, done=True, message=Message(role="assistant", content=""),
+                               prompt_eval_count=12, prompt_eval_duration=3_000_000,
+                               eval_count=1, eval_duration=2_000_000)
+        return replay()
+    monkeypatch.setattr(engine, "achat", fake_achat)
+
+    conversation = Conversation("system")
+    conversation.append({"role": "user", "content": "hi"})
+    trace = Trace("turn")
+    [e async for e in traced(trace, engine.run_turn(conversation, "test"))]
+
+    spans = {s["name"]: s for s in trace.finish().to_dict()["spans"]}
+    assert set(spans) == {"llm.stream", "llm.first_token"}
+    assert spans["llm.stream"]["attrs"]["eval_count"] == 1
+    assert spans["llm.stream"]["attrs"]["prompt_eval_duration"] == 3_000_000
+
+
+def test_metrics_export_prometheus_text(tmp_path):
+    trace = Trace("turn")
+    trace.add("llm.stream", trace.start, trace.start + 0.5, eval_count=7, prompt_eval_count=3)
+    metrics = TurnMetrics()
+    metrics.record(trace.finish())
+
+    path = tmp_path / "metrics.prom"
+    metrics.export(str(path))
+    text = path.read_text()
+    assert "ollamaassist_turns_total 1" in text
+    assert 'ollamaassist_tokens_total{kind="completion"} 7' in text
+    assert 'ollamaassist_span_seconds_sum{span="llm.stream"} 0.500000' in text
+
+def test_registered_gauges_are_exported():
+    metrics = TurnMetrics()
+    metrics.add_gauges("scheduler", lambda: {"waiting": 3, "rejected_total": 1})
+    assert metrics.to_dict()["gauges"] == {"scheduler": {"waiting": 3, "rejected_total": 1}}
+    text = metrics.to_prometheus()
+    assert "# TYPE ollamaassist_scheduler_waiting gauge\nollamaassist_scheduler_waiting 3" in text
+    assert "# TYPE ollamaassist_scheduler_rejected_total counter" in text
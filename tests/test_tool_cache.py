@@ -0,0 +1,68 @@
+import os
+
+from src.tool_cache import CachePolicy, ToolResultCache
+
+def test_hit_after_put_with_normalized_arguments():
+    cache = ToolResultCache()
+    cache.put("brave-search", "brave_web_search", {"query": "mcp  servers", "count": 5}, "results")
+
+    assert cache.get("brave-search", "brave_web_search", {"count": 5, "query": " MCP servers"}) == "results"
+    assert cache.get("brave-search", "brave_web_search", {"count": 6, "query": "mcp servers"}) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_uncached_tools_and_expired_entries_miss(monkeypatch):
+    cache = ToolResultCache(policies={("s", "fast"): CachePolicy(ttl=10)})
+    cache.put("s", "unknown", {}, "x")
+    assert cache.get("s", "unknown", {}) is None
+
+    cache.put("s", "fast", {}, "x")
+    now = __import__("time").monotonic()
+    monkeypatch.setattr("src.ttl_cache.time.monotonic", lambda: now + 11)
+    assert cache.get("s", "fast", {}) is None
+
+def test_lru_eviction_within_byte_budget():
+    cache = ToolResultCache(policies={("s", "t"): CachePolicy(ttl=60)}, max_bytes=300)
+    for i in range(3):
+        cache.put("s", "t", {"i": i}, "x" * 60)
+    cache.get("s", "t", {"i": 0})
+    cache.put("s", "t", {"i": 3}, "x" * 60)
+
+    assert cache.get("s", "t", {"i": 0}) == "x" * 60
+    assert cache.get("s", "t", {"i": 1}) is None
+    assert cache.stats()["evictions"] >= 1
+    assert cache.stats()["bytes"] <= 300
+
+def test_filesystem_reads_follow_mtime_and_writes(tmp_path):
+    cache = ToolResultCache()
+    path = tmp_path / "notes.txt"
+    path.write_text("v1")
+    cache.put("filesystem", "read_file", {"path": str(path)}, "v1")
+    cache.put("filesystem", "list_directory", {"path": str(tmp_path)}, "[FILE] notes.txt")
+    assert cache.get("filesystem", "read_file", {"path": str(path)}) == "v1"
+
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.get("filesystem", "read_file", {"path": str(path)}) is None
+
+    cache.invalidate("filesystem", "write_file", {"path": str(tmp_path / "new.txt"), "content": "x"})
+    assert cache.get("filesystem", "list_directory", {"path": str(tmp_path)}) is None
+    assert cache.get("filesystem", "write_file", {"path": str(path), "content": "x"}) is None
+
+def test_paths_differing_only_in_whitespace_are_distinct(tmp_path):
+    cache = ToolResultCache()
+    spaced, single = tmp_path / "a  b.txt", tmp_path / "a b.txt"
+    spaced.write_text("two spaces")
+    single.write_text("one space")
+    cache.put("filesystem", "read_file", {"path": str(spaced)}, "two spaces")
+
+    assert cache.get("filesystem", "read_file", {"path": str(single)}) is None
+    assert cache.get("filesystem", "read_file", {"path": str(spaced)}) == "two spaces"
+
+def test_only_side_effect_free_calls_are_reusable():
+    cache = ToolResultCache()
+    assert cache.reusable("brave-search", "brave_web_search")
+    assert cache.reusable("filesystem", "read_file")
+    assert not cache.reusable("filesystem", "write_file")
+    # Unknown tools may change anything
+    assert not cache.reusable("github", "create_issue")
@@ -0,0 +1,75 @@
+from src.tool_registry import ToolRegistry, parse_docstring
+
+def test_parse_docstring_splits_args_section():
+    description, params = parse_docstring("""
+    Do a thing.
+
+    Args:
+        first: The first value
+        second (int): The second value,
+            continued on the next line
+
+    Returns:
+        Something useful
+    """)
+    assert description == "Do a thing.\n\nReturns:\n    Something useful"
+    assert params == {
+        "first": "The first value",
+        "second": "The second value, continued on the next line",
+    }
+
+def test_schema_is_built_once_at_registration():
+    registry = ToolRegistry()
+
+    @registry.register(server="search")
+    async def lookup(query: str, count: int = 5, strict: bool = False):
+        """
+        Look something up.
+
+        Args:
+            query: What to look for
+            count: How many results
+        """
+
+    schemas = registry.schemas()
+    assert schemas is registry.schemas()
+    assert schemas == [{
+        "type": "function",
+        "function": {
+            "name": "lookup",
+            "description": "Look something up.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "What to look for"},
+                    "count": {"type": "integer", "description": "How many results", "default": 5},
+                    "strict": {"type": "boolean", "description": "", "default": False},
+                },
+                "required": ["query"],
+            },
+        },
+    }]
+    assert registry.functions == {"lookup": lookup}
+    assert registry.servers == {"lookup": "search"}
+
+def test_compact_schema_keeps_only_the_first_paragraph():
+    registry = ToolRegistry()
+
+    @registry.register(keywords=("notes",))
+    def files(action: str):
+        """
+        File operations
+        within allowed directories.
+
+        Actions:
+        - read: Read a file
+
+        Args:
+            action: One of read, write
+        """
+
+    tool = registry.get("files")
+    assert tool.compact["function"]["description"] == "File operations within allowed directories."
+    assert tool.compact["function"]["parameters"] == tool.schema["function"]["parameters"]
+    assert "Actions:" in tool.schema["function"]["description"]
+    assert tool.keywords == ("notes",)
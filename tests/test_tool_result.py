@@ -0,0 +1,68 @@
+from mcp.types import CallToolResult, ImageContent, TextContent
+
+from src import tool_result
+from src.tool_result import ToolResult, read_spilled, spill_path
+from src.tools import read_result
+
+
+def text_result(text, is_error=False):
+    return CallToolResult(content=[TextContent(type="text", text=text)], isError=is_error)
+
+
+def test_small_results_are_kept_whole():
+    result = ToolResult.from_call_result(text_result("hello"), max_bytes=100)
+    assert str(result) == "hello"
+    assert not result.truncated and result.handle is None
+    assert result.blocks == [{"type": "text", "bytes": 5}]
+
+
+def test_errors_are_prefixed():
+    assert str(ToolResult.from_call_result(text_result("no such file", is_error=True))) == "Error: no such file"
+
+
+def test_oversized_results_are_cut_and_spilled(tmp_path, monkeypatch):
+    monkeypatch.setattr(tool_result, "SPILL_DIR", tmp_path)
+    text = "HEAD" + "x" * 10_000 + "TAIL"
+
+    result = ToolResult.from_call_result(text_result(text), max_bytes=300)
+
+    assert result.truncated and result.total_bytes == len(text)
+    assert str(result).startswith("HEAD") and str(result).endswith("TAIL")
+    assert len(str(result)) < 400
+    assert result.handle in str(result)
+    assert spill_path(result.handle).read_text() == text
+    assert read_spilled(result.handle, offset=4, size=3) == "xxx"
+
+
+def test_binary_blocks_are_described_not_inlined():
+    result = ToolResult.from_call_result(CallToolResult(content=[
+        TextContent(type="text", text="chart:"),
+        ImageContent(type="image", data="AAAA" * 100, mimeType="image/png"),
+    ]))
+    assert str(result) == "chart:\n[image content, image/png]"
+    assert result.blocks[1] == {"type": "image", "mimeType": "image/png", "bytes": 300}
+
+
+def test_unknown_handles_are_rejected():
+    assert spill_path("../../etc/passwd") is None
+    assert read_spilled("result-doesnotexist") is None
+
+
+def test_spilled_results_can_be_paged_by_the_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(tool_result, "SPILL_DIR", tmp_path)
+    text = "".join(f"line {i}\n" for i in range(1000))
+    result = ToolResult.from_call_result(text_result(text), max_bytes=300)
+    assert f"read_result('{result.handle}')" in str(result)
+
+    first = read_result(result.handle, limit=100)
+    assert first.startswith("line 0\n") and first.endswith("continue with offset=100]")
+    pages, offset = [], 0
+    while True:
+        page = read_result(result.handle, offset=offset, limit=4000)
+        body, footer = page.rsplit("\n[", 1)
+        pages.append(body)
+        if footer.endswith("end of result]"):
+            break
+        offset = int(footer.split("offset=")[1].rstrip("]"))
+    assert "".join(pages) == text
+    assert "error" in read_result("result-doesnotexist")
@@ -0,0 +1,118 @@
+from src.tool_registry import ToolRegistry
+from src.tool_selection import ToolIndex, terms
+from src.tools import registry as tools_registry
+
+def make_registry():
+    registry = ToolRegistry()
+
+    @registry.register(server="search", keywords=("news", "latest"))
+    def web_search(query: str):
+        """
+        Search the web for pages.
+
+        Features:
+        - Pagination
+        - Safe search options
+
+        Args:
+            query: Search terms
+        """
+
+    @registry.register(server="files")
+    def filesystem(action: str, path: str = ""):
+        """
+        Read, write and list files in allowed directories.
+
+        Args:
+            action: One of read, write, list
+            path: File or directory path
+        """
+
+    @registry.register(server="weather")
+    def forecast(city: str):
+        """
+        Weather forecast for a city.
+
+        Args:
+            city: City name
+        """
+
+    return registry
+
+def test_terms_are_stemmed_without_stopwords():
+    assert terms("Can you list the Files in these directories?") == ["list", "file", "directory"]
+
+def test_only_matching_tools_are_sent_in_compact_form():
+    registry = make_registry()
+    index = ToolIndex(registry, top_k=2, min_score=0.5)
+
+    selection = index.select("What's the latest news on Ollama?")
+    assert selection.matched
+    assert selection.names == ["web_search"]
+    assert selection.tools == [registry.get("web_search").compact]
+    assert selection.tokens_saved > 0
+
+    assert index.select("list the files in my project directory").names[0] == "filesystem"
+    assert len(index.select("search files and the weather forecast for Paris").tools) == 2
+
+def test_unmatched_queries_fall_back_to_every_full_schema():
+    registry = make_registry()
+    index = ToolIndex(registry, min_score=0.5)
+
+    selection = index.select("go on")
+    assert not selection.matched
+    assert selection.tools == registry.schemas()
+    assert selection.tokens_saved == 0
+    assert index.gauges() == {"selections_total": 1, "fallbacks_total": 1, "tokens_saved_total": 0}
+
+def test_excluded_servers_and_new_tools_are_respected():
+    registry = make_registry()
+    index = ToolIndex(registry, min_score=0.5)
+    assert index.select("latest news", exclude_servers={"search"}).names == ["filesystem", "forecast"]
+
+    @registry.register(server="mail")
+    def send_email(to: str):
+        """Send an email."""
+
+    assert index.select("send an email to Sam").names == ["send_email"]
+
+def test_disabled_selection_sends_everything():
+    registry = make_registry()
+    selection = ToolIndex(registry, enabled=False).select("latest news")
+    assert selection.tools == registry.schemas()
+
+def test_always_tools_join_every_selection():
+    registry = make_registry()
+
+    @registry.register(always=True)
+    def read_result(handle: str):
+        """Read more of a cut tool result."""
+
+    index = ToolIndex(registry, top_k=1, min_score=0.5)
+    assert index.select("latest news").names == ["web_search", "read_result"]
+    assert index.select("go on").tools == registry.schemas()
+    # Never ranked, so its own words don't make a match
+    assert not index.select("a cut tool result").matched
+
+def test_quick_start_prompts_select_the_right_tools():
+    """The app's Quick Start prompts against the real tools"""
+    index = ToolIndex(tools_registry)
+    expected = {
+        "Can you help me search the web for projects integrating with Deep Seek AI, "
+        "as well as other important news about it?": ["brave", "read_result"],
+        "Can you list the available directories and the files within them?": ["filesystem", "read_result"],
+        "What are the latest trends and innovations in AI?": ["brave", "read_result"],
+        "Can you find the latest global technology news updates?": ["brave", "read_result"],
+    }
+    for prompt, names in expected.items():
+        assert index.select(prompt).names == names, prompt
+
+    selection = index.select("What tools do you have access to and how can they help me?")
+    assert not selection.matched
+    assert selection.tools == tools_registry.schemas()
+
+def test_read_result_is_never_ranked():
+    index = ToolIndex(tools_registry)
+    assert tools_registry.get("read_result").keywords == ()
+    for prompt in ("show me the rest of the output", "read more of the truncated result", "next page"):
+        assert "read_result" not in index.scores(prompt), prompt
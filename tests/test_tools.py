@@ -1,75 +1,61 @@
-import asyncio
-import os
+import json
 import sys
-sys.path.append('/Users/jacob/claude_home/OllamaAssist/src')
-from mcp_client import mcp
+from pathlib import Path
 
-# Use a path inside our allowed directory
-TEST_DIR = "/Users/jacob/claude_home/OllamaAssist/tmp_test"
-TEST_FILE = os.path.join(TEST_DIR, "test.txt")
-TEST_CONTENT = "Hello, this is a test file"
-
-async def setup_test_files():
-    """Create test directory and file"""
-    try:
-        os.makedirs(TEST_DIR, exist_ok=True)
-        with open(TEST_FILE, 'w') as f:
-            f.write(TEST_CONTENT)
-    except Exception as e:
-        print(f"Setup error: {e}")
+import pytest
 
-async def cleanup_test_files():
-    """Clean up test files"""
-    try:
-        if os.path.exists(TEST_FILE):
-            os.remove(TEST_FILE)
-        if os.path.exists(TEST_DIR):
-            os.rmdir(TEST_DIR)
-    except Exception as e:
-        print(f"Cleanup error: {e}")
+from src.mcp_client import mcp
+from src.mcp_pool import session_pool
+from src.server_config import server_configs
+from src.tool_cache import tool_cache
+from src.tools import filesystem
 
-async def test_direct_mcp():
-    """Test direct MCP filesystem operations"""
-    print("\nTesting direct MCP calls:")
-    result = await mcp(server='filesystem', tool='read_file', arguments={'path': TEST_FILE})
-    print(f"Direct read result: {result}")
-    return "Test direct MCP passed!" if TEST_CONTENT in str(result) else "Direct MCP test failed!"
-
-async def test_tools_layer():
-    """Test our tools.py layer"""
-    print("\nTesting tools.py layer:")
-    from tools import filesystem
-    result = await filesystem("read", TEST_FILE)
-    print(f"Tools layer read result: {result}")
-    return "Test tools layer passed!" if TEST_CONTENT in str(result) else "Tools layer test failed!"
+FAKE_MCP_SERVER = Path(__file__).parents[1] / "bench" / "fake_mcp_server.py"
+TEST_CONTENT = "Hello, this is a test file"
 
-async def main():
-    """Run all tests"""
-    print("\nStarting tests...")
-    
-    # First check if filesystem server is available
+@pytest.fixture
+def test_dir(tmp_path, monkeypatch):
+    """A fake filesystem server whose only allowed directory is tmp_path"""
+    allowed = tmp_path / "allowed"
+    allowed.mkdir()
+    (allowed / "test.txt").write_text(TEST_CONTENT)
+
+    config = tmp_path / "mcp_config.json"
+    config.write_text(json.dumps({"mcpServers": {"filesystem": {
+        "command": sys.executable,
+        "args": [str(FAKE_MCP_SERVER), str(allowed)],
+    }}}))
+    monkeypatch.setenv("MCP_CONFIG_PATH", str(config))
+    monkeypatch.setenv("FILESYSTEM_ENABLED", "true")
+    for name in ("FILESYSTEM_PATHS", "FILESYSTEM_COMMAND", "FILESYSTEM_ARGS"):
+        monkeypatch.setenv(name, "")
+    server_configs.invalidate()
+    tool_cache.clear()
+
+    yield allowed.resolve()
+
+    session_pool.close_all()
+    server_configs.invalidate()
+    tool_cache.clear()
+
+@pytest.mark.asyncio
+async def test_filesystem_server_available(test_dir):
     available_servers = await mcp(tool='list_available_servers')
-    print(f"\nAvailable servers: {available_servers}")
-    if '"filesystem"' not in str(available_servers):
-        print("Error: Filesystem server not available!")
-        return
-
-    await setup_test_files()
-    
-    try:
-        # Test both direct MCP and our tools layer
-        result1 = await test_direct_mcp()
-        result2 = await test_tools_layer()
-        
-        print(f"\nResults:\n{result1}\n{result2}")
-
-    except Exception as e:
-        print(f"Error during tests: {str(e)}")
-        import traceback
-        traceback.print_exc()
-    
-    finally:
-        await cleanup_test_files()
-
-if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    assert '"filesystem"' in available_servers
+
+@pytest.mark.asyncio
+async def test_direct_mcp(test_dir):
+    """Direct MCP filesystem operations"""
+    result = await mcp(server='filesystem', tool='read_file', arguments={'path': str(test_dir / "test.txt")})
+    assert TEST_CONTENT in str(result)
+
+@pytest.mark.asyncio
+async def test_tools_layer(test_dir):
+    """The tools.py wrapper"""
+    result = await filesystem("read", str(test_dir / "test.txt"))
+    assert TEST_CONTENT in str(result)
+
+@pytest.mark.asyncio
+async def test_paths_outside_allowed_directories_are_rejected(test_dir):
+    result = await filesystem("read", str(test_dir.parent / "mcp_config.json"))
+    assert "not in allowed directories" in result["error"]
@@ -2,9 +2,9 @@
 Provides simplified interfaces to MCP servers."""
 
 from typing import Any
+from src.allowed_dirs import allowed_directories
 from src.mcp_client import mcp
 import logging
-from pathlib import Path
 
 async def brave(action: str, query: str = "", count: int = 5, offset: int = 0) -> Any:
     """Brave Search API wrapper"""
@@ -60,15 +60,9 @@ async def filesystem(action: str, path: str = "", content: str = "") -> Any:
             
         # For all other actions, validate path if provided
         if path:
-            # Get allowed directories first
-            allowed_dirs = await mcp(server=server_name, tool="list_allowed_directories", arguments={})
-            if "error" in allowed_dirs:
-                return allowed_dirs
-                
-            # Check if path is within allowed directories
-            path_obj = Path(path).resolve()
-            if not any(str(path_obj).startswith(str(Path(allowed_dir).resolve())) 
-                      for allowed_dir in allowed_dirs.get("directories", [])):
+            # Allowed directories are cached per server session
+            allowed_dirs = await allowed_directories.get(server_name)
+            if allowed_dirs is not None and not allowed_dirs.contains(path):
                 return {"error": f"Path '{path}' is not in allowed directories"}
 
         # Handle specific tools directly